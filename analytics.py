@@ -0,0 +1,194 @@
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, distinct, func, select, update
+from database import db, upsert
+from models import DailyProductSales, DailySales, Order, OrderItem, Product, SalesRollupState
+import jobs
+
+# Orders in these statuses are not counted as sales.
+EXCLUDED_STATUSES = ('Cancelled',)
+REPORT_ORDERINGS = ('revenue', 'quantity', 'orders')
+
+
+def _add_to_rollup(model, rows, keys):
+    """
+    INSERT ... SELECT of `rows` into the rollup table, adding the values to
+    rows that already exist for the same `keys`.
+    """
+    table = model.__table__
+    columns = [c.name for c in rows.selected_columns if c.name not in keys]
+    stmt = upsert(table, keys, rows=rows, update=lambda new: {c: table.c[c] + new[c] for c in columns})
+    if stmt is None:
+        raise RuntimeError(f'sales rollups are not supported on {db.engine.dialect.name}')
+    db.session.execute(stmt)
+
+
+def _aggregate(conditions, sign=1):
+    """
+    Adds (or with sign=-1 subtracts) the orders matching `conditions` to both
+    rollups. Each rollup is one grouped INSERT ... SELECT, so the database
+    aggregates whole ranges of orders without rows passing through Python.
+    """
+    day = func.date(Order.order_date)
+    lines = select().select_from(Order).join(OrderItem, OrderItem.order_id == Order.id).where(*conditions)
+    line_revenue = func.sum(OrderItem.quantity * OrderItem.price)
+    _add_to_rollup(DailySales, lines.add_columns(
+        day.label('day'),
+        (sign * func.count(distinct(Order.id))).label('orders'),
+        (sign * func.sum(OrderItem.quantity)).label('items'),
+        (sign * line_revenue).label('revenue'),
+    ).group_by(day), ['day'])
+    _add_to_rollup(DailyProductSales, lines.add_columns(
+        day.label('day'),
+        OrderItem.product_id.label('product_id'),
+        (sign * func.count(distinct(Order.id))).label('orders'),
+        (sign * func.sum(OrderItem.quantity)).label('quantity'),
+        (sign * line_revenue).label('revenue'),
+    ).group_by(day, OrderItem.product_id), ['day', 'product_id'])
+
+
+def _lock_state():
+    # Writing first takes the lock (the write lock on SQLite, the row lock
+    # elsewhere), so refreshes, backfills and cancellations are serialized and
+    # each sees the others' committed changes.
+    db.session.execute(update(SalesRollupState).where(SalesRollupState.id == 1)
+                       .values(updated_at=datetime.utcnow()))
+    return db.session.scalar(select(SalesRollupState.last_order_id).where(SalesRollupState.id == 1)) or 0
+
+
+def _set_watermark(order_id):
+    db.session.execute(update(SalesRollupState).where(SalesRollupState.id == 1).values(last_order_id=order_id))
+
+
+def _settled_order_id():
+    # Order ids are assigned before commit; skipping the newest orders keeps a
+    # refresh from passing over an order whose transaction is still open.
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['ANALYTICS_SETTLE_SECONDS'])
+    return db.session.scalar(select(func.max(Order.id)).where(Order.order_date <= cutoff)) or 0
+
+
+def refresh():
+    """Adds orders placed since the last refresh to the rollups and commits; returns the new watermark."""
+    last = _lock_state()
+    upto = _settled_order_id()
+    if upto > last:
+        _aggregate((Order.id > last, Order.id <= upto, Order.status.notin_(EXCLUDED_STATUSES)))
+        _set_watermark(upto)
+    db.session.commit()
+    return max(upto, last)
+
+
+def backfill(since=None):
+    """
+    Recomputes the rollups from the order tables in one transaction: all of
+    them, or with `since` (a date) only the days from then on. Returns the
+    watermark.
+    """
+    last = _lock_state()
+    conditions = [Order.status.notin_(EXCLUDED_STATUSES)]
+    if since is None:
+        last = _settled_order_id()
+        db.session.execute(delete(DailySales))
+        db.session.execute(delete(DailyProductSales))
+        _set_watermark(last)
+    else:
+        db.session.execute(delete(DailySales).where(DailySales.day >= since))
+        db.session.execute(delete(DailyProductSales).where(DailyProductSales.day >= since))
+        conditions.append(Order.order_date >= datetime.combine(since, datetime.min.time()))
+    _aggregate(conditions + [Order.id <= last])
+    db.session.commit()
+    return last
+
+
+def order_cancelled(order_id):
+    """
+    Takes a cancelled order out of the rollups if a refresh already counted
+    it. Call in the cancelling transaction, after the status change.
+    """
+    if order_id <= _lock_state():
+        _aggregate((Order.id == order_id,), sign=-1)
+
+
+def schedule_refresh():
+    """
+    Queues a rollup refresh in the caller's transaction. All calls within one
+    ANALYTICS_REFRESH_SECONDS window share a single job, which runs after the
+    window (plus the settle time) has passed.
+    """
+    config = current_app.config
+    period = config['ANALYTICS_REFRESH_SECONDS']
+    if not period:
+        return
+    now = time.time()
+    window = int(now // period)
+    jobs.enqueue('refresh_sales_rollups', key=f'sales-rollup:{window}',
+                 delay=(window + 1) * period - now + config['ANALYTICS_SETTLE_SECONDS'])
+
+
+@jobs.task('refresh_sales_rollups', max_attempts=3)
+def refresh_task():
+    refresh()
+
+
+def _first_day(days):
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def rollup_status():
+    row = db.session.execute(select(SalesRollupState.last_order_id, SalesRollupState.updated_at)
+                             .where(SalesRollupState.id == 1)).first()
+    return {'last_order_id': row.last_order_id if row else 0, 'updated_at': row.updated_at if row else None}
+
+
+def sales_by_day(days=30):
+    """Orders, items and revenue for each of the last `days` days (UTC), including days without sales."""
+    first = _first_day(days)
+    rows = {r.day: r for r in db.session.execute(
+        select(DailySales.day, DailySales.orders, DailySales.items, DailySales.revenue)
+        .where(DailySales.day >= first)
+    )}
+    result = []
+    for i in range(days):
+        day = first + timedelta(days=i)
+        row = rows.get(day)
+        result.append({'day': day.isoformat(), 'orders': row.orders if row else 0,
+                       'items': row.items if row else 0, 'revenue': round(row.revenue, 2) if row else 0.0})
+    return result
+
+
+def top_products(days=30, limit=10, order_by='revenue'):
+    """Best selling products over the last `days` days by revenue, quantity or orders."""
+    sales = DailyProductSales
+    totals = (select(sales.product_id, func.sum(sales.orders).label('orders'),
+                     func.sum(sales.quantity).label('quantity'), func.sum(sales.revenue).label('revenue'))
+              .where(sales.day >= _first_day(days)).group_by(sales.product_id)
+              .order_by(func.sum(getattr(sales, order_by)).desc(), sales.product_id).limit(limit).subquery())
+    rows = db.session.execute(
+        select(totals, Product.name).outerjoin(Product, Product.id == totals.c.product_id)
+        .order_by(getattr(totals.c, order_by).desc(), totals.c.product_id)
+    )
+    return [{'product_id': r.product_id, 'name': r.name, 'orders': r.orders, 'quantity': r.quantity,
+             'revenue': round(r.revenue, 2)} for r in rows]
+
+
+def stock_velocity(days=30, limit=20):
+    """
+    Products selling over the last `days` days, with units sold per day and
+    the days of stock left at that rate, those running out first listed first.
+    """
+    sold = (select(DailyProductSales.product_id, func.sum(DailyProductSales.quantity).label('quantity'))
+            .where(DailyProductSales.day >= _first_day(days))
+            .group_by(DailyProductSales.product_id)
+            .having(func.sum(DailyProductSales.quantity) > 0).subquery())
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.stock, sold.c.quantity)
+        .join(sold, sold.c.product_id == Product.id)
+        .order_by((func.coalesce(Product.stock, 0) * 1.0 / sold.c.quantity), Product.id).limit(limit)
+    )
+    result = []
+    for r in rows:
+        per_day = r.quantity / days
+        result.append({'product_id': r.id, 'name': r.name, 'stock': r.stock, 'sold': r.quantity,
+                       'per_day': round(per_day, 2), 'days_of_stock': round((r.stock or 0) / per_day, 1)})
+    return result
@@ -1,7 +1,20 @@
 from flask import Flask, render_template, flash, redirect, url_for
 from config import Config
-from database import db
-from models import User
+import database
+import search
+import query_budget
+import instrumentation
+import cache
+import catalog_context
+import http_cache
+import assets
+import images
+import jobs
+import orders  # registers the order and analytics tasks
+import user_auth
+import carts
+from commands import register_commands
+from chatbot_integration.chatbot_service import ChatbotService, AnswerCache
 from flask_login import LoginManager, current_user
 import os
 
@@ -9,34 +22,51 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    db.init_app(app)
+    database.init_app(app)
+    instrumentation.init_app(app)
+    query_budget.init_app(app)
+    cache.init_app(app)
+    catalog_context.init_app(app)
+    http_cache.init_app(app)
+    assets.init_app(app)
+    images.init_app(app)
+    jobs.init_app(app)
+    search.init_app(app)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
 
-    @login_manager.user_loader
-    def load_user(id):
-        return db.session.get(User, int(id))
+    user_auth.init_app(app, login_manager)
+    carts.init_app(app)
 
     # Register blueprints
     from routes.auth import auth_bp
     from routes.shop import shop_bp
     from routes.admin import admin_bp
+    from routes.chatbot import chatbot_bp
 
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(shop_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(chatbot_bp)
+
+    app.extensions['chatbot'] = ChatbotService(
+        base_url=app.config['CHATBOT_BASE_URL'],
+        model=app.config['CHATBOT_MODEL'],
+        timeout=app.config['CHATBOT_TIMEOUT'],
+        max_concurrency=app.config['CHATBOT_MAX_CONCURRENCY'],
+        queue_timeout=app.config['CHATBOT_QUEUE_TIMEOUT'],
+        cache=AnswerCache(ttl=app.config['CHATBOT_CACHE_TTL']),
+    )
+
+    register_commands(app)
 
     @app.route('/')
     @app.route('/index')
     def index():
         return render_template('index.html', title='Home')
 
-    # Create database tables if they don't exist
-    with app.app_context():
-        db.create_all()
-
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,264 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from flask import Blueprint, abort, current_app, request, send_file, url_for
+from files import IMMUTABLE, write_atomic
+
+assets_bp = Blueprint('assets', __name__)
+
+MANIFEST = 'manifest.json'
+# Precompressed variants, most preferred first: (Accept-Encoding token, file suffix).
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+MIMETYPES = {'.css': 'text/css; charset=utf-8', '.js': 'text/javascript; charset=utf-8'}
+
+_CSS_TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|\s+|[{};,>:]|[^"\'/\s{};,>:]+|/', re.S)
+_CSS_NO_SPACE_AROUND = set('{};,>')
+_JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_AFTER_WORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                         'throw', 'instanceof', 'yield', 'await'}
+
+
+def minify_css(source):
+    """
+    Removes comments and redundant whitespace from a stylesheet. Strings are
+    copied unchanged and whitespace is only dropped next to { } ; , > and
+    after a colon, where it never matters.
+    """
+    tokens = []
+    for token in _CSS_TOKENS.findall(source):
+        if token.startswith('/*') or token.isspace():
+            if tokens and tokens[-1] != ' ':
+                tokens.append(' ')  # a comment still separates tokens
+        else:
+            tokens.append(token)
+    out = []
+    for i, token in enumerate(tokens):
+        if token == ' ':
+            after = out[-1] if out else '{'
+            before = tokens[i + 1] if i + 1 < len(tokens) else '}'
+            if after in _CSS_NO_SPACE_AROUND or after == ':' or before in _CSS_NO_SPACE_AROUND:
+                continue
+        elif token == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(token)
+    return ''.join(out)
+
+
+def _is_word_char(c):
+    return c.isalnum() or c in '_$'
+
+
+def _string_end(source, i, quote):
+    j = i + 1
+    while j < len(source):
+        c = source[j]
+        if c == '\\':
+            j += 2
+        elif c == quote:
+            return j + 1
+        elif quote == '`' and source.startswith('${', j):
+            j = _template_expression_end(source, j + 2)
+        else:
+            j += 1
+    raise ValueError(f'unterminated string at offset {i}')
+
+
+def _template_expression_end(source, j):
+    depth = 1
+    while j < len(source):
+        c = source[j]
+        if c in '"\'`':
+            j = _string_end(source, j, c)
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if not depth:
+                return j + 1
+        j += 1
+    raise ValueError('unterminated template literal')
+
+
+def _regex_end(source, i):
+    j, in_class = i + 1, False
+    while j < len(source) and source[j] != '\n':
+        c = source[j]
+        if c == '\\':
+            j += 1
+        elif c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            j += 1
+            while j < len(source) and _is_word_char(source[j]):
+                j += 1  # flags
+            return j
+        j += 1
+    raise ValueError(f'unterminated regular expression at offset {i}')
+
+
+def minify_js(source):
+    """
+    Conservative JavaScript minifier: drops comments, indentation and
+    redundant spaces, but keeps line breaks so that automatic semicolon
+    insertion works exactly as in the source. Strings, template literals and
+    regular expressions are copied unchanged.
+    """
+    out, last, pending = [], '', None
+    i = 0
+    while i < len(source):
+        c = source[i]
+        if c.isspace():
+            pending = '\n' if c == '\n' or pending == '\n' else ' '
+            i += 1
+            continue
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = len(source) if end < 0 else end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            if end < 0:
+                raise ValueError(f'unterminated comment at offset {i}')
+            pending = '\n' if '\n' in source[i:end] or pending == '\n' else ' '
+            i = end + 2
+            continue
+        if c in '"\'`':
+            end = _string_end(source, i, c)
+        elif c == '/' and (not last or last[-1] in _JS_REGEX_AFTER or last in _JS_REGEX_AFTER_WORDS):
+            end = _regex_end(source, i)
+        elif _is_word_char(c):
+            end = i + 1
+            while end < len(source) and _is_word_char(source[end]):
+                end += 1
+        else:
+            end = i + 1
+        token = source[i:end]
+        if pending and out:
+            if pending == '\n':
+                out.append('\n')
+            elif (_is_word_char(last[-1]) and _is_word_char(token[0])) or (last[-1] in '+-' and token[0] == last[-1]):
+                out.append(' ')
+        pending = None
+        out.append(token)
+        last = token
+        i = end
+    return ''.join(out)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def build(source_dir, output_dir, clean=False, log=print):
+    """
+    Minifies every CSS and JS file under `source_dir` into `output_dir` under
+    a content-hashed name, next to .gz and (with the optional brotli package)
+    .br variants, and writes the manifest mapping source to hashed names.
+    Files of earlier builds are kept unless `clean`, so pages rendered before
+    a deploy can still load their assets. Returns the manifest.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        log("The 'brotli' package is not installed; only gzip variants are built (pip install brotli).")
+    output_dir = os.path.abspath(output_dir)
+    if clean and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    manifest = {}
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir)
+        for name in sorted(files):
+            ext = os.path.splitext(name)[1]
+            if ext not in MINIFIERS:
+                continue
+            path = os.path.join(root, name)
+            with open(path, encoding='utf-8') as f:
+                source = f.read()
+            data = MINIFIERS[ext](source).encode('utf-8')
+            logical = os.path.relpath(path, source_dir).replace(os.sep, '/')
+            hashed = f'{logical[:-len(ext)]}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            target = os.path.join(output_dir, hashed)
+            sizes = [len(source.encode('utf-8')), len(data)]
+            write_atomic(target, lambda out: out.write(data))
+            variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in variants:
+                write_atomic(target + suffix, lambda out: out.write(compressed))
+                sizes.append(len(compressed))
+            manifest[logical] = hashed
+            log(f'{logical} -> {hashed}: ' + ' / '.join(
+                f'{label} {size}' for label, size in zip(['source', 'minified', 'gzip', 'brotli'], sizes)
+            ) + ' bytes')
+    data = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    write_atomic(os.path.join(output_dir, MANIFEST), lambda out: out.write(data))
+    return manifest
+
+
+class Assets:
+    """The built assets listed in a manifest, with their precompressed variants."""
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self.variants = {}
+        for hashed in manifest.values():
+            path = os.path.join(directory, hashed)
+            self.variants[hashed] = [(token, path + suffix) for token, suffix in ENCODINGS
+                                     if os.path.exists(path + suffix)]
+
+    @classmethod
+    def load(cls, directory):
+        try:
+            with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+                return cls(directory, json.load(f))
+        except FileNotFoundError:
+            return cls(directory, {})
+
+
+def asset_url(filename):
+    """
+    URL of a file in the static folder: its fingerprinted build when the
+    manifest lists it, otherwise the plain static file.
+    """
+    hashed = current_app.extensions['assets'].manifest.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.asset', filename=hashed)
+
+
+@assets_bp.route('/assets/<path:filename>')
+def asset(filename):
+    assets = current_app.extensions['assets']
+    if filename not in assets.variants:
+        abort(404)
+    path, encoding = os.path.join(assets.directory, filename), None
+    for token, variant in assets.variants[filename]:
+        if request.accept_encodings.quality(token) > 0:
+            path, encoding = variant, token
+            break
+    response = send_file(path, mimetype=MIMETYPES[os.path.splitext(filename)[1]], conditional=True, etag=True)
+    response.headers['Cache-Control'] = IMMUTABLE
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    """
+    Loads the asset manifest from ASSETS_DIR (default <static folder>/build,
+    written by `flask assets build`) and registers the asset_url template
+    helper. In debug mode, or before the first build, templates link the
+    plain static files so edits show up without a rebuild.
+    """
+    directory = app.config.get('ASSETS_DIR') or os.path.join(app.static_folder, 'build')
+    app.extensions['assets'] = Assets.load(directory) if not app.debug else Assets(directory, {})
+    app.register_blueprint(assets_bp)
+    app.add_template_global(asset_url)
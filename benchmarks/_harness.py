@@ -0,0 +1,43 @@
+"""
+Setup shared by the benchmark scripts: puts the repository on sys.path and
+provides scratch directories and migrated apps that are cleaned up however
+the script ends.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@contextmanager
+def scratch_dir():
+    """A temporary directory, removed with everything in it on exit."""
+    path = tempfile.mkdtemp()
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def bench_app(name, database=None, **env):
+    """
+    Yields an app on `database`, or on a SQLite file `name`.db in a scratch
+    directory, migrated to the latest schema. `env` is added to os.environ
+    first: Config reads it at import, so enter this before importing other
+    app modules.
+    """
+    with scratch_dir() as directory:
+        os.environ['DATABASE_URL'] = database or 'sqlite:///' + os.path.join(directory, f'{name}.db')
+        os.environ.update(env)
+        from app import create_app
+        import migrate
+
+        app = create_app()
+        with app.app_context():
+            migrate.upgrade(log=lambda msg: None)
+        yield app
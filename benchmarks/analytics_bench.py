@@ -0,0 +1,143 @@
+"""
+Sales report benchmark: on-demand aggregation versus the rollup tables.
+
+Generates an order history, times the reports computed directly from the
+order tables and from the daily rollups (after a timed backfill), then places
+and cancels orders and checks after each step that the incrementally
+maintained rollups still match a direct aggregation of the orders.
+
+    python benchmarks/analytics_bench.py --orders 200000 --days 30
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from _harness import bench_app
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=30, help='report period')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per report (best is shown)')
+    args = parser.parse_args()
+
+    with bench_app('analytics', JOB_WORKER='none', ANALYTICS_SETTLE_SECONDS='0', SLOW_QUERY_THRESHOLD_MS='0') as app:
+        import analytics
+        import orders
+        from database import db
+        from models import CartItem, DailyProductSales, Order, OrderItem, Product, User
+        from checkout import place_order
+        from datagen import generate
+
+        with app.app_context():
+            generate(products=args.products, users=args.users, carts=0, orders=args.orders, index_search=False,
+                     log=lambda msg: print(f'  datagen {msg}', file=sys.stderr))
+
+            since = datetime.utcnow().date() - timedelta(days=args.days - 1)
+            start = datetime.combine(since, datetime.min.time())
+            revenue = db.func.sum(OrderItem.quantity * OrderItem.price)
+
+            def direct_daily():
+                day = db.func.date(Order.order_date)
+                return db.session.execute(
+                    db.select(day, db.func.count(db.distinct(Order.id)), db.func.sum(OrderItem.quantity), revenue)
+                    .join(OrderItem, OrderItem.order_id == Order.id)
+                    .where(Order.order_date >= start, Order.status != 'Cancelled').group_by(day)
+                ).all()
+
+            def direct_top():
+                return db.session.execute(
+                    db.select(OrderItem.product_id, revenue).join(Order, Order.id == OrderItem.order_id)
+                    .where(Order.order_date >= start, Order.status != 'Cancelled')
+                    .group_by(OrderItem.product_id).order_by(revenue.desc()).limit(10)
+                ).all()
+
+            def direct_totals():
+                return {r.product_id: (r.quantity, round(r.revenue, 2)) for r in db.session.execute(
+                    db.select(OrderItem.product_id, db.func.sum(OrderItem.quantity).label('quantity'),
+                              revenue.label('revenue'))
+                    .join(Order, Order.id == OrderItem.order_id).where(Order.status != 'Cancelled')
+                    .group_by(OrderItem.product_id)
+                )}
+
+            def rollup_totals():
+                return {r.product_id: (r.quantity, round(r.revenue, 2)) for r in db.session.execute(
+                    db.select(DailyProductSales.product_id, db.func.sum(DailyProductSales.quantity).label('quantity'),
+                              db.func.sum(DailyProductSales.revenue).label('revenue'))
+                    .group_by(DailyProductSales.product_id)
+                    .having(db.func.sum(DailyProductSales.quantity) != 0)
+                )}
+
+            _, backfill_ms = timed(analytics.backfill, 1)
+            print(f'backfill of {args.orders} orders: {backfill_ms:.0f} ms')
+            print(f'\n{"report (" + str(args.days) + " days)":<28} {"orders tables":>14} {"rollups":>10}')
+            for label, direct, rollup in (
+                ('daily sales', direct_daily, lambda: analytics.sales_by_day(args.days)),
+                ('top products', direct_top, lambda: analytics.top_products(args.days)),
+                ('stock velocity', None, lambda: analytics.stock_velocity(args.days)),
+            ):
+                direct_ms = f'{timed(direct, args.repeat)[1]:.1f} ms' if direct else '-'
+                print(f'{label:<28} {direct_ms:>14} {timed(rollup, args.repeat)[1]:>7.1f} ms')
+
+            problems = []
+
+            def check(step):
+                if direct_totals() != rollup_totals():
+                    problems.append(f'rollups differ from the orders after {step}')
+
+            check('backfill')
+            user_id = db.session.scalar(db.select(User.id).limit(1))
+            product_ids = db.session.scalars(db.select(Product.id).where(Product.stock > 10).limit(3)).all()
+            placed = []
+            for _ in range(20):
+                db.session.execute(db.insert(CartItem), [{'user_id': user_id, 'product_id': pid, 'quantity': 2}
+                                                         for pid in product_ids])
+                db.session.commit()
+                placed.append(place_order(user_id, CartItem.query.filter_by(user_id=user_id).all()).order.id)
+            _, refresh_ms = timed(analytics.refresh, 1)
+            check('refresh')
+            orders.set_status(placed[0], 'Cancelled')  # already counted: subtracted
+            db.session.execute(db.insert(CartItem), [{'user_id': user_id, 'product_id': product_ids[0], 'quantity': 1}])
+            db.session.commit()
+            late = place_order(user_id, CartItem.query.filter_by(user_id=user_id).all()).order.id
+            orders.set_status(late, 'Cancelled')  # not counted yet: skipped by the next refresh
+            analytics.refresh()
+            check('cancellations')
+            analytics.backfill(since)
+            check('partial backfill')
+            print(f'\nincremental refresh of {len(placed)} new orders: {refresh_ms:.1f} ms')
+
+        client = app.test_client()
+        with app.app_context():
+            admin = User(username='admin', email='admin@example.com', is_admin=True)
+            admin.set_password('adminpass')
+            db.session.add(admin)
+            db.session.commit()
+        app.config['WTF_CSRF_ENABLED'] = False
+        client.post('/auth/login', data={'username': 'admin', 'password': 'adminpass'})
+        response, page_ms = timed(lambda: client.get(f'/admin/reports?days={args.days}'), args.repeat)
+        if response.status_code != 200:
+            problems.append(f'/admin/reports returned {response.status_code}')
+        print(f'GET /admin/reports: {page_ms:.1f} ms')
+        if problems:
+            print('FAILED: ' + '; '.join(problems))
+            sys.exit(1)
+        print('OK: rollups match the order tables')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Static asset pipeline check: sizes, fingerprinted URLs and encoding negotiation.
+
+Builds the CSS and JavaScript into a temporary directory, prints the bytes a
+browser downloads for each file raw, minified, gzipped and brotli compressed,
+then checks through the test client that pages link the fingerprinted files,
+that they are served with immutable caching and the best encoding the client
+accepts, and that every variant decodes to the same minified file.
+
+    python benchmarks/assets_bench.py
+"""
+import argparse
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from _harness import ROOT, bench_app, scratch_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+
+    import assets
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    with scratch_dir() as assets_dir:
+        manifest = assets.build(os.path.join(ROOT, 'static'), assets_dir, log=lambda msg: None)
+        # The app loads the manifest just written.
+        with bench_app('assets', ASSETS_DIR=assets_dir, JOB_WORKER='none') as app:
+            problems = []
+            print(f'{"file":<18} {"source":>8} {"minified":>9} {"gzip":>7} {"brotli":>7}')
+            for logical, hashed in sorted(manifest.items()):
+                with open(os.path.join(app.static_folder, logical), encoding='utf-8') as f:
+                    source = f.read()
+                with open(os.path.join(assets_dir, hashed), 'rb') as f:
+                    minified = f.read()
+                sizes = [len(source.encode('utf-8')), len(minified), len(gzip.compress(minified, 9))]
+                sizes.append(len(brotli.compress(minified, quality=11)) if brotli else None)
+                print(f'{logical:<18} ' + ' '.join(f'{s:>{w}}' if s is not None else f'{"-":>{w}}'
+                                                  for s, w in zip(sizes, (8, 9, 7, 7))))
+                if logical.endswith('.css') and source.count('{') != minified.decode().count('{'):
+                    problems.append(f'{logical}: minifying changed the number of rules')
+                if logical.endswith('.js') and shutil.which('node'):
+                    with tempfile.NamedTemporaryFile('wb', suffix='.js') as f:
+                        f.write(minified)
+                        f.flush()
+                        check = subprocess.run(['node', '--check', f.name], capture_output=True, text=True)
+                    if check.returncode:
+                        problems.append(f'{logical}: minified file does not parse: {check.stderr.strip()}')
+
+            client = app.test_client()
+            page = client.get('/').get_data(as_text=True)
+            for logical in manifest:
+                url = f'/assets/{manifest[logical]}'
+                if url not in page:
+                    problems.append(f'home page does not link {url}')
+                identity = client.get(url, headers={'Accept-Encoding': 'identity'})
+                with open(os.path.join(assets_dir, manifest[logical]), 'rb') as f:
+                    minified = f.read()
+                if identity.data != minified or identity.content_encoding:
+                    problems.append(f'{url}: identity response differs from the minified file')
+                cases = [('gzip, deflate', 'gzip', gzip.decompress), ('br;q=0, gzip', 'gzip', gzip.decompress)]
+                if brotli:
+                    cases.append(('gzip, deflate, br', 'br', brotli.decompress))
+                for accept, expected, decode in cases:
+                    response = client.get(url, headers={'Accept-Encoding': accept})
+                    if response.content_encoding != expected:
+                        problems.append(f'{url} with {accept!r}: {response.content_encoding} instead of {expected}')
+                    elif decode(response.data) != minified:
+                        problems.append(f'{url} with {accept!r}: body does not decode to the minified file')
+                    if response.headers.get('Cache-Control') != assets.IMMUTABLE:
+                        problems.append(f'{url}: Cache-Control {response.headers.get("Cache-Control")!r}')
+                    if 'accept-encoding' not in response.vary:
+                        problems.append(f'{url}: missing Vary: Accept-Encoding')
+                revalidated = client.get(url, headers={'Accept-Encoding': 'gzip',
+                                                       'If-None-Match': response.headers['ETag']})
+                if response.content_encoding == 'gzip' and revalidated.status_code != 304:
+                    problems.append(f'{url}: revalidation returned {revalidated.status_code}')
+            for url in ('/assets/css/style.css', '/assets/manifest.json', '/assets/../config.py'):
+                if client.get(url).status_code != 404:
+                    problems.append(f'{url} is served')
+
+            if problems:
+                print('FAILED: ' + '; '.join(problems))
+                sys.exit(1)
+            print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Login and authenticated-request throughput benchmark.
+
+Measures, through the test client:
+  * logins/s for several PASSWORD_HASH_METHOD settings (threads log in with
+    fresh sessions, so every request hashes a password),
+  * authenticated requests/s and SQL statements per request with the cached
+    user loader on and off (USER_CACHE_TTL),
+  * how much CPU a flood of wrong-password attempts from one address costs
+    with the login rate limiter on and off.
+
+    python benchmarks/auth_bench.py --threads 8 --seconds 5
+"""
+import argparse
+import threading
+import time
+
+from _harness import bench_app
+
+HASH_METHODS = ['pbkdf2:sha256:600000', 'scrypt:32768:8:1', 'scrypt:16384:8:1']
+PASSWORD = 'password'
+
+
+def run_threads(threads, seconds, work):
+    """Calls work(thread_index) in a loop from `threads` threads for `seconds`; returns successes/s."""
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def worker(i):
+        while not stop.is_set():
+            if work(i):
+                counts[i] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in pool:
+        t.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--seconds', type=float, default=5, help='duration of each measurement')
+    parser.add_argument('--flood', type=int, default=200, help='attempts in the brute-force flood')
+    args = parser.parse_args()
+
+    with bench_app('auth') as app:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from database import db
+        from models import User
+        import user_auth
+
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            for method in HASH_METHODS:
+                app.config['PASSWORD_HASH_METHOD'] = method
+                user = User(username=f'user-{method}', email=f'{method.replace(":", "-")}@example.com')
+                user.set_password(PASSWORD)
+                db.session.add(user)
+            db.session.commit()
+
+        def set_limits(address, username):
+            with app.app_context():
+                app.config['LOGIN_RATE_LIMIT_PER_ADDRESS'] = address
+                app.config['LOGIN_RATE_LIMIT_PER_USERNAME'] = username
+                user_auth.init_app(app, app.login_manager)
+
+        set_limits(0, 0)
+        print(f'{"hash method":<24} {"logins/s":>9}')
+        for method in HASH_METHODS:
+            app.config['PASSWORD_HASH_METHOD'] = method
+            data = {'username': f'user-{method}', 'password': PASSWORD}
+
+            def login(i):
+                return app.test_client().post('/auth/login', data=data).status_code == 302
+            print(f'{method:<24} {run_threads(args.threads, args.seconds, login):>9.1f}')
+
+        statements = [0]
+        event.listen(Engine, 'before_cursor_execute', lambda *a: statements.__setitem__(0, statements[0] + 1))
+        clients = [app.test_client() for _ in range(args.threads)]
+        for client in clients:
+            client.post('/auth/login', data={'username': f'user-{HASH_METHODS[-1]}', 'password': PASSWORD})
+        print(f'\n{"user loader":<24} {"requests/s":>10} {"SQL/request":>12}')
+        for label, ttl in (('uncached', 0), ('cached', 60)):
+            app.config['USER_CACHE_TTL'] = ttl
+            requests, statements[0] = [0] * args.threads, 0
+
+            def authenticated_request(i):
+                requests[i] += 1
+                return clients[i].get('/index').status_code == 200
+            rate = run_threads(args.threads, args.seconds, authenticated_request)
+            print(f'{label:<24} {rate:>10.1f} {statements[0] / max(sum(requests), 1):>12.1f}')
+
+        print(f'\n{"brute-force flood":<24} {"attempts":>9} {"hashed":>7} {"CPU s":>7}')
+        app.config['PASSWORD_HASH_METHOD'] = HASH_METHODS[1]
+        for label, limits in (('no rate limit', (0, 0)), ('rate limited', (20, 10))):
+            set_limits(*limits)
+            client = app.test_client()
+            cpu = time.process_time()
+            codes = [client.post('/auth/login', data={'username': f'user-{HASH_METHODS[1]}', 'password': 'wrong'})
+                     .status_code for _ in range(args.flood)]
+            print(f'{label:<24} {len(codes):>9} {codes.count(302):>7} {time.process_time() - cpu:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Cart write-rate benchmark: database statements per cart action.
+
+Simulates visitors who add products to their cart, change a quantity, remove
+a product, view the cart and sign in, and counts the write statements and
+commits this costs with the cart kept in the database the way product pages
+used to (a lookup, an insert or update and a commit per add), in the session
+cart before signing in, in the database cart of signed-in users and in the
+session cart of signed-in users. It also checks that the session cart is
+merged into the user's cart with one statement at login and that checkout
+from a session cart works.
+
+    python benchmarks/cart_writes.py --visitors 200 --items 5
+"""
+import argparse
+import random
+import sys
+from contextlib import contextmanager
+
+from _harness import bench_app
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class StatementCounter:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.reads = self.writes = self.commits = 0
+
+    def statement(self, conn, cursor, statement, parameters, context, executemany):
+        keyword = statement.lstrip().split(None, 1)[0].upper()
+        if keyword in WRITES:
+            self.writes += 1
+        elif keyword == 'SELECT':
+            self.reads += 1
+
+    def commit(self, conn):
+        self.commits += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--visitors', type=int, default=200)
+    parser.add_argument('--items', type=int, default=5, help='products each visitor adds')
+    parser.add_argument('--products', type=int, default=2000)
+    args = parser.parse_args()
+
+    env = {'JOB_WORKER': 'none', 'LOGIN_RATE_LIMIT_PER_ADDRESS': '0', 'LOGIN_RATE_LIMIT_PER_USERNAME': '0',
+           'SLOW_QUERY_THRESHOLD_MS': '0'}
+    with bench_app('carts', **env) as app:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from database import db
+        from models import CartItem, Order, OrderItem, Product, User
+        from datagen import generate
+
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            generate(products=args.products, users=args.visitors * 4 + 1, carts=0, orders=0, index_search=False,
+                     log=lambda msg: print(f'  datagen {msg}', file=sys.stderr))
+            product_ids = db.session.scalars(db.select(Product.id).where(Product.stock >= 100)).all()
+            usernames = db.session.scalars(db.select(User.username).order_by(User.id)).all()
+
+        counter = StatementCounter()
+        event.listen(Engine, 'before_cursor_execute', counter.statement)
+        event.listen(Engine, 'commit', counter.commit)
+        rng = random.Random(1)
+        users = iter(usernames)
+        problems = []
+        rows = []
+
+        def login(client, username):
+            response = client.post('/auth/login', data={'username': username, 'password': 'password'})
+            if response.status_code != 302:
+                problems.append(f'login of {username} returned {response.status_code}')
+
+        def shop(client, picks):
+            # The cart actions of one visit: add each product, change one quantity, remove one, view the cart.
+            for pid in picks:
+                client.post(f'/product/{pid}', data={'quantity': 2})
+            client.post(f'/cart/update/{picks[0]}', data={'quantity': 3})
+            client.post(f'/cart/remove/{picks[-1]}')
+            return len(picks) + 2
+
+        def measure(label, visit):
+            counter.reset()
+            actions = sum(visit() for _ in range(args.visitors))
+            rows.append((label, actions, counter.writes, counter.commits, counter.reads))
+            return counter.writes, counter.commits
+
+        def expected_cart(picks, existing=None):
+            expected = {pid: 2 for pid in picks[1:-1]}
+            expected[picks[0]] = 3
+            if existing:
+                expected[existing] = expected.get(existing, 0) + 1
+            return expected
+
+        def cart_of(username):
+            with app.app_context():
+                return dict(db.session.execute(
+                    db.select(CartItem.product_id, CartItem.quantity).join(User).where(User.username == username)
+                ).all())
+
+        @contextmanager
+        def uncounted():
+            # Setup and logins are not cart actions.
+            saved = counter.writes, counter.commits, counter.reads
+            yield
+            counter.writes, counter.commits, counter.reads = saved
+
+        # Baseline: what every add to cart cost before, run against the same database.
+        def legacy_visit():
+            username, picks = next(users), rng.sample(product_ids, args.items)
+            with app.test_request_context():
+                with uncounted():
+                    user_id = db.session.scalar(db.select(User.id).where(User.username == username))
+                for pid in picks:
+                    cart_item = CartItem.query.filter_by(user_id=user_id, product_id=pid).first()
+                    if cart_item:
+                        cart_item.quantity += 2
+                    else:
+                        cart_item = CartItem(user_id=user_id, product_id=pid, quantity=2)
+                    db.session.add(cart_item)
+                    db.session.commit()
+                cart_item = CartItem.query.filter_by(user_id=user_id, product_id=picks[-1]).first()
+                db.session.delete(cart_item)
+                db.session.commit()
+            return len(picks) + 1
+
+        # Anonymous visitors: no writes while shopping, one batched upsert at login.
+        merges = []
+
+        def anonymous_visit():
+            username, picks = next(users), rng.sample(product_ids, args.items)
+            with uncounted(), app.app_context():
+                # A line already in the user's cart from an earlier visit, to exercise the merge.
+                db.session.add(CartItem(user_id=db.session.scalar(db.select(User.id).where(User.username == username)),
+                                        product_id=picks[1], quantity=1))
+                db.session.commit()
+            client = app.test_client()
+            actions = shop(client, picks)
+            client.get('/cart')
+            with uncounted():
+                before = counter.writes
+                login(client, username)
+                merges.append(counter.writes - before)
+                if cart_of(username) != expected_cart(picks, picks[1]):
+                    problems.append(f'merged cart of {username} is {cart_of(username)}')
+            return actions
+
+        def signed_in_visit(check):
+            def visit():
+                username, picks = next(users), rng.sample(product_ids, args.items)
+                client = app.test_client()
+                with uncounted():
+                    login(client, username)
+                actions = shop(client, picks)
+                client.get('/cart')
+                with uncounted():
+                    check(username, picks)
+                return actions
+            return visit
+
+        def check_database(username, picks):
+            if cart_of(username) != expected_cart(picks):
+                problems.append(f'database cart of {username} is {cart_of(username)}')
+
+        def check_session(username, picks):
+            if cart_of(username):
+                problems.append(f'session cart of {username} was written to the database')
+
+        actions = args.visitors * (args.items + 2)
+        measure('database, before', legacy_visit)
+        app.config['CART_BACKEND'] = 'database'
+        writes, commits = measure('session, anonymous', anonymous_visit)
+        if writes or commits:
+            problems.append(f'anonymous carts wrote {writes} statements')
+        if set(merges) != {1}:
+            problems.append(f'login merge took {sorted(set(merges))} write statements')
+        writes, _ = measure('database, signed in', signed_in_visit(check_database))
+        if writes != actions:
+            problems.append(f'database cart took {writes} write statements for {actions} actions')
+        app.config['CART_BACKEND'] = 'session'
+        writes, _ = measure('session, signed in', signed_in_visit(check_session))
+        if writes:
+            problems.append(f'signed-in session cart wrote {writes} statements')
+
+        # Checkout from a session cart turns it into an order and empties it.
+        client = app.test_client()
+        username = next(users)
+        login(client, username)
+        picks = rng.sample(product_ids, 2)
+        for pid in picks:
+            client.post(f'/product/{pid}', data={'quantity': 2})
+        client.post(f'/cart/update/{picks[0]}', data={'quantity': 3})
+        client.post('/checkout')
+        with app.app_context():
+            lines = dict(db.session.execute(
+                db.select(OrderItem.product_id, OrderItem.quantity).join(Order).join(User)
+                .where(User.username == username)
+            ).all())
+        if lines != {picks[0]: 3, picks[1]: 2}:
+            problems.append(f'checkout from the session cart ordered {lines}')
+        with client.session_transaction() as session:
+            if session.get('cart'):
+                problems.append('session cart was not emptied by checkout')
+
+        # Visitors without a cart still get shared, cacheable product pages.
+        client = app.test_client()
+        page = client.get(f'/product/{product_ids[0]}')
+        cacheable = page.headers.get('Cache-Control', '').startswith('public')
+        if not cacheable or 'csrf_token' in page.get_data(as_text=True):
+            problems.append('anonymous product page is no longer cacheable')
+        client.post(f'/product/{product_ids[0]}', data={'quantity': 1})
+        if client.get(f'/product/{product_ids[0]}').headers.get('Cache-Control', '').startswith('public'):
+            problems.append('product page of a visitor with a cart is cached as public')
+
+        print(f'\n{"cart storage":<22} {"actions":>8} {"writes":>7} {"commits":>8} {"reads":>6} {"writes/action":>14}')
+        for label, actions, writes, commits, reads in rows:
+            print(f'{label:<22} {actions:>8} {writes:>7} {commits:>8} {reads:>6} {writes / actions:>14.2f}')
+        print(f'login merge of a {args.items - 1}-product session cart: {merges[0]} write statement')
+        if problems:
+            print('FAILED: ' + '; '.join(problems[:5]))
+            sys.exit(1)
+        print('OK')
+
+
+if __name__ == '__main__':
+    main()
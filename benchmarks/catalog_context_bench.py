@@ -0,0 +1,58 @@
+"""
+Measures chatbot catalog context size and build time for growing catalogs.
+
+    python benchmarks/catalog_context_bench.py --sizes 10 1000 10000 100000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from _harness import bench_app
+
+WORDS = ['wireless', 'gaming', 'mouse', 'keyboard', 'headphones', 'usb', 'hub', 'ssd', 'portable',
+         'monitor', 'cable', 'charger', 'speaker', 'webcam', 'microphone', 'ergonomic', 'mechanical']
+MESSAGES = ['Do you have a wireless gaming mouse?', 'I need a cheap usb hub', 'hello',
+            'Which portable ssd would you recommend?', 'mechanical keyboard with rgb']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with bench_app('context') as app:
+        from database import db
+        from models import Product
+        import search
+
+        rng = random.Random(42)
+        print(f'{"products":>9} {"chars":>6} {"~tokens":>7} {"p50 ms":>7} {"max ms":>7}')
+        with app.app_context():
+            builder = app.extensions['catalog_context']
+            existing = 0
+            for size in sorted(args.sizes):
+                rows = [{'name': ' '.join(rng.sample(WORDS, 3)).title() + f' {i}',
+                         'description': ' '.join(rng.choices(WORDS, k=12)),
+                         'price': round(rng.uniform(5, 500), 2), 'stock': rng.randint(0, 50)}
+                        for i in range(existing, size)]
+                for i in range(0, len(rows), 10000):
+                    db.session.execute(db.insert(Product), rows[i:i + 10000])
+                search.get_index().rebuild()
+                db.session.commit()
+                existing = size
+
+                builder.invalidate()
+                timings, sizes = [], []
+                for i in range(args.repeat):
+                    started = time.perf_counter()
+                    context = builder.build(MESSAGES[i % len(MESSAGES)])
+                    timings.append((time.perf_counter() - started) * 1000)
+                    sizes.append(len(context))
+                print(f'{size:>9} {max(sizes):>6} {max(sizes) // 4:>7} '
+                      f'{statistics.median(timings):>7.2f} {max(timings):>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Chatbot check against the local stub chat server.
+
+Starts chatbot_integration/stub_server.py in-process, points the app's
+chatbot service at it and checks the /chatbot endpoint: the Server-Sent
+Events response streams the answer token by token (the first token arrives
+well before the last) and ends with a done event, the JSON response carries
+the whole answer, a repeated question is answered from the cache without
+calling the model again, and streams abandoned by disconnected clients give
+their connection back to the pool.
+
+    python benchmarks/chatbot_stub_check.py --delay 0.05
+"""
+import argparse
+import json
+import sys
+import time
+
+from _harness import bench_app
+
+
+def parse_sse(lines):
+    """Yields (event, data) for each event in an iterable of SSE text lines."""
+    event, data = None, []
+    for line in lines:
+        if line.startswith('event: '):
+            event = line[len('event: '):]
+        elif line.startswith('data: '):
+            data.append(line[len('data: '):])
+        elif not line and data:
+            yield event or 'message', json.loads('\n'.join(data))
+            event, data = None, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--delay', type=float, default=0.05, help='stub delay per streamed token (s)')
+    args = parser.parse_args()
+
+    from chatbot_integration.stub_server import StubHandler, serve
+
+    server = serve(delay=args.delay)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    with bench_app('chatbot', JOB_WORKER='none', CHATBOT_BASE_URL=base_url, HUGGINGFACE_API_KEY='stub') as app:
+        from database import db
+        from models import Product
+
+        with app.app_context():
+            db.session.add(Product(name='Wireless Mouse', description='A quiet mouse.', price=19.99, stock=10))
+            db.session.commit()
+
+        client = app.test_client()
+        problems = []
+        question = 'Do you sell a wireless mouse with a long battery life?'
+        expected = f'You asked about: {question}'
+
+        started = time.perf_counter()
+        response = client.post('/chatbot', json={'message': question}, headers={'Accept': 'text/event-stream'},
+                               buffered=False)
+        arrivals, tokens, events = [], [], []
+        lines = (line for chunk in response.response for line in chunk.decode().split('\n'))
+        for event, data in parse_sse(lines):
+            events.append(event)
+            if 'token' in data:
+                arrivals.append(time.perf_counter() - started)
+                tokens.append(data['token'])
+        response.close()
+        if response.mimetype != 'text/event-stream':
+            problems.append(f'SSE request answered with {response.mimetype}')
+        if ''.join(tokens) != expected:
+            problems.append(f'streamed answer was {"".join(tokens)!r}')
+        if events[-1:] != ['done']:
+            problems.append(f'stream did not end with a done event: {events[-3:]}')
+        if len(arrivals) < 2 or arrivals[0] > arrivals[-1] / 2:
+            problems.append('answer was not streamed incrementally')
+        print(f'SSE: {len(tokens)} tokens, first after {arrivals[0] * 1000:.0f} ms, '
+              f'last after {arrivals[-1] * 1000:.0f} ms' if arrivals else 'SSE: no tokens')
+
+        other = 'What keyboards do you have?'
+        served = StubHandler.requests_served
+        started = time.perf_counter()
+        response = client.post('/chatbot', json={'message': other})
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200 or response.get_json() != {'response': f'You asked about: {other}'}:
+            problems.append(f'JSON response was {response.status_code} {response.get_data(as_text=True)!r}')
+        if StubHandler.requests_served != served + 1:
+            problems.append('JSON request did not call the model exactly once')
+        print(f'JSON: {response.status_code} in {elapsed:.0f} ms')
+
+        served = StubHandler.requests_served
+        started = time.perf_counter()
+        response = client.post('/chatbot', json={'message': question.lower().rstrip('?')})
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.get_json() != {'response': expected}:
+            problems.append(f'cached answer was {response.get_data(as_text=True)!r}')
+        if StubHandler.requests_served != served:
+            problems.append('repeated question called the model again')
+        print(f'repeated question: answered from the cache in {elapsed:.1f} ms')
+
+        # Clients that disconnect mid-answer must not keep pool connections: with a
+        # single connection, the next question is only answered if it was returned.
+        from chatbot_integration.chatbot_service import ChatbotService
+        service = ChatbotService(api_key='stub', base_url=base_url, timeout=5.0,
+                                 max_concurrency=1)
+        for i in range(3):
+            answer = service.stream_chatbot_response(f'Abandoned question {i}')
+            next(answer)
+            answer.close()
+        started = time.perf_counter()
+        try:
+            service.get_chatbot_response('Anything else?')
+        except Exception as e:
+            problems.append(f'question after abandoned streams failed: {e}')
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed > 2000:
+            problems.append(f'question after abandoned streams waited {elapsed:.0f} ms for a connection')
+        service.close()
+        print(f'after 3 abandoned streams: answered in {elapsed:.0f} ms')
+
+        server.shutdown()
+        if problems:
+            print('FAILED: ' + '; '.join(problems))
+            sys.exit(1)
+        print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Concurrent checkout stress test.
+
+Starts many buyer threads that all try to buy the same scarce products at once
+and checks that stock never goes negative and that the number of units sold
+matches the stock that was available. Prints throughput at the end.
+
+    python benchmarks/checkout_stress.py --buyers 64 --stock 100
+"""
+import argparse
+import sys
+import threading
+import time
+
+from _harness import bench_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--buyers', type=int, default=64, help='concurrent buyer threads')
+    parser.add_argument('--orders', type=int, default=5, help='checkout attempts per buyer')
+    parser.add_argument('--products', type=int, default=10, help='products in every cart')
+    parser.add_argument('--stock', type=int, default=100, help='initial stock per product')
+    parser.add_argument('--database', help='database URL (default: temporary SQLite file)')
+    args = parser.parse_args()
+
+    with bench_app('stress', args.database) as app:
+        from database import db
+        from models import Product, User, CartItem, Order, OrderItem
+        from checkout import place_order
+
+        with app.app_context():
+            db.session.execute(db.insert(Product), [
+                {'name': f'Scarce product {i}', 'price': 10.0 + i, 'stock': args.stock}
+                for i in range(args.products)
+            ])
+            db.session.execute(db.insert(User), [
+                {'username': f'buyer{i}', 'email': f'buyer{i}@example.com', 'password_hash': '-'}
+                for i in range(args.buyers)
+            ])
+            db.session.commit()
+            product_ids = [p.id for p in Product.query.order_by(Product.id)]
+            user_ids = [u.id for u in User.query.order_by(User.id)]
+
+        results = {'ok': 0, 'failed': 0, 'errors': []}
+        lock = threading.Lock()
+        barrier = threading.Barrier(args.buyers)
+
+        def buyer(user_id):
+            with app.app_context():
+                barrier.wait()
+                for _ in range(args.orders):
+                    try:
+                        db.session.execute(db.insert(CartItem), [
+                            {'user_id': user_id, 'product_id': pid, 'quantity': 1} for pid in product_ids
+                        ])
+                        db.session.commit()
+                        cart = CartItem.query.filter_by(user_id=user_id).all()
+                        result = place_order(user_id, cart)
+                        if not result.ok:
+                            db.session.execute(db.delete(CartItem).where(CartItem.user_id == user_id))
+                            db.session.commit()
+                        with lock:
+                            results['ok' if result.ok else 'failed'] += 1
+                    except Exception as e:
+                        db.session.rollback()
+                        with lock:
+                            results['errors'].append(repr(e))
+
+        threads = [threading.Thread(target=buyer, args=(uid,)) for uid in user_ids]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            stocks = [p.stock for p in Product.query.order_by(Product.id)]
+            sold = dict(db.session.query(OrderItem.product_id, db.func.sum(OrderItem.quantity))
+                        .group_by(OrderItem.product_id).all())
+            orders = Order.query.count()
+
+        attempts = args.buyers * args.orders
+        print(f'buyers={args.buyers} attempts={attempts} elapsed={elapsed:.2f}s')
+        print(f'orders placed={results["ok"]} rejected={results["failed"]} errors={len(results["errors"])}')
+        print(f'throughput={attempts / elapsed:.1f} checkouts/s, {results["ok"] / elapsed:.1f} orders/s')
+
+        problems = []
+        if any(s < 0 for s in stocks):
+            problems.append(f'negative stock: {stocks}')
+        for pid, stock in zip(product_ids, stocks):
+            if sold.get(pid, 0) + stock != args.stock:
+                problems.append(f'product {pid}: sold {sold.get(pid, 0)} + left {stock} != {args.stock}')
+        if orders != results['ok']:
+            problems.append(f'{orders} orders in database, {results["ok"]} reported')
+        if results['errors']:
+            problems.append(f'first error: {results["errors"][0]}')
+        if problems:
+            print('FAILED:\n  ' + '\n  '.join(problems))
+            sys.exit(1)
+        print('OK: no oversell')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Worker cold-start benchmark.
+
+Prepares a database once, then starts fresh Python processes that import the
+app and call create_app(), like a new worker would, and reports the median
+time of each step. The first request is timed too, since work deferred from
+startup (such as picking the search backend) lands there.
+
+    python benchmarks/cold_start.py --runs 10 --products 20000
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from _harness import ROOT, bench_app
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, %r)
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.test_client().get('/search?q=product')
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported, 'first_request': served - created}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes to start')
+    parser.add_argument('--products', type=int, default=20000, help='catalog size')
+    parser.add_argument('--database', help='existing database URL (default: new temporary SQLite file)')
+    args = parser.parse_args()
+
+    # The probes inherit DATABASE_URL from this process.
+    with bench_app('cold', args.database) as app:
+        if not args.database:
+            from datagen import generate
+
+            with app.app_context():
+                generate(products=args.products, users=10, carts=0, orders=100, log=lambda msg: None)
+
+        timings = {'import': [], 'create_app': [], 'first_request': []}
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, '-c', PROBE % ROOT], capture_output=True, text=True,
+                                    check=True, cwd=ROOT).stdout
+            for key, value in json.loads(output.strip().splitlines()[-1]).items():
+                timings[key].append(value)
+    for key, values in timings.items():
+        print(f'{key:<14} median {statistics.median(values) * 1000:8.1f} ms   '
+              f'max {max(values) * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Fast synthetic data generator for load testing.
+
+Bulk inserts products, users, carts and orders with Core executemany batches
+and explicit primary keys (so no per-row round trips are needed to link
+rows). Scales from a few thousand to millions of rows.
+
+    python benchmarks/datagen.py --products 100000 --users 10000 --orders 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADJECTIVES = ['Wireless', 'Ergonomic', 'Portable', 'Mechanical', 'Compact', 'Gaming', 'Smart', 'Ultra',
+              'Silent', 'Rugged', 'Slim', 'Premium', 'Budget', 'Pro', 'Mini', 'Dual', 'Noise-Cancelling']
+NOUNS = ['Mouse', 'Keyboard', 'Headphones', 'USB-C Hub', 'SSD', 'Monitor', 'Webcam', 'Microphone',
+         'Speaker', 'Charger', 'Cable', 'Router', 'Laptop Stand', 'Docking Station', 'Power Bank',
+         'Graphics Tablet', 'Controller', 'Memory Card', 'Smartwatch', 'Earbuds']
+FEATURES = ['RGB lighting', 'Bluetooth 5.3', 'fast charging', 'long battery life', 'aluminium body',
+            '4K resolution', 'low latency', 'USB-C', 'water resistant', 'foldable design',
+            'two-year warranty', 'plug and play', 'active noise cancellation', 'hot-swappable switches']
+PASSWORD = 'password'
+
+
+def _chunks(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _next_id(db, model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def generate(products=1000, users=100, carts=50, orders=500, max_items=5, batch_size=10000,
+             seed=1, index_search=True, log=print):
+    """
+    Appends synthetic rows to the current app's database and returns the id
+    ranges that were created. Must be called inside an application context.
+    """
+    from database import db
+    from models import Product, User, CartItem, Order, OrderItem
+    from passwords import hash_password
+    import search
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    def insert(model, rows, label, count):
+        t = time.perf_counter()
+        for batch in _chunks(rows, batch_size):
+            db.session.execute(db.insert(model), batch)
+            db.session.commit()
+        log(f'{label}: {count} rows in {time.perf_counter() - t:.1f}s')
+
+    first_product = _next_id(db, Product)
+    insert(Product, ({
+        'id': first_product + i,
+        'name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {first_product + i}',
+        'description': f'{rng.choice(ADJECTIVES)} design with {rng.choice(FEATURES)} and {rng.choice(FEATURES)}.',
+        'price': round(rng.uniform(4.99, 999.99), 2),
+        'stock': 0 if rng.random() < 0.1 else rng.randint(1, 500),
+        'image_url': f'https://picsum.photos/seed/{first_product + i}/400/400',
+    } for i in range(products)), 'products', products)
+    product_ids = range(first_product, first_product + products) if products else range(1, _next_id(db, Product))
+
+    # Every generated user shares one password hash; hashing per user would
+    # dominate generation time.
+    password_hash = hash_password(PASSWORD)
+    first_user = _next_id(db, User)
+    insert(User, ({
+        'id': first_user + i,
+        'username': f'user{first_user + i}',
+        'email': f'user{first_user + i}@example.com',
+        'password_hash': password_hash,
+        'is_admin': False,
+    } for i in range(users)), 'users', users)
+    user_ids = range(first_user, first_user + users) if users else range(1, _next_id(db, User))
+
+    if product_ids and user_ids:
+        cart_users = rng.sample(user_ids, min(carts, len(user_ids)))
+        cart_rows = [{'user_id': uid, 'product_id': pid, 'quantity': rng.randint(1, 3)}
+                     for uid in cart_users
+                     for pid in rng.sample(product_ids, min(rng.randint(1, max_items), len(product_ids)))]
+        insert(CartItem, cart_rows, 'cart items', len(cart_rows))
+
+        first_order = _next_id(db, Order)
+        now = datetime.utcnow()
+        order_rows, item_rows = [], []
+
+        def order_batches():
+            for i in range(orders):
+                order_id = first_order + i
+                lines = [(pid, rng.randint(1, 3), round(rng.uniform(4.99, 999.99), 2))
+                         for pid in rng.sample(product_ids, min(rng.randint(1, max_items), len(product_ids)))]
+                item_rows.extend({'order_id': order_id, 'product_id': pid, 'quantity': qty, 'price': price}
+                                 for pid, qty, price in lines)
+                yield {
+                    'id': order_id,
+                    'user_id': rng.choice(user_ids),
+                    'order_date': now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+                    'total_amount': round(sum(qty * price for _, qty, price in lines), 2),
+                    'status': rng.choice(['Processing', 'Shipped', 'Delivered']),
+                }
+
+        t = time.perf_counter()
+        written_items = 0
+        for batch in _chunks(order_batches(), batch_size):
+            db.session.execute(db.insert(Order), batch)
+            db.session.execute(db.insert(OrderItem), item_rows)
+            db.session.commit()
+            written_items += len(item_rows)
+            item_rows.clear()
+        log(f'orders: {orders} rows ({written_items} items) in {time.perf_counter() - t:.1f}s')
+
+    if index_search and products:
+        t = time.perf_counter()
+        search.get_index().rebuild()
+        db.session.commit()
+        log(f'search index rebuilt in {time.perf_counter() - t:.1f}s')
+
+    log(f'done in {time.perf_counter() - started:.1f}s')
+    return {'products': product_ids, 'users': user_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--carts', type=int, default=500, help='users that get a non-empty cart')
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-search-index', action='store_true', help='skip rebuilding the search index')
+    args = parser.parse_args()
+
+    from app import create_app
+    import migrate
+    app = create_app()
+    with app.app_context():
+        migrate.upgrade(log=lambda msg: None)
+        generate(products=args.products, users=args.users, carts=args.carts, orders=args.orders,
+                 batch_size=args.batch_size, seed=args.seed, index_search=not args.no_search_index)
+
+
+if __name__ == '__main__':
+    main()
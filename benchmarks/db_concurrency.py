@@ -0,0 +1,129 @@
+"""
+Mixed read/write concurrency benchmark for the database engine profile.
+
+Runs reader threads (catalog and product pages through the test client, with
+caching off) against writer threads (short stock-update transactions, like
+checkout) for a fixed time, once per engine profile, and prints reads/s,
+writes/s and failed operations for each:
+
+    default   SQLite rollback journal, synchronous=FULL, no busy_timeout
+    tuned     WAL, synchronous=NORMAL, busy_timeout (the shipped defaults)
+    replica   tuned, with @use_replica views reading through a second engine
+
+    python benchmarks/db_concurrency.py --readers 16 --writers 4 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from _harness import bench_app, scratch_dir
+
+PROFILES = {
+    'default': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT_MS': '0'},
+    'tuned': {},
+    'replica': {},
+}
+
+
+def run_profile(args):
+    """Runs one profile in this process and prints its result as JSON."""
+    # The parent passes the profile's database and settings in the environment.
+    with bench_app('concurrency', os.environ['DATABASE_URL']) as app:
+        from sqlalchemy import update
+        from sqlalchemy.exc import OperationalError
+        from database import db
+        from models import Product
+        from datagen import generate
+
+        with app.app_context():
+            generate(products=args.products, users=1, carts=0, orders=0, log=lambda *a: None)
+            product_ids = [pid for (pid,) in db.session.query(Product.id)]
+
+        counts = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        barrier = threading.Barrier(args.readers + args.writers + 1)
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def reader(seed):
+            rng = random.Random(seed)
+            client = app.test_client()
+            barrier.wait()
+            while not stop.is_set():
+                if rng.random() < 0.5:
+                    response = client.get('/shop?sort=price_asc&in_stock=1')
+                else:
+                    response = client.get(f'/product/{rng.choice(product_ids)}')
+                count('reads' if response.status_code == 200 else 'read_errors')
+
+        def writer(seed):
+            rng = random.Random(seed)
+            with app.app_context():
+                barrier.wait()
+                while not stop.is_set():
+                    product_id = rng.choice(product_ids)
+                    try:
+                        db.session.execute(update(Product).where(Product.id == product_id)
+                                           .values(stock=Product.stock + 1))
+                        db.session.commit()
+                        count('writes')
+                    except OperationalError:
+                        db.session.rollback()
+                        count('write_errors')
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        started = time.perf_counter()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        counts['reads_per_s'] = counts['reads'] / elapsed
+        counts['writes_per_s'] = counts['writes'] / elapsed
+        print(json.dumps(counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=16, help='concurrent reader threads')
+    parser.add_argument('--writers', type=int, default=4, help='concurrent writer threads')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each profile')
+    parser.add_argument('--products', type=int, default=5000, help='catalog size')
+    parser.add_argument('--only', choices=sorted(PROFILES), action='append', help='run only these profiles')
+    parser.add_argument('--profile', help=argparse.SUPPRESS)  # internal: run one profile in-process
+    args = parser.parse_args()
+
+    if args.profile:
+        return run_profile(args)
+
+    print(f'{"profile":<10} {"reads/s":>10} {"writes/s":>10} {"read err":>9} {"write err":>9}')
+    for name in args.only or list(PROFILES):
+        # Config is read at import time, so every profile runs in a fresh process.
+        with scratch_dir() as directory:
+            path = os.path.join(directory, 'concurrency.db')
+            env = dict(os.environ, DATABASE_URL='sqlite:///' + path, CACHE_BACKEND='null', **PROFILES[name])
+            if name == 'replica':
+                env['DATABASE_REPLICA_URL'] = 'sqlite:///' + path
+            argv = [sys.executable, os.path.abspath(__file__), '--profile', name,
+                    '--readers', str(args.readers), '--writers', str(args.writers),
+                    '--seconds', str(args.seconds), '--products', str(args.products)]
+            output = subprocess.run(argv, env=env, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f'{name:<10} {result["reads_per_s"]:>10.1f} {result["writes_per_s"]:>10.1f} '
+              f'{result["read_errors"]:>9} {result["write_errors"]:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Product image pipeline check against a local HTTP fixture server.
+
+Serves generated full-size JPEGs from a local server (optionally with added
+latency, like a slow third-party host), creates products through the admin
+form, and checks that saves return without waiting for the downloads, that
+every size ends up in the content-addressed store, that identical images are
+stored once, that broken URLs fall back to the original URL, and that stored
+images are served with immutable caching headers. Prints save latency, ingest
+throughput and catalog image weight before and after.
+
+    python benchmarks/image_pipeline.py --products 40 --delay 0.2
+"""
+import argparse
+import functools
+import http.server
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from _harness import bench_app, scratch_dir
+
+
+class FixtureHandler(http.server.SimpleHTTPRequestHandler):
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_fixtures(directory, delay):
+    handler = type('Handler', (FixtureHandler,), {'delay': delay})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_fixture_images(directory, count, width=1600, height=1200):
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(7)
+    for i in range(count):
+        image = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(60):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.ellipse((x, y, x + rng.randrange(40, 400), y + rng.randrange(40, 400)),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        image.save(os.path.join(directory, f'photo{i}.jpg'), quality=90)
+    with open(os.path.join(directory, 'not-an-image.jpg'), 'w') as f:
+        f.write('<html>Not found</html>')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=40, help='products to create')
+    parser.add_argument('--images', type=int, default=20, help='distinct fixture images (reused by products)')
+    parser.add_argument('--delay', type=float, default=0.2, help='fixture server latency per request (s)')
+    args = parser.parse_args()
+
+    with scratch_dir() as tmpdir:
+        fixtures = os.path.join(tmpdir, 'fixtures')
+        os.makedirs(fixtures)
+        make_fixture_images(fixtures, args.images)
+        server = serve_fixtures(fixtures, args.delay)
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+
+        with bench_app('images', IMAGE_DIR=os.path.join(tmpdir, 'store'), LOGIN_RATE_LIMIT_PER_ADDRESS='0') as app:
+            from database import db
+            from models import Product, User
+            import images
+
+            app.config['WTF_CSRF_ENABLED'] = False
+            with app.app_context():
+                admin = User(username='admin', email='admin@example.com', is_admin=True)
+                admin.set_password('adminpass')
+                db.session.add(admin)
+                db.session.commit()
+
+            client = app.test_client()
+            client.post('/auth/login', data={'username': 'admin', 'password': 'adminpass'})
+            urls = [f'{base}/photo{i % args.images}.jpg' for i in range(args.products)]
+            urls += [f'{base}/missing.jpg', f'{base}/not-an-image.jpg']
+            save_times = []
+            started = time.perf_counter()
+            for i, url in enumerate(urls):
+                t = time.perf_counter()
+                client.post('/admin/add_item', data={'name': f'Product {i}', 'description': 'Fixture product',
+                                                      'price': 9.99, 'stock': 5, 'image_url': url})
+                save_times.append(time.perf_counter() - t)
+            with app.app_context():
+                images.get_ingestor().drain()
+            ingest_time = time.perf_counter() - started
+
+            failures = []
+            with app.app_context():
+                store = images.get_ingestor().store
+                products = Product.query.order_by(Product.id).all()
+                stored = [p for p in products if p.image_key]
+                keys = {p.image_key for p in stored}
+                if len(stored) != args.products:
+                    failures.append(f'{len(stored)} of {args.products} fetchable images stored')
+                if len(keys) != min(args.images, args.products):
+                    failures.append(f'{len(keys)} distinct keys for {args.images} distinct images')
+                if any(p.image_key for p in products[args.products:]):
+                    failures.append('broken image URLs got an image_key')
+                missing = [(k, s) for k in keys for s in store.sizes if not os.path.exists(store.path(k, s))]
+                if missing:
+                    failures.append(f'{len(missing)} resized files missing')
+                original_bytes = sum(os.path.getsize(os.path.join(fixtures, url.rsplit('/', 1)[1]))
+                                     for url in urls[:args.products])
+                card_size = next(s for s in store.sizes if s >= 400)
+                card_bytes = sum(os.path.getsize(store.path(p.image_key, card_size)) for p in stored)
+                first = stored[0] if stored else None
+
+            if first is not None:
+                response = client.get(f'/images/{first.image_key}/{card_size}')
+                if response.status_code != 200 or 'immutable' not in response.headers.get('Cache-Control', ''):
+                    failures.append(f'image response {response.status_code} {response.headers.get("Cache-Control")}')
+                if client.get(f'/images/{first.image_key}/123').status_code != 404:
+                    failures.append('unconfigured size was served')
+            page = client.get('/shop?per_page=100').get_data(as_text=True)
+            if f'{base}/missing.jpg' not in page:
+                failures.append('catalog does not fall back to image_url for broken images')
+            if len(re.findall(r'src="/images/', page)) != args.products:
+                failures.append('catalog does not use stored images')
+
+            save_times.sort()
+            print(f'admin saves: p50 {save_times[len(save_times) // 2] * 1000:.1f} ms, '
+                  f'max {save_times[-1] * 1000:.1f} ms (fixture latency {args.delay * 1000:.0f} ms)')
+            print(f'ingest: {len(urls)} products in {ingest_time:.2f}s '
+                  f'({len(urls) / ingest_time:.1f}/s with {app.config["IMAGE_WORKERS"]} workers)')
+            print(f'catalog image weight: {original_bytes / 1024:.0f} KiB originals -> '
+                  f'{card_bytes / 1024:.0f} KiB at {card_size}px')
+            server.shutdown()
+            if failures:
+                print('FAILED: ' + '; '.join(failures))
+                sys.exit(1)
+            print('OK')
+
+
+if __name__ == '__main__':
+    main()
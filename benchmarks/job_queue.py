@@ -0,0 +1,184 @@
+"""
+Background job queue check and checkout latency benchmark.
+
+Places orders from concurrent buyers while the order follow-up work (the
+confirmation email through a simulated slow, flaky mail provider) runs
+either inline after each checkout or through the job queue, and prints
+checkout latency for both. It then checks that the queue confirmed every
+order and sent exactly one email per order despite the injected failures,
+that the email task's concurrency limit held, that idempotency keys prevent
+duplicate jobs, and that jobs of a dead worker are recovered after their
+lease.
+
+    python benchmarks/job_queue.py --buyers 8 --orders 10 --mail-latency 0.1
+"""
+import argparse
+import logging
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from _harness import bench_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--buyers', type=int, default=8, help='concurrent buyers')
+    parser.add_argument('--orders', type=int, default=10, help='orders per buyer and mode')
+    parser.add_argument('--mail-latency', type=float, default=0.1, help='simulated mail provider latency (s)')
+    parser.add_argument('--mail-failure-rate', type=float, default=0.3, help='share of failing mail sends')
+    parser.add_argument('--workers', type=int, default=4, help='job worker threads')
+    args = parser.parse_args()
+
+    logging.getLogger('jobs').setLevel(logging.ERROR)  # the injected failures log a warning per retry
+    # Rollup refreshes are timed jobs; they are not part of this check.
+    with bench_app('jobs', JOB_WORKER='none', ANALYTICS_REFRESH_SECONDS='0', SLOW_QUERY_THRESHOLD_MS='0') as app:
+        import jobs
+        import orders
+        from database import db
+        from models import CartItem, Job, Order, Product, User
+        from checkout import place_order
+
+        sends, active, peak = {}, [0], [0]
+        lock = threading.Lock()
+        rng = random.Random(1)
+
+        def flaky_send_mail(to, subject, body):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+                fail = rng.random() < args.mail_failure_rate
+            try:
+                time.sleep(args.mail_latency)
+                if fail:
+                    raise ConnectionError('simulated mail provider failure')
+                with lock:
+                    sends[subject] = sends.get(subject, 0) + 1
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        orders.send_mail = flaky_send_mail
+        jobs.TASKS['order_email'].backoff = 0.05
+
+        worker = app.extensions['jobs']
+        worker.threads = args.workers
+        worker.poll_interval = 0.05
+        with app.app_context():
+            db.session.execute(db.insert(Product), [
+                {'name': f'Product {i}', 'price': 10.0 + i, 'stock': 100000} for i in range(5)
+            ])
+            db.session.execute(db.insert(User), [
+                {'username': f'buyer{i}', 'email': f'buyer{i}@example.com', 'password_hash': '-'}
+                for i in range(args.buyers)
+            ])
+            db.session.commit()
+            product_ids = [p.id for p in Product.query.order_by(Product.id)]
+            user_ids = [u.id for u in User.query.order_by(User.id)]
+
+        def run_checkouts(after_order):
+            latencies, errors = [], []
+
+            def buyer(user_id):
+                with app.app_context():
+                    for _ in range(args.orders):
+                        db.session.execute(db.insert(CartItem), [
+                            {'user_id': user_id, 'product_id': pid, 'quantity': 1} for pid in product_ids
+                        ])
+                        db.session.commit()
+                        cart = CartItem.query.filter_by(user_id=user_id).all()
+                        started = time.perf_counter()
+                        try:
+                            result = place_order(user_id, cart)
+                            after_order(result.order.id)
+                        except Exception as e:
+                            db.session.rollback()
+                            errors.append(repr(e))
+                            continue
+                        with lock:
+                            latencies.append(time.perf_counter() - started)
+
+            threads = [threading.Thread(target=buyer, args=(uid,)) for uid in user_ids]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            latencies.sort()
+            return latencies, errors
+
+        def inline_follow_up(order_id):
+            # What checkout would do without a queue: confirm and email in the request.
+            orders.set_status(order_id, 'Processing')
+            for attempt in range(5):
+                try:
+                    orders.send_order_email(order_id, 'Processing')
+                    break
+                except ConnectionError:
+                    continue
+
+        print(f'{"follow-up work":<16} {"orders":>7} {"p50 ms":>8} {"p95 ms":>8} {"errors":>7}')
+        for label, follow_up in (('inline', inline_follow_up), ('job queue', lambda order_id: None)):
+            latencies, errors = run_checkouts(follow_up)
+            p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+            p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+            print(f'{label:<16} {len(latencies):>7} {p50:>8.1f} {p95:>8.1f} {len(errors):>7}')
+
+        problems = []
+        with app.app_context():
+            queued_order_ids = [o.id for o in Order.query.filter_by(status='Pending')]
+            sends.clear()
+            peak[0] = 0
+            # A job claimed by a worker that died: it must be run again once its lease expires.
+            db.session.add(Job(name='process_order', payload=f'{{"order_id": {queued_order_ids[0]}}}',
+                               status='running', attempts=1, locked_by='dead-worker',
+                               locked_at=datetime.utcnow() - timedelta(seconds=worker.lease + 1)))
+            order_id = queued_order_ids[0]
+            if jobs.enqueue('process_order', {'order_id': order_id}, key=f'order:{order_id}:placed'):
+                problems.append('duplicate idempotency key was enqueued')
+            db.session.commit()
+
+        started = time.perf_counter()
+        worker.start()
+        while True:
+            with app.app_context():
+                open_jobs = Job.query.filter(Job.status.in_(('queued', 'running'))).count()
+            if not open_jobs:
+                break
+            time.sleep(0.05)
+        drain_time = time.perf_counter() - started
+        worker.stop()
+
+        with app.app_context():
+            stats = jobs.stats()
+            pending = Order.query.filter(Order.status != 'Processing').count()
+            if pending:
+                problems.append(f'{pending} orders were not confirmed')
+            for order_id in queued_order_ids:
+                count = sends.get(f'Order #{order_id}: Processing', 0)
+                if count != 1:
+                    problems.append(f'order {order_id} got {count} confirmation emails')
+                    break
+            if orders.set_status(queued_order_ids[0], 'Shipped') is not True:
+                problems.append('Processing -> Shipped was refused')
+            if orders.set_status(queued_order_ids[0], 'Shipped') is not False:
+                problems.append('repeated transition was applied twice')
+            shipped_emails = Job.query.filter_by(idempotency_key=f'order:{queued_order_ids[0]}:email:Shipped').count()
+            if shipped_emails != 1:
+                problems.append(f'{shipped_emails} shipping email jobs')
+        if peak[0] > jobs.TASKS['order_email'].concurrency:
+            problems.append(f'{peak[0]} concurrent emails, limit {jobs.TASKS["order_email"].concurrency}')
+        failed = sum(c['failed'] for c in stats['tasks'].values())
+        print(f'\nqueue drained {len(queued_order_ids)} orders in {drain_time:.2f}s with {args.workers} threads; '
+              f'{failed} jobs failed permanently, peak concurrent emails {peak[0]}')
+        for name, counts in sorted(stats['tasks'].items()):
+            print(f'  {name:<16} ' + ' '.join(f'{s}={n}' for s, n in counts.items()))
+        if problems:
+            print('FAILED: ' + '; '.join(problems))
+            sys.exit(1)
+        print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+In-process benchmark of the storefront's hot endpoints.
+
+Generates (or reuses) a synthetic dataset, then drives each endpoint through
+the Flask test client and reports latency percentiles, SQL statements per
+request and peak Python memory. Results can be saved as a JSON baseline and
+later runs compared against it.
+
+    python benchmarks/run.py --products 100000 --save baseline.json
+    python benchmarks/run.py --products 100000 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from _harness import bench_app
+
+FORMAT_VERSION = 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def build_scenarios(app, user):
+    """
+    Returns (name, method, url, data, session) tuples for the endpoints under
+    test, using ids that exist in the generated data. `session` is
+    'anonymous', 'customer' (logged in) or 'fresh' (new client per request).
+    """
+    from database import db
+    from models import Product
+
+    with app.app_context():
+        product_id = db.session.query(db.func.max(Product.id)).scalar() // 2 or 1
+    return [
+        ('GET /shop', 'GET', '/shop', None, 'anonymous'),
+        ('GET /shop?sort=price_asc&in_stock=1', 'GET', '/shop?sort=price_asc&in_stock=1', None, 'anonymous'),
+        ('GET /product/<id>', 'GET', f'/product/{product_id}', None, 'anonymous'),
+        ('GET /cart', 'GET', '/cart', None, 'customer'),
+        ('GET /checkout', 'GET', '/checkout', None, 'customer'),
+        ('GET /purchase_history', 'GET', '/purchase_history', None, 'customer'),
+        ('POST /auth/login', 'POST', '/auth/login', {'username': user.username, 'password': 'password'}, 'fresh'),
+    ]
+
+
+def run_scenario(get_client, method, url, data, iterations, warmup, counter):
+    for _ in range(warmup):
+        get_client().open(url, method=method, data=data)
+
+    timings, statements, statuses = [], [], set()
+    for _ in range(iterations):
+        client = get_client()
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        timings.append((time.perf_counter() - started) * 1000)
+        statements.append(counter.count)
+        statuses.add(response.status_code)
+
+    # Memory is measured in a separate pass because tracemalloc slows every
+    # allocation down and would distort the latency numbers.
+    tracemalloc.start()
+    for _ in range(min(5, iterations)):
+        get_client().open(url, method=method, data=data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'status': sorted(statuses),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': max(statements),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms=1.0):
+    """
+    Returns a list of human readable regressions: p95 latency more than
+    `tolerance` (fraction) and at least `min_delta_ms` above the baseline,
+    or more SQL statements per request.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        slower = current['p95_ms'] - previous['p95_ms']
+        if slower > previous['p95_ms'] * tolerance and slower >= min_delta_ms:
+            regressions.append(f'{name}: p95 {previous["p95_ms"]:.2f} -> {current["p95_ms"]:.2f} ms')
+        if current['queries'] > previous['queries']:
+            regressions.append(f'{name}: queries {previous["queries"]} -> {current["queries"]}')
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='database URL to reuse (skips data generation if it has products)')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', help='run only scenarios whose name contains this text')
+    parser.add_argument('--save', metavar='PATH', help='write results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown (0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='ignore p95 slowdowns smaller than this (timer noise)')
+    parser.add_argument('--no-cache', action='store_true', help='run with the null cache backend')
+    args = parser.parse_args()
+
+    env = {
+        # The login scenario logs in repeatedly from one address.
+        'LOGIN_RATE_LIMIT_PER_ADDRESS': '0', 'LOGIN_RATE_LIMIT_PER_USERNAME': '0',
+        # Background job polling would show up in the per-request query counts.
+        'JOB_WORKER': 'none',
+    }
+    if args.no_cache:
+        env['CACHE_BACKEND'] = 'null'
+    with bench_app('bench', args.database, **env) as app:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from database import db
+        from models import CartItem, Order, Product, User
+        from datagen import generate
+
+        app.config['WTF_CSRF_ENABLED'] = False
+
+        with app.app_context():
+            if not db.session.query(Product.id).first():
+                generate(products=args.products, users=args.users, carts=max(1, args.users // 2),
+                         orders=args.orders, log=lambda msg: print(f'  datagen {msg}', file=sys.stderr))
+            # Benchmark as the customer with the most orders who also has a cart.
+            user = (db.session.query(User).join(Order).join(CartItem, CartItem.user_id == User.id)
+                    .group_by(User.id).order_by(db.func.count(Order.id).desc()).first())
+            dialect = db.engine.dialect.name
+            sizes = {'products': Product.query.count(), 'users': User.query.count(), 'orders': Order.query.count()}
+            db.session.expunge(user)
+
+        counter = StatementCounter()
+        event.listen(Engine, 'before_cursor_execute', counter)
+
+        anonymous = app.test_client()
+        customer = app.test_client()
+        customer.post('/auth/login', data={'username': user.username, 'password': 'password'})
+
+        clients = {'anonymous': lambda: anonymous, 'customer': lambda: customer, 'fresh': app.test_client}
+
+        results = {}
+        for name, method, url, data, session in build_scenarios(app, user):
+            if args.only and args.only not in name:
+                continue
+            results[name] = run_scenario(clients[session], method, url, data, args.iterations, args.warmup, counter)
+            r = results[name]
+            print(f'{name:<40} p50 {r["p50_ms"]:>8.2f}  p95 {r["p95_ms"]:>8.2f}  p99 {r["p99_ms"]:>8.2f} ms'
+                  f'  queries {r["queries"]:>3}  peak {r["peak_kb"]:>8.1f} KiB  status {r["status"]}')
+
+        report = {
+            'format': FORMAT_VERSION,
+            'created': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': dialect,
+            'dataset': sizes,
+            'iterations': args.iterations,
+            'cache': not args.no_cache,
+            'results': results,
+        }
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f'Baseline written to {args.save}')
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+            if baseline.get('dataset') != sizes:
+                print(f'Warning: dataset differs from baseline ({baseline.get("dataset")} vs {sizes})')
+            regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+            if regressions:
+                print('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+                sys.exit(1)
+            print('No regressions against baseline.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from blinker import Namespace
+from flask import current_app
+
+_signals = Namespace()
+
+# Sent after a commit that changed products. `product_ids` lists the changed
+# rows; `listing_changed` is True when catalog listings (membership, order,
+# in-stock filter) may be affected, not just the product rows themselves.
+products_changed = _signals.signal('products-changed')
+
+_MISSING = object()
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with per-entry TTL. Each worker process has its own
+    copy, so invalidations only reach the process that made the change; use
+    the Redis backend when several workers must see the same data.
+    """
+    name = 'memory'
+
+    def __init__(self, max_entries=10000, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_version(self, tag):
+        return self._versions.get(tag, 0)
+
+    def bump_version(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class RedisCache:
+    """
+    Shared cache backed by Redis (requires the optional `redis` package).
+    Eviction is left to Redis' own maxmemory policy; hit/miss counters are
+    per process.
+    """
+    name = 'redis'
+
+    def __init__(self, url, default_ttl=300, prefix='eshop:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND='redis' requires the 'redis' package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def get_version(self, tag):
+        return int(self._client.get(self.prefix + 'version:' + tag) or 0)
+
+    def bump_version(self, tag):
+        self._client.incr(self.prefix + 'version:' + tag)
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+    def stats(self):
+        info = self._client.info('stats')
+        return {
+            'backend': self.name,
+            'entries': self._client.dbsize(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': info.get('evicted_keys', 0),
+            'expirations': info.get('expired_keys', 0),
+        }
+
+
+class NullCache:
+    """Never stores anything; used to switch caching off (e.g. in tests)."""
+    name = 'null'
+
+    def __init__(self):
+        self.misses = 0
+
+    def get(self, key, default=None):
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def get_version(self, tag):
+        return 0
+
+    def bump_version(self, tag):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': self.name, 'entries': 0, 'hits': 0, 'misses': self.misses,
+                'evictions': 0, 'expirations': 0}
+
+
+def create_backend(config):
+    backend = config.get('CACHE_BACKEND', 'memory')
+    ttl = config.get('CACHE_DEFAULT_TTL', 300)
+    if backend == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], default_ttl=ttl)
+    if backend == 'null':
+        return NullCache()
+    return MemoryCache(max_entries=config.get('CACHE_MAX_ENTRIES', 10000), default_ttl=ttl)
+
+
+def init_app(app):
+    app.extensions['cache'] = create_backend(app.config)
+    products_changed.connect(_invalidate_products, sender=app)
+
+
+def get_cache():
+    return current_app.extensions['cache']
+
+
+def _tagged_key(backend, tag, key):
+    # Keys embed the tag's version, so bumping the version invalidates every
+    # entry under the tag at once without having to enumerate them.
+    return f'{tag}:{backend.get_version(tag)}:{key}'
+
+
+def cached(tag, key, factory, ttl=None):
+    """
+    Read-through helper: returns the cached value for (tag, key) or calls
+    `factory()` and stores its result. None results are not cached.
+    """
+    backend = get_cache()
+    full_key = _tagged_key(backend, tag, key)
+    value = backend.get(full_key, _MISSING)
+    if value is _MISSING:
+        value = factory()
+        if value is not None:
+            backend.set(full_key, value, ttl)
+    return value
+
+
+def invalidate(tag, key=None):
+    backend = get_cache()
+    if key is None:
+        backend.bump_version(tag)
+    else:
+        backend.delete(_tagged_key(backend, tag, key))
+
+
+def notify_products_changed(product_ids, listing_changed=True):
+    """
+    Announces committed product changes. Call after `db.session.commit()`, so
+    no other request can re-cache the old rows in between.
+    """
+    products_changed.send(current_app._get_current_object(), product_ids=list(product_ids),
+                          listing_changed=listing_changed)
+
+
+def _invalidate_products(app, product_ids, listing_changed):
+    for product_id in product_ids:
+        invalidate('product', product_id)
+    if listing_changed:
+        invalidate('catalog')
@@ -0,0 +1,189 @@
+from flask import current_app, session
+from flask_login import current_user, user_logged_in, user_logged_out
+from sqlalchemy import case, delete, func, insert, literal, select, update
+from sqlalchemy.orm import joinedload
+from database import db, upsert
+from models import CartItem, Product
+
+SESSION_KEY = 'cart'
+BACKENDS = ('database', 'session')
+
+
+class CartLine:
+    """A product and its quantity in a session cart; has the CartItem fields templates and checkout use."""
+    id = None
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.product_id = product.id
+        self.quantity = quantity
+
+
+def _add_quantities(user_id, quantities):
+    """
+    Adds `quantities` ({product_id: quantity}) to the user's cart with one
+    INSERT ... SELECT that adds to lines already in the cart. Products that no
+    longer exist are skipped. Does not commit.
+    """
+    table = CartItem.__table__
+    rows = (select(literal(user_id, db.Integer).label('user_id'), Product.id.label('product_id'),
+                   case(quantities, value=Product.id).label('quantity'))
+            .where(Product.id.in_(list(quantities))))
+    stmt = upsert(table, ['user_id', 'product_id'], rows=rows,
+                  update=lambda new: {'quantity': table.c.quantity + new.quantity})
+    if stmt is None:
+        existing = set(db.session.scalars(select(CartItem.product_id).where(
+            CartItem.user_id == user_id, CartItem.product_id.in_(list(quantities)))))
+        if existing:
+            db.session.execute(update(CartItem).where(CartItem.user_id == user_id,
+                                                      CartItem.product_id.in_(existing))
+                               .values(quantity=CartItem.quantity + case(quantities, value=CartItem.product_id)),
+                               execution_options={'synchronize_session': False})
+        new = {pid: qty for pid, qty in quantities.items() if pid not in existing}
+        if not new:
+            return
+        stmt = insert(table).from_select(['user_id', 'product_id', 'quantity'],
+                                         rows.where(Product.id.in_(list(new))))
+    db.session.execute(stmt)
+
+
+class DatabaseCart:
+    """
+    Cart of a signed-in user in the cart_item table. Every change is a single
+    statement (plus its commit), and the lines survive across devices.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    def lines(self):
+        """The cart items with their products, in one query."""
+        return (CartItem.query.filter_by(user_id=self.user_id)
+                .options(joinedload(CartItem.product))
+                .order_by(CartItem.id)
+                .all())
+
+    def count(self):
+        return db.session.scalar(select(func.count()).select_from(CartItem).where(CartItem.user_id == self.user_id))
+
+    def add(self, product_id, quantity):
+        _add_quantities(self.user_id, {product_id: quantity})
+        db.session.commit()
+        return True
+
+    def set_quantity(self, product_id, quantity):
+        """Sets the quantity of a product already in the cart; returns False if it is not."""
+        result = db.session.execute(update(CartItem).where(CartItem.user_id == self.user_id,
+                                                           CartItem.product_id == product_id)
+                                    .values(quantity=quantity), execution_options={'synchronize_session': False})
+        db.session.commit()
+        return result.rowcount > 0
+
+    def remove(self, product_id):
+        result = db.session.execute(delete(CartItem).where(CartItem.user_id == self.user_id,
+                                                           CartItem.product_id == product_id),
+                                    execution_options={'synchronize_session': False})
+        db.session.commit()
+        return result.rowcount > 0
+
+    def checked_out(self):
+        pass  # place_order deletes the ordered lines in the order's transaction
+
+
+class SessionCart:
+    """
+    Cart kept in the signed session cookie as {product id: quantity}: changing
+    it never touches the database, and reading it costs one product query.
+    Holds at most CART_SESSION_MAX_ITEMS products to keep the cookie small.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def quantities(self):
+        return {int(pid): qty for pid, qty in self.session.get(SESSION_KEY, {}).items()}
+
+    def _save(self, quantities):
+        if quantities:
+            self.session[SESSION_KEY] = {str(pid): qty for pid, qty in quantities.items()}
+        else:
+            self.session.pop(SESSION_KEY, None)
+
+    def lines(self):
+        quantities = self.quantities()
+        if not quantities:
+            return []
+        products = Product.query.filter(Product.id.in_(list(quantities))).order_by(Product.id).all()
+        return [CartLine(product, quantities[product.id]) for product in products]
+
+    def count(self):
+        return len(self.session.get(SESSION_KEY, ()))
+
+    def add(self, product_id, quantity):
+        """Adds to the cart; returns False if the cart is full."""
+        quantities = self.quantities()
+        if product_id not in quantities and len(quantities) >= current_app.config['CART_SESSION_MAX_ITEMS']:
+            return False
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        self._save(quantities)
+        return True
+
+    def set_quantity(self, product_id, quantity):
+        quantities = self.quantities()
+        if product_id not in quantities:
+            return False
+        quantities[product_id] = quantity
+        self._save(quantities)
+        return True
+
+    def remove(self, product_id):
+        quantities = self.quantities()
+        if quantities.pop(product_id, None) is None:
+            return False
+        self._save(quantities)
+        return True
+
+    def checked_out(self):
+        self._save({})
+
+
+def get_cart():
+    """
+    The current visitor's cart. Anonymous visitors always get the session
+    cart; signed-in users get the CART_BACKEND one ('database' keeps their
+    cart in cart_item, 'session' keeps it in the cookie until checkout).
+    """
+    if current_user.is_authenticated and current_app.config['CART_BACKEND'] == 'database':
+        return DatabaseCart(current_user.id)
+    return SessionCart(session)
+
+
+def cart_count():
+    """Number of products in the current visitor's cart, for the navigation bar."""
+    return get_cart().count()
+
+
+def _merge_session_cart(app, user):
+    # Everything put in the cart before signing in is added to the user's cart
+    # with one batched upsert, however many products it holds.
+    if app.config['CART_BACKEND'] != 'database':
+        return
+    cart = SessionCart(session)
+    quantities = cart.quantities()
+    if quantities:
+        _add_quantities(user.id, quantities)
+        db.session.commit()
+        cart.checked_out()
+
+
+def _forget_session_cart(app, user):
+    # A session cart of a signed-in user must not be left to whoever uses the browser next.
+    SessionCart(session).checked_out()
+
+
+def init_app(app):
+    if app.config['CART_BACKEND'] not in BACKENDS:
+        raise RuntimeError(f"CART_BACKEND must be one of {', '.join(BACKENDS)}, not {app.config['CART_BACKEND']!r}")
+    user_logged_in.connect(_merge_session_cart, app)
+    user_logged_out.connect(_forget_session_cart, app)
+    app.add_template_global(cart_count)
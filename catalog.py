@@ -0,0 +1,164 @@
+import base64
+import json
+from collections import namedtuple
+from sqlalchemy import and_, or_, literal_column, select
+from database import db
+from models import Product
+from cache import cached, invalidate
+
+# sort key -> (column, descending). The primary key is always appended as a
+# tie-breaker, so (column, id) is unique and can be used as a keyset cursor.
+SORTS = {
+    'newest': (Product.id, True),
+    'price_asc': (Product.price, False),
+    'price_desc': (Product.price, True),
+    'name': (Product.name, False),
+}
+DEFAULT_SORT = 'newest'
+# Value types a cursor may hold for each sort key.
+CURSOR_TYPES = {'id': (int,), 'price': (int, float), 'name': (str,)}
+
+
+class CatalogPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """
+    Returns the list of values for `keys` stored in the cursor, or None if the
+    cursor is missing or malformed (in which case the first page is shown).
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(keys):
+        return None
+    for key, value in zip(keys, values):
+        if isinstance(value, bool) or not isinstance(value, CURSOR_TYPES[key.key]):
+            return None
+    return values
+
+
+def _sort_keys(sort):
+    column, descending = SORTS.get(sort, SORTS[DEFAULT_SORT])
+    keys = [column] if column is Product.id else [column, Product.id]
+    return keys, descending
+
+
+def _after(keys, values, descending):
+    """
+    Builds the "row comes after the cursor" predicate for the given keys as
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) ..., which every backend can answer
+    with a range scan on the matching composite index.
+    """
+    clauses = []
+    for i, key in enumerate(keys):
+        step = key < values[i] if descending else key > values[i]
+        clauses.append(and_(*[keys[j] == values[j] for j in range(i)], step))
+    return or_(*clauses)
+
+
+def catalog_query(sort=DEFAULT_SORT, min_price=None, max_price=None, in_stock=False):
+    keys, descending = _sort_keys(sort)
+    query = Product.query
+    if in_stock:
+        # Literal comparison so the planner can match the partial indexes.
+        query = query.filter(Product.stock > literal_column('0'))
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    return query.order_by(*[k.desc() if descending else k.asc() for k in keys])
+
+
+def catalog_page(sort=DEFAULT_SORT, min_price=None, max_price=None, in_stock=False,
+                 cursor=None, per_page=24):
+    """
+    Returns one page of the catalog using keyset pagination. Each call issues a
+    single LIMIT query that starts right after the cursor, so the cost of a page
+    does not depend on how deep into the catalog it is.
+    """
+    keys, descending = _sort_keys(sort)
+    query = catalog_query(sort, min_price, max_price, in_stock)
+    values = decode_cursor(cursor, keys)
+    if values is not None:
+        query = query.filter(_after(keys, values, descending))
+
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, k.key) for k in keys])
+    return CatalogPage(items, next_cursor)
+
+
+def parse_catalog_args(args, default_per_page=24, max_per_page=100):
+    """
+    Reads catalog filters from a request's query string, ignoring bad values.
+    """
+    sort = args.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    per_page = args.get('per_page', default_per_page, type=int)
+    per_page = max(1, min(per_page, max_per_page))
+    return {
+        'sort': sort,
+        'min_price': args.get('min_price', type=float),
+        'max_price': args.get('max_price', type=float),
+        'in_stock': args.get('in_stock') in ('1', 'true', 'on'),
+        'cursor': args.get('cursor'),
+        'per_page': per_page,
+    }
+
+
+# Detached, picklable copy of a product row that can live in the cache.
+ProductSnapshot = namedtuple('ProductSnapshot', 'id name description price stock image_url image_key updated_at')
+
+
+def product_updated_at(product_id):
+    """
+    The product's updated_at as stored in the database, or None if it does not
+    exist. Every write to a product row changes it, so unlike the cached
+    snapshots it is the same in every worker.
+    """
+    return db.session.scalar(select(Product.updated_at).where(Product.id == product_id))
+
+
+def get_product_snapshot(product_id, updated_at=None):
+    """
+    Returns a cached ProductSnapshot for the product, or None if it does not
+    exist. Given the row's current `updated_at`, a snapshot cached before that
+    change (possibly by another worker's write) is reloaded.
+    """
+    def load():
+        product = db.session.get(Product, product_id)
+        if product is None:
+            return None
+        return ProductSnapshot(product.id, product.name, product.description,
+                               product.price, product.stock, product.image_url, product.image_key,
+                               product.updated_at)
+    snapshot = cached('product', product_id, load)
+    if snapshot is not None and updated_at is not None and snapshot.updated_at != updated_at:
+        invalidate('product', product_id)
+        snapshot = cached('product', product_id, load)
+    return snapshot
+
+
+def catalog_cache_key(filters):
+    return json.dumps(filters, sort_keys=True, separators=(',', ':'))
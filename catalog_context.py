@@ -0,0 +1,132 @@
+import threading
+import time
+from flask import current_app
+from sqlalchemy import func, literal_column
+from database import db
+from models import Product
+from cache import products_changed
+import search
+
+# Rough size of a token for budgeting purposes; good enough to keep prompts
+# bounded without pulling in a tokenizer.
+CHARS_PER_TOKEN = 4
+DESCRIPTION_CHARS = 80
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_product(product):
+    line = f"- {product.name}: ${product.price:.2f}, {product.stock} in stock"
+    if product.description:
+        description = product.description.strip().replace('\n', ' ')
+        if len(description) > DESCRIPTION_CHARS:
+            description = description[:DESCRIPTION_CHARS - 3].rstrip() + '...'
+        line += f" ({description})"
+    return line
+
+
+class CatalogSnapshot:
+    def __init__(self, version, summary, featured):
+        self.version = version
+        self.summary = summary
+        self.featured = featured
+
+
+class CatalogContextBuilder:
+    """
+    Builds the product part of the chatbot prompt. Instead of listing the
+    whole catalog, it keeps a small precomputed snapshot (catalog summary and
+    a few featured products) that is rebuilt only after products change, and
+    adds the `top_k` products most relevant to the user's message from the
+    search index, ranking at most `max_candidates` matches. The result always
+    fits in `token_budget` tokens, so prompt size and build time do not grow
+    with the catalog.
+    """
+
+    def __init__(self, top_k=8, featured=5, token_budget=600, max_age=60, max_candidates=1000):
+        self.top_k = top_k
+        self.max_candidates = max_candidates
+        self.featured = featured
+        self.token_budget = token_budget
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._built_at = 0.0
+        self._version = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def snapshot(self):
+        """
+        Returns the current snapshot, rebuilding it if products changed in this
+        process or it is older than `max_age` seconds (changes made by other
+        worker processes are picked up that way).
+        """
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._built_at > self.max_age:
+                self._version += 1
+                self._snapshot = self._build_snapshot(self._version)
+                self._built_at = time.monotonic()
+            return self._snapshot
+
+    def _build_snapshot(self, version):
+        count, min_price, max_price = db.session.query(
+            func.count(Product.id), func.min(Product.price), func.max(Product.price)
+        ).one()
+        if not count:
+            return CatalogSnapshot(version, "There are currently no products available in the shop.", [])
+        summary = (f"The shop sells {count} products priced from ${min_price:.2f} to ${max_price:.2f}. "
+                   "Only the products listed below are relevant to this question; "
+                   "ask the customer to search the shop for anything else.")
+        featured = (Product.query.filter(Product.stock > literal_column('0'))
+                    .order_by(Product.id.desc()).limit(self.featured).all())
+        return CatalogSnapshot(version, summary, [format_product(p) for p in featured])
+
+    def relevant_lines(self, message):
+        if not message:
+            return []
+        products = search.search_products(message, limit=self.top_k, match_all=False,
+                                          max_candidates=self.max_candidates)
+        return [format_product(p) for p in products]
+
+    def build(self, message=None):
+        snapshot = self.snapshot()
+        if not snapshot.featured:
+            return snapshot.summary
+
+        header = "Here is a list of relevant products:"
+        lines = self.relevant_lines(message)
+        # Fill up with featured products, skipping ones already listed.
+        lines += [line for line in snapshot.featured if line not in lines]
+
+        parts = [snapshot.summary, header]
+        used = sum(estimate_tokens(p) for p in parts)
+        for line in lines:
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            parts.append(line)
+            used += cost
+        return '\n'.join(parts)
+
+
+def init_app(app):
+    builder = CatalogContextBuilder(
+        top_k=app.config['CHATBOT_CONTEXT_TOP_K'],
+        token_budget=app.config['CHATBOT_CONTEXT_TOKENS'],
+    )
+    app.extensions['catalog_context'] = builder
+    products_changed.connect(_on_products_changed, sender=app)
+    return builder
+
+
+def _on_products_changed(app, product_ids, listing_changed):
+    app.extensions['catalog_context'].invalidate()
+
+
+def build_catalog_context(message=None):
+    return current_app.extensions['catalog_context'].build(message)
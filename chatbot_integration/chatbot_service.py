@@ -1,34 +1,200 @@
+import hashlib
+import json
+import logging
 import os
-from openai import OpenAI
+import re
+import threading
+import time
+from collections import OrderedDict
+import httpx
+from openai import OpenAI, OpenAIError
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://router.huggingface.co/v1"
+DEFAULT_MODEL = "katanemo/Arch-Router-1.5B"
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class ChatbotBusy(Exception):
+    """Raised when no request slot frees up within the queue timeout."""
+
+
+class AnswerCache:
+    """
+    Bounded LRU cache of chatbot answers. A question hits the cache when its
+    normalized text matches a stored one exactly, or when its word set is at
+    least `similarity` similar (Jaccard) to a stored question asked in the same
+    context, so trivially rephrased repeats ("do you sell mice?" vs "Do you
+    sell mice") do not call the model again.
+    """
+
+    def __init__(self, max_entries=500, ttl=600, similarity=0.85):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries = OrderedDict()  # (context_key, normalized question) -> (words, answer, expires_at)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def normalize(question):
+        return ' '.join(WORD_RE.findall(question.lower()))
+
+    def get(self, context_key, question):
+        normalized = self.normalize(question)
+        words = frozenset(normalized.split())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((context_key, normalized))
+            if entry is None and words and self.similarity < 1:
+                for (ctx, _), candidate in reversed(self._entries.items()):
+                    if ctx != context_key or candidate[2] < now:
+                        continue
+                    union = len(words | candidate[0])
+                    if union and len(words & candidate[0]) / union >= self.similarity:
+                        entry = candidate
+                        break
+            if entry is None or entry[2] < now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, context_key, question, answer):
+        normalized = self.normalize(question)
+        with self._lock:
+            key = (context_key, normalized)
+            self._entries[key] = (frozenset(normalized.split()), answer, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
 class ChatbotService:
-    def __init__(self):
-        # TODO: 1. SOLIS - API atslēgas ielāde
-        # load_dotenv(), lai ielādētu mainīgos no .env faila.
-        # os.getenv(), lai nolasītu "HUGGINGFACE_API_KEY".
+    """
+    Talks to an OpenAI-compatible chat completions API (Hugging Face router by
+    default). One pooled HTTP client is shared by all requests, at most
+    `max_concurrency` model calls run at the same time (others wait up to
+    `queue_timeout` seconds for a slot) and repeated questions are answered
+    from an AnswerCache.
+    """
+
+    def __init__(self, api_key=None, base_url=None, model=None, timeout=30.0, max_concurrency=8,
+                 queue_timeout=5.0, max_tokens=512, cache=None):
+        load_dotenv()
+        self.api_key = api_key or os.getenv("HUGGINGFACE_API_KEY")
+        self.base_url = base_url or os.getenv("CHATBOT_BASE_URL") or DEFAULT_BASE_URL
+        self.model = model or os.getenv("CHATBOT_MODEL") or DEFAULT_MODEL
+        self.max_tokens = max_tokens
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.cache = cache if cache is not None else AnswerCache()
 
-        # TODO: 2. SOLIS - OpenAI klienta inicializācija izmantojot "katanemo/Arch-Router-1.5B" modeli
-        self.client = None
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._client_lock = threading.Lock()
+        self._http_client = None
+        self._client = None
 
-        # TODO: 3. SOLIS - Sistēmas instrukcijas definēšana
         self.system_instruction = (
+            "You are a helpful shopping assistant for an online electronics shop. "
+            "Answer briefly and only recommend products from the catalog below. "
+            "If a product is not in the catalog, say that the shop does not sell it."
         )
 
-    def get_chatbot_response(self, user_message, chat_history=None):
-        if chat_history is None:
-            chat_history = []
-            
-        # TODO: 4. SOLIS - Ziņojumu saraksta izveide masīvā
-        # Tajā jābūt sistēmas instrukcijai, visai sarunas vēsture un pēdējai lietotāja ziņa.
-        # 1. Sistēmas instrukcija (role: "system")
-        # 2. Visa iepriekšējā sarunas vēsture (izmantojot .extend(), lai pievienotu visus elementus no chat_history)
-        # 3. Pēdējā lietotāja ziņa (role: "user")
-        
-        # TODO: 5. SOLIS - HF API izsaukums ar OpenAI bibliotēku, izmantojot chat.completions.create().
-        
-        # TODO: 6. SOLIS - Atbildes apstrāde un atgriešana
-        # chat.completions.create() atgriež objektu ar "choices" sarakstu, tajā jāparbauda, vai ir pieejama atbilde
-
-        # Pagaidu atbilde, kas jāaizvieto ar reālo API atbildi tiklīdz būs implementēts.
-        return {"response": "AI API response is not implemented yet."}
+    @property
+    def client(self):
+        """
+        The OpenAI client, created on first use so that app startup does not pay
+        for setting up the HTTP stack. None when no API key is configured.
+        """
+        if self._client is None and self.api_key:
+            with self._client_lock:
+                if self._client is None:
+                    # A single keep-alive connection pool reused by every request,
+                    # sized to the concurrency limit so calls never wait on the pool.
+                    self._http_client = httpx.Client(
+                        timeout=httpx.Timeout(self.timeout, connect=5.0),
+                        limits=httpx.Limits(max_connections=self.max_concurrency,
+                                            max_keepalive_connections=self.max_concurrency),
+                    )
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          http_client=self._http_client, max_retries=1)
+        return self._client
+
+    def build_messages(self, user_message, chat_history=None, context=None):
+        system = self.system_instruction
+        if context:
+            system = f"{system}\n\n{context}"
+        messages = [{"role": "system", "content": system}]
+        messages.extend(chat_history or [])
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    @staticmethod
+    def _context_key(context, chat_history):
+        raw = json.dumps([context or '', chat_history or []], sort_keys=True)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ChatbotBusy("The assistant is busy right now, please try again in a moment.")
+
+    def get_chatbot_response(self, user_message, chat_history=None, context=None):
+        return {"response": ''.join(self.stream_chatbot_response(user_message, chat_history, context))}
+
+    def stream_chatbot_response(self, user_message, chat_history=None, context=None):
+        """
+        Yields the answer in pieces as the model produces them. Cached answers
+        are yielded in one piece. Raises ChatbotBusy when the queue is full.
+        """
+        if not self.api_key:
+            yield "The assistant is not configured (missing HUGGINGFACE_API_KEY)."
+            return
+
+        context_key = self._context_key(context, chat_history)
+        cached = self.cache.get(context_key, user_message)
+        if cached is not None:
+            yield cached
+            return
+
+        self._acquire()
+        parts, stream = [], None
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=self.build_messages(user_message, chat_history, context),
+                max_tokens=self.max_tokens,
+                stream=True,
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except OpenAIError as e:
+            logger.warning("Chatbot API call failed: %s", e)
+            if not parts:
+                yield "Sorry, I could not reach the assistant. Please try again later."
+            return
+        finally:
+            # Also reached when the client disconnects mid-answer: the
+            # connection goes back to the pool instead of staying checked out.
+            # (The pinned openai Stream has no close() of its own.)
+            if stream is not None:
+                stream.response.close()
+            self._slots.release()
+
+        if parts:
+            self.cache.set(context_key, user_message, ''.join(parts))
+
+    def close(self):
+        if self._http_client is not None:
+            self._http_client.close()
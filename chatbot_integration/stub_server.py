@@ -0,0 +1,104 @@
+"""
+Minimal OpenAI-compatible chat completions server for local development and
+load testing of the chatbot without an API key.
+
+    python chatbot_integration/stub_server.py --port 8001 --delay 0.02
+    CHATBOT_BASE_URL=http://127.0.0.1:8001/v1 python app.py
+
+It answers every request by echoing the last user message word by word,
+optionally sleeping `delay` seconds per streamed token to imitate a model.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _answer(messages):
+    last = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+    return f'You asked about: {last}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+    requests_served = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with StubHandler._lock:
+            StubHandler.requests_served += 1
+        answer = _answer(body.get('messages', []))
+        model = body.get('model', 'stub')
+        if body.get('stream'):
+            self._stream(answer, model)
+        else:
+            self._complete(answer, model)
+
+    def _complete(self, answer, model):
+        time.sleep(self.delay * len(answer.split()))
+        payload = json.dumps({
+            'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': answer}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, answer, model):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        words = answer.split(' ')
+        for i, word in enumerate(words):
+            time.sleep(self.delay)
+            chunk = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'finish_reason': None,
+                                                  'delta': {'content': word if i == 0 else ' ' + word}}]}
+            self._write_chunk(f'data: {json.dumps(chunk)}\n\n')
+        self._write_chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+
+def serve(host='127.0.0.1', port=0, delay=0.0):
+    """
+    Starts the stub server in a background thread and returns it; the bound
+    port is available as `server.server_address[1]`.
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'delay': delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stub OpenAI-compatible chat server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.02, help='seconds per streamed token')
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.delay)
+    print(f'Stub chat server on http://{args.host}:{server.server_address[1]}/v1')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
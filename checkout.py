@@ -0,0 +1,136 @@
+import time
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.exc import OperationalError
+from database import db
+from cache import notify_products_changed
+from models import Product, CartItem, Order, OrderItem
+from orders import order_placed
+
+RESERVE_BATCH_SIZE = 200
+LOCK_RETRIES = 5
+
+
+class CheckoutResult:
+    def __init__(self, order=None, failed=None, sold_out=None):
+        self.order = order
+        self.failed = failed or []
+        self.sold_out = sold_out or []
+
+    @property
+    def ok(self):
+        return self.order is not None
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _reserve_batch(quantities):
+    """
+    Decrements stock for every product in `quantities` ({product_id: qty}) with
+    one conditional UPDATE. Rows without enough stock are left untouched by
+    the WHERE clause, so no other transaction can observe or cause an oversell.
+    Returns {product_id: (price, remaining stock)} for the rows that were reserved.
+    """
+    qty = case(quantities, value=Product.id)
+    stmt = (update(Product)
+            .where(Product.id.in_(list(quantities)), Product.stock >= qty)
+            .values(stock=Product.stock - qty))
+    options = {'synchronize_session': False}
+    if db.engine.dialect.update_returning:
+        rows = db.session.execute(stmt.returning(Product.id, Product.price, Product.stock),
+                                  execution_options=options)
+        return {r.id: (r.price, r.stock) for r in rows}
+    result = db.session.execute(stmt, execution_options=options)
+    if result.rowcount != len(quantities):
+        # Without RETURNING we cannot tell which rows matched; report the
+        # whole batch as failed and let the caller roll back.
+        return {}
+    rows = db.session.execute(
+        select(Product.id, Product.price, Product.stock).where(Product.id.in_(list(quantities)))
+    )
+    return {r.id: (r.price, r.stock) for r in rows}
+
+
+def _describe_failures(quantities, failed_ids):
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.stock).where(Product.id.in_(failed_ids))
+    )
+    found = {r.id: r for r in rows}
+    failed = []
+    for product_id in failed_ids:
+        row = found.get(product_id)
+        available = row.stock if row is not None else 0
+        if row is not None and available >= quantities[product_id]:
+            continue  # only reachable on backends without RETURNING
+        failed.append({
+            'product_id': product_id,
+            'name': row.name if row is not None else None,
+            'requested': quantities[product_id],
+            'available': available,
+        })
+    return failed or [{'product_id': pid, 'name': None, 'requested': quantities[pid], 'available': None}
+                      for pid in failed_ids]
+
+
+def _place_order(user_id, cart_item_ids, quantities):
+    reserved_rows = {}
+    product_ids = list(quantities)
+    for batch in _batches(product_ids, RESERVE_BATCH_SIZE):
+        reserved = _reserve_batch({pid: quantities[pid] for pid in batch})
+        missing = [pid for pid in batch if pid not in reserved]
+        if missing:
+            db.session.rollback()
+            return CheckoutResult(failed=_describe_failures(quantities, missing))
+        reserved_rows.update(reserved)
+
+    prices = {pid: price for pid, (price, _) in reserved_rows.items()}
+    total_amount = sum(prices[pid] * qty for pid, qty in quantities.items())
+    order = Order(user_id=user_id, total_amount=total_amount, status='Pending')
+    db.session.add(order)
+    db.session.flush()
+
+    db.session.execute(insert(OrderItem), [
+        {'order_id': order.id, 'product_id': pid, 'quantity': qty, 'price': prices[pid]}
+        for pid, qty in quantities.items()
+    ])
+    db.session.execute(
+        delete(CartItem).where(CartItem.user_id == user_id, CartItem.id.in_(cart_item_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    # Confirmation and other follow-up work runs in the background; queueing it
+    # here means it exists if and only if the order was committed.
+    order_placed(order.id, {pid: stock for pid, (_, stock) in reserved_rows.items()})
+    db.session.commit()
+    sold_out = [pid for pid, (_, stock) in reserved_rows.items() if stock <= 0]
+    # Stock shown on product pages changed; listings only change when an item
+    # sold out and drops out of the in-stock filter.
+    notify_products_changed(product_ids, listing_changed=bool(sold_out))
+    return CheckoutResult(order=order, sold_out=sold_out)
+
+
+def place_order(user_id, cart_items):
+    """
+    Turns the given cart items into an order in a single transaction: stock is
+    reserved with batched conditional UPDATEs, order lines are bulk inserted and
+    the cart rows are deleted with one statement. If any product lacks stock,
+    nothing is written and the result lists the failed items.
+    """
+    # Read everything needed from the ORM objects up front: a rollback expires
+    # them and re-reading would cost one query per item.
+    cart_item_ids = [item.id for item in cart_items]
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return _place_order(user_id, cart_item_ids, quantities)
+        except OperationalError as e:
+            db.session.rollback()
+            # SQLite reports write contention as "database is locked"; back off
+            # and retry, the reservation logic itself is idempotent on rollback.
+            if 'locked' not in str(e).lower() or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(0.01 * 2 ** attempt)
@@ -0,0 +1,179 @@
+import sys
+import time
+from datetime import datetime, timedelta
+import click
+from product_io import import_products, export_products, detect_format, FORMATS
+import migrate
+import images
+import assets
+import jobs
+import analytics
+from database import db
+from models import Product
+
+
+def _open(path, mode, encoding):
+    if path == '-':
+        return open((sys.stdin if 'r' in mode else sys.stdout).fileno(), mode, encoding=encoding,
+                    newline='', closefd=False)
+    return open(path, mode, encoding=encoding, newline='')
+
+
+def register_commands(app):
+    """Registers the shop's `flask` CLI commands on the app."""
+
+    @app.cli.command('import-products')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction.')
+    def import_products_command(path, fmt, batch_size):
+        """Stream products from a CSV or JSONL file and upsert them in batches."""
+        fmt = fmt or detect_format(path)
+
+        def progress(report):
+            click.echo(f'\r{report.processed} rows read, {report.inserted} inserted, '
+                       f'{report.updated} updated, {report.error_count} rejected', nl=False, err=True)
+
+        with _open(path, 'r', 'utf-8-sig') as stream:
+            report = import_products(stream, fmt, batch_size=batch_size, progress=progress)
+        click.echo(err=True)
+        click.echo('Waiting for product images to be fetched...', err=True)
+        images.get_ingestor().drain()
+        for error in report.errors:
+            click.echo(error, err=True)
+        if report.error_count > len(report.errors):
+            click.echo(f'... and {report.error_count - len(report.errors)} more rejected rows', err=True)
+
+    @app.cli.command('export-products')
+    @click.argument('path', default='-', type=click.Path(dir_okay=False, allow_dash=True))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows read per query batch.')
+    def export_products_command(path, fmt, batch_size):
+        """Stream the catalog to a CSV or JSONL file (or stdout)."""
+        fmt = fmt or detect_format(path)
+        with _open(path, 'w', 'utf-8') as out:
+            for chunk in export_products(fmt, batch_size=batch_size):
+                out.write(chunk)
+
+    @app.cli.command('ingest-images')
+    @click.option('--all', 'everything', is_flag=True, help='Also refetch images that are already stored.')
+    def ingest_images_command(everything):
+        """Fetch and resize product images that are not stored locally yet."""
+        query = db.select(Product.id, Product.image_url).where(Product.image_url.isnot(None))
+        if not everything:
+            query = query.where(Product.image_key.is_(None))
+        pending = db.session.execute(query).all()
+        db.session.close()  # end the read transaction so the final count sees the workers' commits
+        for product_id, url in pending:
+            images.enqueue(product_id, url)
+        click.echo(f'Fetching {len(pending)} images...')
+        images.get_ingestor().drain()
+        stored = db.session.scalar(db.select(db.func.count()).where(Product.image_key.isnot(None)))
+        click.echo(f'{stored} products have a stored image.')
+
+    @app.cli.group('jobs')
+    def jobs_group():
+        """Run and inspect background jobs."""
+
+    @jobs_group.command('worker')
+    @click.option('--threads', type=int, help='Worker threads (default: JOB_WORKER_THREADS).')
+    @click.option('--burst', is_flag=True, help='Run the jobs that are due now, then exit.')
+    def jobs_worker(threads, burst):
+        """Process background jobs until interrupted."""
+        worker = jobs.get_worker()
+        worker.autostart = False
+        if burst:
+            click.echo(f'Ran {worker.run_until_idle()} jobs.')
+            return
+        if threads:
+            worker.threads = threads
+        worker.start()
+        click.echo(f'Job worker {worker.name} running with {worker.threads} threads; Ctrl+C to stop.')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            click.echo('Stopping after the running jobs finish...')
+            worker.stop()
+
+    @jobs_group.command('status')
+    def jobs_status():
+        """Show job counts by task and status."""
+        stats = jobs.stats()
+        click.echo(f'{"task":<20}' + ''.join(f'{s:>9}' for s in jobs.STATUSES))
+        for name, counts in sorted(stats['tasks'].items()):
+            click.echo(f'{name:<20}' + ''.join(f'{counts[s]:>9}' for s in jobs.STATUSES))
+        click.echo(f'Oldest due job has waited {stats["oldest_due_seconds"]:.1f}s.')
+
+    @jobs_group.command('retry')
+    @click.argument('job_ids', nargs=-1, type=int)
+    def jobs_retry(job_ids):
+        """Requeue failed jobs (all failed jobs unless ids are given)."""
+        click.echo(f'Requeued {jobs.retry(list(job_ids) or None)} jobs.')
+
+    @jobs_group.command('purge')
+    @click.option('--days', default=7, show_default=True, help='Keep jobs finished within this many days.')
+    def jobs_purge(days):
+        """Delete completed jobs (their idempotency keys can then be reused)."""
+        click.echo(f'Deleted {jobs.purge(datetime.utcnow() - timedelta(days=days))} jobs.')
+
+    @app.cli.group('analytics')
+    def analytics_group():
+        """Maintain the sales rollups behind the admin reports."""
+
+    @analytics_group.command('refresh')
+    def analytics_refresh():
+        """Add orders placed since the last refresh to the rollups."""
+        click.echo(f'Rollups include orders up to #{analytics.refresh()}.')
+
+    @analytics_group.command('backfill')
+    @click.option('--since', type=click.DateTime(['%Y-%m-%d']), help='Only recompute days from this date on.')
+    def analytics_backfill(since):
+        """Recompute the rollups from the order history."""
+        started = time.perf_counter()
+        last = analytics.backfill(since.date() if since else None)
+        click.echo(f'Rollups rebuilt up to order #{last} in {time.perf_counter() - started:.1f}s.')
+
+    @app.cli.group('assets')
+    def assets_group():
+        """Build the fingerprinted CSS and JavaScript files."""
+
+    @assets_group.command('build')
+    @click.option('--clean', is_flag=True, help='Remove files of earlier builds first.')
+    def assets_build(clean):
+        """Minify, fingerprint and precompress the static CSS and JavaScript."""
+        output_dir = app.extensions['assets'].directory
+        manifest = assets.build(app.static_folder, output_dir, clean=clean, log=click.echo)
+        click.echo(f'Built {len(manifest)} assets into {output_dir}; restart the app to serve them.')
+
+    @app.cli.group('db')
+    def db_group():
+        """Manage the database schema."""
+
+    @db_group.command('upgrade')
+    @click.option('--to', 'target', type=int, help='Target version (default: latest).')
+    def db_upgrade(target):
+        """Apply pending schema migrations."""
+        version = migrate.upgrade(target, log=click.echo)
+        click.echo(f'Schema is at version {version}.')
+
+    @db_group.command('downgrade')
+    @click.option('--to', 'target', type=int, help='Target version (default: one step back).')
+    def db_downgrade(target):
+        """Revert schema migrations."""
+        if target is None:
+            target = max(migrate.status()[0] - 1, 0)
+        try:
+            version = migrate.downgrade(target, log=click.echo)
+        except migrate.MigrationError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Schema is at version {version}.')
+
+    @db_group.command('status')
+    def db_status():
+        """Show applied and pending migrations."""
+        version, migrations = migrate.status()
+        for migration, applied in migrations:
+            click.echo(f'[{"x" if applied else " "}] {migration.version:04d} {migration.name}: '
+                       f'{migration.description}')
+        click.echo(f'Schema is at version {version}.')
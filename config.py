@@ -3,4 +3,79 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///eshop.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read replica for views marked @use_replica; writes always go to DATABASE_URL.
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS') or 5)
+    # Connection pool for server databases (PostgreSQL, MySQL); ignored for SQLite.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT') or 10)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    DB_POOL_PRE_PING = (os.environ.get('DB_POOL_PRE_PING') or '1') != '0'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')  # empty keeps the file's mode
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    # Werkzeug hash method; existing hashes are upgraded when their users log in.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    # Login attempts allowed per client address / per username within the window (0 disables).
+    LOGIN_RATE_LIMIT_PER_ADDRESS = int(os.environ.get('LOGIN_RATE_LIMIT_PER_ADDRESS') or 20)
+    LOGIN_RATE_LIMIT_PER_USERNAME = int(os.environ.get('LOGIN_RATE_LIMIT_PER_USERNAME') or 10)
+    LOGIN_RATE_LIMIT_WINDOW = int(os.environ.get('LOGIN_RATE_LIMIT_WINDOW') or 60)
+    CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE') or 24)
+    CATALOG_MAX_PAGE_SIZE = 100
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'  # auto, fts5 or memory
+    SEARCH_MEMORY_MAX_AGE = 300
+    SEARCH_PAGE_SIZE = 20
+    ORDER_HISTORY_PAGE_SIZE = 20
+    ORDERS_ADMIN_PAGE_SIZE = 50
+    # Where signed-in users' carts live: 'database' or 'session'; anonymous carts always use the session.
+    CART_BACKEND = os.environ.get('CART_BACKEND') or 'database'
+    CART_SESSION_MAX_ITEMS = int(os.environ.get('CART_SESSION_MAX_ITEMS') or 50)  # keeps the cookie small
+    # Per-request SQL statement budget, enforced in debug/testing mode only.
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET') or 20)
+    QUERY_BUDGET_ACTION = os.environ.get('QUERY_BUDGET_ACTION') or 'log'  # log or raise
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 200)  # 0 disables
+    SERVER_TIMING = os.environ.get('SERVER_TIMING') or 'admin'  # all, admin or off
+    # Part of every ETag; set a new value per deploy so template changes reach clients.
+    APP_RELEASE = os.environ.get('APP_RELEASE') or ''
+    HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE') or 60)
+    HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.environ.get('HTTP_CACHE_STALE_WHILE_REVALIDATE') or 300)
+    ASSETS_DIR = os.environ.get('ASSETS_DIR')  # built CSS/JS; defaults to static/build
+    IMAGE_DIR = os.environ.get('IMAGE_DIR')  # defaults to <instance folder>/images
+    IMAGE_SIZES = (96, 400, 1000)  # bounding box sizes in pixels
+    IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT') or 'webp'
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 4)
+    IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT') or 10)
+    IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES') or 10 * 1024 * 1024)
+    # 'thread' runs background jobs in each app process, 'none' leaves them to `flask jobs worker`.
+    JOB_WORKER = os.environ.get('JOB_WORKER') or 'thread'
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS') or 2)
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL') or 1)
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS') or 300)  # running jobs older than this are requeued
+    MAIL_SERVER = os.environ.get('MAIL_SERVER')  # mails are only logged when unset
+    MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') == '1'
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_SENDER = os.environ.get('MAIL_SENDER') or 'shop@localhost'
+    MAIL_TIMEOUT = float(os.environ.get('MAIL_TIMEOUT') or 10)
+    REORDER_THRESHOLD = int(os.environ.get('REORDER_THRESHOLD') or 5)
+    REORDER_NOTIFY_EMAIL = os.environ.get('REORDER_NOTIFY_EMAIL')
+    # Sales rollups are refreshed at most once per this many seconds after checkouts (0: only by CLI).
+    ANALYTICS_REFRESH_SECONDS = int(os.environ.get('ANALYTICS_REFRESH_SECONDS') or 10)
+    ANALYTICS_SETTLE_SECONDS = int(os.environ.get('ANALYTICS_SETTLE_SECONDS') or 5)  # longest checkout transaction
+    REPORT_MAX_DAYS = 366
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'  # memory, redis or null
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 10000)
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 300)
+    CHATBOT_BASE_URL = os.environ.get('CHATBOT_BASE_URL')  # defaults to the Hugging Face router
+    CHATBOT_MODEL = os.environ.get('CHATBOT_MODEL')
+    CHATBOT_TIMEOUT = float(os.environ.get('CHATBOT_TIMEOUT') or 30)
+    CHATBOT_MAX_CONCURRENCY = int(os.environ.get('CHATBOT_MAX_CONCURRENCY') or 8)
+    CHATBOT_QUEUE_TIMEOUT = float(os.environ.get('CHATBOT_QUEUE_TIMEOUT') or 5)
+    CHATBOT_CACHE_TTL = int(os.environ.get('CHATBOT_CACHE_TTL') or 600)
+    CHATBOT_CONTEXT_TOP_K = int(os.environ.get('CHATBOT_CONTEXT_TOP_K') or 8)
+    CHATBOT_CONTEXT_TOKENS = int(os.environ.get('CHATBOT_CONTEXT_TOKENS') or 600)
\ No newline at end of file
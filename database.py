@@ -1,3 +1,157 @@
+import time
+from functools import wraps
+from flask import g, has_request_context, request, session
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import Select, TextClause
 
-db = SQLAlchemy()
\ No newline at end of file
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    Sends SELECTs to the 'replica' bind while the current request runs a view
+    marked with @use_replica; everything else (flushes, INSERT/UPDATE/DELETE,
+    SELECT ... FOR UPDATE) goes to the primary database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _is_read(clause) and _replica_requested():
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_read(clause):
+    if isinstance(clause, Select):
+        return clause._for_update_arg is None
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == 'SELECT'
+    return False
+
+
+def _replica_requested():
+    return has_request_context() and g.get('db_bind') == REPLICA_BIND
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def use_replica(view):
+    """
+    Serves GET/HEAD requests of `view` from the read replica, unless this
+    client wrote something in the last REPLICA_STICKY_SECONDS (so users always
+    see their own changes despite replication lag). A no-op without
+    DATABASE_REPLICA_URL.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        if request.method in ('GET', 'HEAD') and session.get('_db_primary_until', 0) < time.time():
+            g.db_bind = REPLICA_BIND
+        return view(*args, **kwargs)
+    return decorated_function
+
+
+def upsert(table, keys, values=None, rows=None, update=None):
+    """
+    INSERT of `values` (or INSERT ... SELECT of `rows`) into `table` that does
+    not fail on rows conflicting on the unique columns `keys`. `update` is
+    given the proposed row's columns and returns the changes to make to the
+    existing row ({column: expression}); without it conflicting rows are
+    skipped. Returns the statement to execute, or None if the database has no
+    such statement and the caller must fall back to a select first.
+    """
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        stmt = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+    elif dialect in ('mysql', 'mariadb') and update is not None:
+        stmt = mysql.insert(table)
+    else:
+        return None
+    if rows is not None:
+        stmt = stmt.from_select([c.name for c in rows.selected_columns], rows)
+    else:
+        stmt = stmt.values(values)
+    if dialect in ('mysql', 'mariadb'):
+        return stmt.on_duplicate_key_update(update(stmt.inserted))
+    if update is None:
+        return stmt.on_conflict_do_nothing(index_elements=keys)
+    return stmt.on_conflict_do_update(index_elements=keys, set_=update(stmt.excluded))
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(db_session):
+    if has_request_context() and 'db_sticky_seconds' in g:
+        session['_db_primary_until'] = time.time() + g.db_sticky_seconds
+
+
+def _is_sqlite_file(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def _server_pool_options(config):
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def _sqlite_pragmas(config):
+    pragmas = [f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+               f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}"]
+    if config.get('SQLITE_JOURNAL_MODE'):
+        pragmas.insert(0, f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    return pragmas
+
+
+def _apply_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def engine_options(url, config):
+    """Engine options for `url`: pool settings for server databases only."""
+    if make_url(url).get_backend_name() == 'sqlite':
+        return {}
+    return _server_pool_options(config)
+
+
+def init_app(app):
+    """
+    Sets up db for the app's engine profile: pool sizing and pre-ping for
+    server databases, WAL journaling, busy_timeout and synchronous pragmas on
+    SQLite files, and an optional 'replica' bind (DATABASE_REPLICA_URL) used
+    by views decorated with @use_replica.
+    """
+    config = app.config
+    options = config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for key, value in engine_options(config['SQLALCHEMY_DATABASE_URI'], config).items():
+        options.setdefault(key, value)
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        binds = config.setdefault('SQLALCHEMY_BINDS', {})
+        binds.setdefault(REPLICA_BIND, {'url': replica_url, **engine_options(replica_url, config)})
+
+    db.init_app(app)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if _is_sqlite_file(engine.url):
+                _apply_pragmas(engine, _sqlite_pragmas(config))
+
+    @app.before_request
+    def remember_sticky_window():
+        if replica_url:
+            g.db_sticky_seconds = config['REPLICA_STICKY_SECONDS']
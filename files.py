@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+# Cache-Control of files whose URL changes whenever their content does.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def write_atomic(path, write):
+    """
+    Calls write(file) on a temporary file next to `path` and renames it into
+    place, so readers (and a running server) never see a partial file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            write(out)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
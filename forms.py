@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, FloatField, IntegerField
-from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, Length
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import SelectField, StringField, PasswordField, BooleanField, SubmitField, TextAreaField, FloatField, IntegerField
+from wtforms.validators import DataRequired, InputRequired, ValidationError, Email, EqualTo, Length, NumberRange
 from models import User, Product
 
 class LoginForm(FlaskForm):
@@ -35,9 +36,26 @@ class AddProductForm(FlaskForm):
     image_url = StringField('Image URL', validators=[DataRequired()])
     submit = SubmitField('Add Product')
 
+class ImportProductsForm(FlaskForm):
+    file = FileField('Product file (CSV or JSONL)', validators=[
+        FileRequired(), FileAllowed(['csv', 'jsonl', 'ndjson', 'json'], 'CSV or JSONL files only.')])
+    batch_size = IntegerField('Batch size', default=1000, validators=[NumberRange(min=1, max=10000)])
+    submit = SubmitField('Import')
+
 class AddToCartForm(FlaskForm):
     quantity = IntegerField('Quantity', validators=[DataRequired()])
     submit = SubmitField('Add to Cart')
 
+class CartQuantityForm(FlaskForm):
+    quantity = IntegerField('Quantity', validators=[InputRequired(), NumberRange(min=0, max=10000)])
+    submit = SubmitField('Update')
+
+class RemoveFromCartForm(FlaskForm):
+    submit = SubmitField('Remove')
+
+class OrderStatusForm(FlaskForm):
+    status = SelectField('Status', choices=[])  # choices are set by the view
+    submit = SubmitField('Update')
+
 class CheckoutForm(FlaskForm):
     pass
\ No newline at end of file
@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import select, update
+from database import db
+from models import CatalogVersion
+from cache import products_changed
+from carts import SESSION_KEY as CART_SESSION_KEY
+
+
+def catalog_version():
+    """Returns (version, updated_at) of the catalog listings, shared by all workers."""
+    row = db.session.execute(select(CatalogVersion.version, CatalogVersion.updated_at)
+                             .where(CatalogVersion.id == 1)).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def bump_catalog_version():
+    db.session.execute(update(CatalogVersion).where(CatalogVersion.id == 1)
+                       .values(version=CatalogVersion.version + 1, updated_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def _on_products_changed(app, product_ids, listing_changed):
+    # Stock-only changes (most checkouts) do not show up in listings, so they
+    # neither cost a write here nor invalidate clients' cached listings.
+    if listing_changed:
+        bump_catalog_version()
+
+
+def is_shareable():
+    """
+    True when the response to this request is the same for every anonymous
+    visitor and may be stored by browsers and shared caches. Visitors with
+    something in their session cart see its size in the page, so theirs is not.
+    """
+    return (request.method in ('GET', 'HEAD') and not current_user.is_authenticated
+            and '_flashes' not in session and CART_SESSION_KEY not in session)
+
+
+def make_etag(*parts):
+    raw = ':'.join(str(p) for p in (current_app.config['APP_RELEASE'],) + parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(etag, last_modified, render):
+    """
+    Answers 304 Not Modified when the client's validators match, otherwise
+    builds the response from render(). Either way the strong ETag,
+    Last-Modified and a public Cache-Control are set, so CDNs and reverse
+    proxies can serve and revalidate the page. Only use for is_shareable()
+    requests.
+    """
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response = make_response('', 304) if _not_modified(etag, last_modified) else make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    config = current_app.config
+    response.headers['Cache-Control'] = (f"public, max-age={config['HTTP_CACHE_MAX_AGE']}, "
+                                         f"stale-while-revalidate={config['HTTP_CACHE_STALE_WHILE_REVALIDATE']}")
+    response.vary.add('Cookie')
+    return response
+
+
+def init_app(app):
+    products_changed.connect(_on_products_changed, sender=app)
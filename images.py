@@ -0,0 +1,221 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+import httpx
+from flask import Blueprint, abort, current_app, send_from_directory, url_for
+from sqlalchemy import update
+from database import db
+from models import Product
+from cache import notify_products_changed
+from files import IMMUTABLE, write_atomic
+
+logger = logging.getLogger(__name__)
+
+images_bp = Blueprint('images', __name__)
+
+KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ImageError(Exception):
+    pass
+
+
+class ImageStore:
+    """
+    Content-addressed store of resized product images. An image is identified
+    by the SHA-256 of the original bytes and each size is saved once as
+    <dir>/<key[:2]>/<key>-<size>.<format>, so files never change once written
+    and can be cached forever.
+    """
+
+    def __init__(self, directory, sizes=(96, 400, 1000), image_format='webp', quality=80):
+        self.directory = directory
+        self.sizes = tuple(sorted(sizes))
+        self.format = image_format.lower()
+        self.quality = quality
+
+    def filename(self, key, size):
+        return os.path.join(key[:2], f'{key}-{size}.{self.format}')
+
+    def path(self, key, size):
+        return os.path.join(self.directory, self.filename(key, size))
+
+    def has(self, key):
+        return all(os.path.exists(self.path(key, size)) for size in self.sizes)
+
+    def add(self, data):
+        """Stores all sizes of the image in `data` (bytes) and returns its key."""
+        from PIL import Image, UnidentifiedImageError
+
+        key = hashlib.sha256(data).hexdigest()
+        if self.has(key):
+            return key
+        try:
+            original = Image.open(io.BytesIO(data))
+            original.load()
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            raise ImageError(f'not a usable image: {e}')
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+        os.makedirs(os.path.join(self.directory, key[:2]), exist_ok=True)
+        for size in self.sizes:
+            image = original.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            write_atomic(self.path(key, size),
+                         lambda out: image.save(out, format=self.format.upper(), quality=self.quality))
+        return key
+
+
+def fetch(client, url, max_bytes):
+    """Downloads `url` with the shared client, refusing bodies over max_bytes."""
+    if urlparse(url).scheme not in ('http', 'https'):
+        raise ImageError(f'unsupported URL {url!r}')
+    try:
+        with client.stream('GET', url, follow_redirects=True) as response:
+            response.raise_for_status()
+            chunks, size = [], 0
+            for chunk in response.iter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImageError(f'{url} is larger than {max_bytes} bytes')
+                chunks.append(chunk)
+    except httpx.HTTPError as e:
+        raise ImageError(f'could not fetch {url}: {e}')
+    return b''.join(chunks)
+
+
+class ImageIngestor:
+    """
+    Fetches and resizes product images in a pool of `workers` threads, so
+    admin saves and imports return without waiting for remote hosts. When an
+    image is stored, the product's image_key is set (unless its image_url
+    changed in the meantime) and caches are notified.
+    """
+
+    def __init__(self, app, store, workers=4, timeout=10.0, max_bytes=10 * 1024 * 1024):
+        self.app = app
+        self.store = store
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.workers = workers
+        self._client = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-ingest')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, product_id, url):
+        """Queues the image at `url` for the product; repeated submissions are coalesced."""
+        job = (product_id, url)
+        with self._lock:
+            if job in self._pending:
+                return self._pending[job]
+            future = self._pending[job] = self._executor.submit(self._ingest, product_id, url)
+        future.add_done_callback(lambda f: self._done(job))
+        return future
+
+    def _done(self, job):
+        with self._lock:
+            self._pending.pop(job, None)
+
+    @property
+    def client(self):
+        # Created on first use, keeping the HTTP stack out of app startup.
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout,
+                                            limits=httpx.Limits(max_connections=self.workers))
+            return self._client
+
+    def ingest(self, url):
+        """Fetches and stores one image synchronously; returns its key."""
+        return self.store.add(fetch(self.client, url, self.max_bytes))
+
+    def _ingest(self, product_id, url):
+        try:
+            key = self.ingest(url)
+        except ImageError as e:
+            logger.warning('Image for product %s not ingested: %s', product_id, e)
+            return None
+        except Exception:
+            logger.exception('Image for product %s not ingested', product_id)
+            return None
+        with self.app.app_context():
+            result = db.session.execute(
+                update(Product).where(Product.id == product_id, Product.image_url == url)
+                .values(image_key=key)
+            )
+            db.session.commit()
+            if result.rowcount:
+                notify_products_changed([product_id])
+        return key
+
+    def drain(self, timeout=None):
+        """Waits until all queued images are processed (used by CLI commands)."""
+        with self._lock:
+            futures = list(self._pending.values())
+        wait(futures, timeout=timeout)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._client is not None:
+            self._client.close()
+
+
+def get_ingestor():
+    return current_app.extensions['images']
+
+
+def enqueue(product_id, url):
+    """Schedules ingest of a product image; a no-op for empty URLs."""
+    if url:
+        get_ingestor().submit(product_id, url)
+
+
+def image_url(product, size):
+    """
+    URL of the stored image closest to `size` pixels (the next larger size),
+    falling back to the original image_url until the image is ingested.
+    """
+    key = getattr(product, 'image_key', None)
+    if not key:
+        return product.image_url
+    sizes = get_ingestor().store.sizes
+    size = next((s for s in sizes if s >= size), sizes[-1])
+    return url_for('images.image', key=key, size=size)
+
+
+def image_srcset(product):
+    key = getattr(product, 'image_key', None)
+    if not key:
+        return ''
+    return ', '.join(f"{url_for('images.image', key=key, size=s)} {s}w" for s in get_ingestor().store.sizes)
+
+
+@images_bp.route('/images/<key>/<int:size>')
+def image(key, size):
+    store = get_ingestor().store
+    if not KEY_RE.match(key) or size not in store.sizes:
+        abort(404)
+    response = send_from_directory(store.directory, store.filename(key, size), max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_app(app):
+    """
+    Sets up the image store (IMAGE_DIR, defaulting to <instance>/images), the
+    ingest worker pool and the /images route and template helpers.
+    """
+    store = ImageStore(app.config.get('IMAGE_DIR') or os.path.join(app.instance_path, 'images'),
+                       sizes=app.config['IMAGE_SIZES'], image_format=app.config['IMAGE_FORMAT'])
+    app.extensions['images'] = ImageIngestor(app, store, workers=app.config['IMAGE_WORKERS'],
+                                             timeout=app.config['IMAGE_FETCH_TIMEOUT'],
+                                             max_bytes=app.config['IMAGE_MAX_BYTES'])
+    app.register_blueprint(images_bp)
+    app.add_template_global(image_url, 'product_image_url')
+    app.add_template_global(image_srcset, 'product_image_srcset')
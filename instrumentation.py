@@ -0,0 +1,265 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_app_context, has_request_context, current_app, request, before_render_template, \
+    template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger('eshop.slow_query')
+
+# Upper bounds (seconds) of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_FINGERPRINTS = 500
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_RE = re.compile(r'(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """
+    Normalizes a SQL statement so that executions differing only in literal
+    values or IN-list/VALUES lengths are grouped together.
+    """
+    sql = _LITERAL_RE.sub('?', statement)
+    sql = _SPACE_RE.sub(' ', sql).strip()
+    sql = _IN_LIST_RE.sub('(?)', sql)
+    return _VALUES_RE.sub(r'\1', sql)
+
+
+class RollingHistogram:
+    """
+    Latency histogram with cumulative totals (for Prometheus) and a ring of
+    per-interval bucket counts, so quantiles can be reported for the last
+    `windows` x `interval` seconds only.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, windows=5, interval=60):
+        self.buckets = buckets
+        self.interval = interval
+        self.count = 0
+        self.sum = 0.0
+        self.cumulative = [0] * (len(buckets) + 1)
+        self._ring = [(0, [0] * (len(buckets) + 1)) for _ in range(windows)]
+
+    def observe(self, value, now=None):
+        index = bisect_left(self.buckets, value)
+        self.count += 1
+        self.sum += value
+        self.cumulative[index] += 1
+        slot = int((now or time.time()) // self.interval)
+        position = slot % len(self._ring)
+        window_slot, counts = self._ring[position]
+        if window_slot != slot:
+            counts = [0] * (len(self.buckets) + 1)
+            self._ring[position] = (slot, counts)
+        counts[index] += 1
+
+    def recent_quantile(self, q, now=None):
+        """Estimated q-quantile over the live windows (bucket upper bound)."""
+        current = int((now or time.time()) // self.interval)
+        totals = [0] * (len(self.buckets) + 1)
+        for slot, counts in self._ring:
+            if current - slot < len(self._ring):
+                totals = [a + b for a, b in zip(totals, counts)]
+        n = sum(totals)
+        if not n:
+            return None
+        rank, seen = q * n, 0
+        for i, c in enumerate(totals):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}       # (endpoint, method, status) -> count
+        self.latency = {}        # endpoint -> RollingHistogram
+        self.render_seconds = {}  # endpoint -> total template render time
+        self.statements = {}     # fingerprint -> [count, total seconds, max seconds]
+        self.slow_queries = 0
+
+    def record_request(self, endpoint, method, status, seconds, render_seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(endpoint, RollingHistogram()).observe(seconds)
+            self.render_seconds[endpoint] = self.render_seconds.get(endpoint, 0.0) + render_seconds
+
+    def record_statement(self, statement, seconds):
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                if len(self.statements) >= MAX_FINGERPRINTS:
+                    key = 'other'
+                stats = self.statements.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def record_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def render_prometheus(metrics, cache_stats=None):
+    """Returns the metrics in the Prometheus text exposition format."""
+    lines = []
+    with metrics._lock:
+        lines += ['# HELP eshop_requests_total HTTP requests by endpoint, method and status.',
+                  '# TYPE eshop_requests_total counter']
+        for (endpoint, method, status), count in sorted(metrics.requests.items()):
+            lines.append(f'eshop_requests_total{{endpoint="{_label(endpoint)}",method="{method}",'
+                         f'status="{status}"}} {count}')
+
+        lines += ['# HELP eshop_request_duration_seconds Request latency by endpoint.',
+                  '# TYPE eshop_request_duration_seconds histogram']
+        for endpoint, hist in sorted(metrics.latency.items()):
+            ep = _label(endpoint)
+            running = 0
+            for bound, count in zip(list(hist.buckets) + ['+Inf'], hist.cumulative):
+                running += count
+                lines.append(f'eshop_request_duration_seconds_bucket{{endpoint="{ep}",le="{bound}"}} {running}')
+            lines.append(f'eshop_request_duration_seconds_sum{{endpoint="{ep}"}} {hist.sum:.6f}')
+            lines.append(f'eshop_request_duration_seconds_count{{endpoint="{ep}"}} {hist.count}')
+
+        lines += ['# HELP eshop_request_duration_recent_seconds Latency quantiles over the last few minutes.',
+                  '# TYPE eshop_request_duration_recent_seconds gauge']
+        for endpoint, hist in sorted(metrics.latency.items()):
+            for q in (0.5, 0.95, 0.99):
+                value = hist.recent_quantile(q)
+                if value is not None:
+                    value = '+Inf' if value == float('inf') else value
+                    lines.append(f'eshop_request_duration_recent_seconds{{endpoint="{_label(endpoint)}",'
+                                 f'quantile="{q}"}} {value}')
+
+        lines += ['# HELP eshop_template_render_seconds_total Time spent rendering templates.',
+                  '# TYPE eshop_template_render_seconds_total counter']
+        for endpoint, seconds in sorted(metrics.render_seconds.items()):
+            lines.append(f'eshop_template_render_seconds_total{{endpoint="{_label(endpoint)}"}} {seconds:.6f}')
+
+        lines += ['# HELP eshop_sql_statements_total SQL statements by normalized statement.',
+                  '# TYPE eshop_sql_statements_total counter',
+                  '# HELP eshop_sql_duration_seconds_total SQL execution time by normalized statement.',
+                  '# TYPE eshop_sql_duration_seconds_total counter',
+                  '# HELP eshop_sql_duration_max_seconds Slowest execution by normalized statement.',
+                  '# TYPE eshop_sql_duration_max_seconds gauge']
+        for statement, (count, total, slowest) in sorted(metrics.statements.items(), key=lambda i: -i[1][1]):
+            label = f'statement="{_label(statement)}"'
+            lines.append(f'eshop_sql_statements_total{{{label}}} {count}')
+            lines.append(f'eshop_sql_duration_seconds_total{{{label}}} {total:.6f}')
+            lines.append(f'eshop_sql_duration_max_seconds{{{label}}} {slowest:.6f}')
+
+        lines += ['# HELP eshop_slow_queries_total Statements slower than SLOW_QUERY_THRESHOLD_MS.',
+                  '# TYPE eshop_slow_queries_total counter',
+                  f'eshop_slow_queries_total {metrics.slow_queries}']
+
+    if cache_stats:
+        backend = cache_stats.get('backend', '')
+        for name in ('hits', 'misses', 'evictions', 'expirations'):
+            lines += [f'# TYPE eshop_cache_{name}_total counter',
+                      f'eshop_cache_{name}_total{{backend="{backend}"}} {cache_stats.get(name, 0)}']
+        lines += ['# TYPE eshop_cache_entries gauge',
+                  f'eshop_cache_entries{{backend="{backend}"}} {cache_stats.get("entries", 0)}']
+    return '\n'.join(lines) + '\n'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('instrumentation_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if not has_app_context() or 'metrics' not in current_app.extensions:
+        return
+    app = current_app
+    app.extensions['metrics'].record_statement(statement, elapsed)
+    if has_request_context() and 'sql_seconds' in g:
+        g.sql_seconds += elapsed
+        g.sql_statements += 1
+    threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS')
+    if threshold and elapsed * 1000 >= threshold:
+        app.extensions['metrics'].record_slow_query()
+        endpoint = request.endpoint if has_request_context() else None
+        slow_query_logger.warning('%.1f ms [%s] %s', elapsed * 1000, endpoint or '-', fingerprint(statement))
+
+
+@event.listens_for(Engine, 'handle_error')
+def _discard_statement(context):
+    # after_cursor_execute does not fire for failed statements.
+    starts = context.connection.info.get('instrumentation_start') if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _before_render(app, template, context, **extra):
+    if has_request_context() and 'render_seconds' in g:
+        g.render_started = time.perf_counter()
+
+
+def _after_render(app, template, context, **extra):
+    started = g.pop('render_started', None) if has_request_context() else None
+    if started is not None:
+        g.render_seconds += time.perf_counter() - started
+
+
+def _wants_server_timing(app):
+    mode = app.config.get('SERVER_TIMING', 'admin')
+    if mode == 'all' or app.debug:
+        return True
+    return mode == 'admin' and current_user.is_authenticated and current_user.is_admin
+
+
+def init_app(app):
+    """
+    Times every request, SQL statement and template render and aggregates the
+    results per endpoint in app.extensions['metrics'] (served by
+    /admin/metrics). A Server-Timing header is added for admins, for everyone
+    when SERVER_TIMING is 'all' or never when it is 'off'. Statements slower
+    than SLOW_QUERY_THRESHOLD_MS are logged to the 'eshop.slow_query' logger.
+    Metrics are kept per worker process.
+    """
+    app.extensions['metrics'] = Metrics()
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_timers():
+        g.request_started = time.perf_counter()
+        g.sql_seconds = 0.0
+        g.sql_statements = 0
+        g.render_seconds = 0.0
+
+    @app.after_request
+    def record_timings(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        app.extensions['metrics'].record_request(request.endpoint or 'unmatched', request.method,
+                                                 response.status_code, total, g.render_seconds)
+        if _wants_server_timing(app):
+            response.headers.add('Server-Timing', ', '.join([
+                f'db;dur={g.sql_seconds * 1000:.2f};desc="{g.sql_statements} queries"',
+                f'tpl;dur={g.render_seconds * 1000:.2f}',
+                f'app;dur={total * 1000:.2f}',
+            ]))
+        return response
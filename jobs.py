@@ -0,0 +1,321 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, aliased
+from database import db, upsert
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+CLAIM_BATCH = 20
+MAX_BACKOFF = 3600
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class Task:
+    def __init__(self, name, func, max_attempts, concurrency, backoff):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self.backoff = backoff
+
+    def retry_delay(self, attempts):
+        """Exponential backoff with jitter after the given number of failed attempts."""
+        delay = min(self.backoff * 2 ** (attempts - 1), MAX_BACKOFF)
+        return delay * random.uniform(0.5, 1.0)
+
+
+def task(name, max_attempts=5, concurrency=0, backoff=10):
+    """
+    Registers a function as a background task under `name`. It is called with
+    the job's payload as keyword arguments inside an app context; raising
+    schedules a retry. `concurrency` caps how many jobs of this task run at
+    once across all workers (0 = no limit).
+    """
+    def decorator(func):
+        TASKS[name] = Task(name, func, max_attempts, concurrency, backoff)
+        return func
+    return decorator
+
+
+def _insert_if_new(values):
+    stmt = upsert(Job, ['idempotency_key'], values=values)
+    if stmt is not None:
+        return db.session.execute(stmt).rowcount > 0
+    if db.session.scalar(select(Job.id).where(Job.idempotency_key == values['idempotency_key'])):
+        return False
+    db.session.execute(insert(Job).values(values))
+    return True
+
+
+def enqueue(name, payload=None, key=None, delay=0, max_attempts=None):
+    """
+    Adds a job to the current transaction, so it is only seen by workers if
+    the caller commits. With an idempotency `key`, nothing is added when a job
+    with that key already exists. Returns True if a job was added.
+    """
+    task = TASKS[name]
+    now = datetime.utcnow()
+    values = {
+        'name': name,
+        'payload': json.dumps(payload or {}),
+        'status': 'queued',
+        'idempotency_key': key,
+        'attempts': 0,
+        'max_attempts': max_attempts or task.max_attempts,
+        'run_at': now + timedelta(seconds=delay),
+        'created_at': now,
+    }
+    if key is None:
+        db.session.execute(insert(Job).values(values))
+        added = True
+    else:
+        added = _insert_if_new(values)
+    if added:
+        db.session.info['jobs_enqueued'] = True
+    return added
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop('jobs_enqueued', None) and has_app_context():
+        worker = current_app.extensions.get('jobs')
+        if worker is not None:
+            worker.notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_enqueued(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+class Worker:
+    """
+    Runs due jobs in `threads` threads. Jobs are claimed with a conditional
+    UPDATE, so any number of worker threads and processes can share the
+    table; a job whose worker died is requeued once its `lease` runs out.
+    With `autostart`, the threads start when jobs are first enqueued.
+    """
+
+    def __init__(self, app, threads=2, poll_interval=1.0, lease=300, autostart=False):
+        self.app = app
+        self.autostart = autostart
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._next_recovery = 0.0
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._loop, name=f'job-worker-{i}', daemon=True)
+                             for i in range(self.threads)]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stop.set()
+        self._wake.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def notify(self):
+        """Wakes idle threads after new jobs were committed."""
+        if self.autostart:
+            self.start()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_next()
+            except Exception:
+                logger.exception('Job worker error')
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_next(self):
+        """Claims and runs one due job; returns False if there was none."""
+        with self.app.app_context():
+            job = self._claim()
+            if job is None:
+                return False
+            self._execute(*job)
+            return True
+
+    def run_until_idle(self):
+        """Runs due jobs in the calling thread until none are left; returns how many ran."""
+        count = 0
+        while self.run_next():
+            count += 1
+        return count
+
+    def _claim(self):
+        now = datetime.utcnow()
+        if now.timestamp() >= self._next_recovery:
+            self._next_recovery = now.timestamp() + min(self.lease, 60)
+            requeue_expired(now - timedelta(seconds=self.lease))
+        candidates = db.session.execute(
+            select(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+            .where(Job.status == 'queued', Job.run_at <= now)
+            .order_by(Job.run_at, Job.id).limit(CLAIM_BATCH)
+        ).all()
+        # End the read transaction first: SQLite cannot upgrade a stale read
+        # snapshot to a write and would fail instead of waiting.
+        db.session.commit()
+        saturated = set()
+        for job in candidates:
+            if job.name in saturated:
+                continue
+            token = f'{self.name}:{uuid.uuid4().hex[:8]}'
+            stmt = update(Job).where(Job.id == job.id, Job.status == 'queued')
+            task = TASKS.get(job.name)
+            if task is not None and task.concurrency:
+                running = aliased(Job)
+                stmt = stmt.where(
+                    select(func.count()).select_from(running)
+                    .where(running.name == job.name, running.status == 'running')
+                    .scalar_subquery() < task.concurrency
+                )
+            try:
+                result = db.session.execute(
+                    stmt.values(status='running', attempts=Job.attempts + 1, locked_by=token, locked_at=now),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.commit()
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e).lower():
+                    raise
+                return None  # write contention; try again on the next poll
+            if result.rowcount:
+                return job, token
+            if task is not None and task.concurrency:
+                saturated.add(job.name)
+        return None
+
+    def _finish(self, job_id, token, **values):
+        db.session.execute(update(Job).where(Job.id == job_id, Job.locked_by == token).values(**values),
+                           execution_options={'synchronize_session': False})
+        db.session.commit()
+
+    def _execute(self, job, token):
+        task = TASKS.get(job.name)
+        attempts = job.attempts + 1
+        try:
+            if task is None:
+                raise LookupError(f'unknown task {job.name!r}')
+            task.func(**json.loads(job.payload))
+            # Database changes the task left uncommitted are committed together
+            # with the job's completion.
+            self._finish(job.id, token, status='done', finished_at=datetime.utcnow(), last_error=None)
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc(limit=5)
+            now = datetime.utcnow()
+            if task is not None and attempts < job.max_attempts:
+                delay = task.retry_delay(attempts)
+                logger.warning('Job %s (%s) failed, attempt %s of %s; retrying in %.0fs\n%s',
+                               job.id, job.name, attempts, job.max_attempts, delay, error)
+                self._finish(job.id, token, status='queued', run_at=now + timedelta(seconds=delay),
+                             locked_by=None, locked_at=None, last_error=error)
+            else:
+                logger.error('Job %s (%s) failed permanently after %s attempts\n%s',
+                             job.id, job.name, attempts, error)
+                self._finish(job.id, token, status='failed', finished_at=now, locked_by=None,
+                             locked_at=None, last_error=error)
+
+
+def requeue_expired(locked_before):
+    """Requeues (or fails, when out of attempts) running jobs locked before the given time."""
+    expired = (Job.status == 'running', Job.locked_at < locked_before)
+    values = {'locked_by': None, 'locked_at': None, 'last_error': 'worker lease expired'}
+    options = {'synchronize_session': False}
+    db.session.execute(update(Job).where(*expired, Job.attempts >= Job.max_attempts)
+                       .values(status='failed', finished_at=datetime.utcnow(), **values),
+                       execution_options=options)
+    db.session.execute(update(Job).where(*expired).values(status='queued', **values),
+                       execution_options=options)
+    db.session.commit()
+
+
+def retry(job_ids=None):
+    """Requeues failed jobs (all of them, or the given ids) for immediate execution."""
+    stmt = update(Job).where(Job.status == 'failed')
+    if job_ids is not None:
+        stmt = stmt.where(Job.id.in_(job_ids))
+    result = db.session.execute(stmt.values(status='queued', attempts=0, run_at=datetime.utcnow(),
+                                            finished_at=None),
+                                execution_options={'synchronize_session': False})
+    db.session.info['jobs_enqueued'] = True
+    db.session.commit()
+    return result.rowcount
+
+
+def purge(finished_before):
+    """Deletes completed jobs finished before the given time, releasing their idempotency keys."""
+    result = db.session.execute(db.delete(Job).where(Job.status == 'done', Job.finished_at < finished_before),
+                                execution_options={'synchronize_session': False})
+    db.session.commit()
+    return result.rowcount
+
+
+def stats():
+    """Job counts by task and status, plus the age of the oldest due job."""
+    counts = {}
+    for name, status, count in db.session.execute(
+        select(Job.name, Job.status, func.count()).group_by(Job.name, Job.status)
+    ):
+        counts.setdefault(name, dict.fromkeys(STATUSES, 0))[status] = count
+    oldest = db.session.scalar(select(func.min(Job.run_at))
+                               .where(Job.status == 'queued', Job.run_at <= datetime.utcnow()))
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    return {'tasks': counts, 'oldest_due_seconds': round(lag, 3)}
+
+
+def get_worker():
+    return current_app.extensions['jobs']
+
+
+def init_app(app):
+    """
+    Creates the app's job worker. With JOB_WORKER='thread' the worker threads
+    start with the first request or enqueued job in each process; with 'none'
+    jobs are only run by `flask jobs worker` processes.
+    """
+    # Started lazily rather than here, so forked server processes each get
+    # their own threads and CLI commands do not start any.
+    worker = Worker(app, threads=app.config['JOB_WORKER_THREADS'], poll_interval=app.config['JOB_POLL_INTERVAL'],
+                    lease=app.config['JOB_LEASE_SECONDS'], autostart=app.config['JOB_WORKER'] == 'thread')
+    app.extensions['jobs'] = worker
+
+    @app.before_request
+    def _start_job_worker():
+        if worker.autostart and not worker.running:
+            worker.start()
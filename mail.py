@@ -0,0 +1,25 @@
+import logging
+import smtplib
+from email.message import EmailMessage
+from flask import current_app
+
+logger = logging.getLogger('eshop.mail')
+
+
+def send_mail(to, subject, body):
+    """Sends a plain-text email through MAIL_SERVER, or only logs it when no server is configured."""
+    config = current_app.config
+    if not config['MAIL_SERVER']:
+        logger.info('Mail to %s: %s\n%s', to, subject, body)
+        return
+    message = EmailMessage()
+    message['From'] = config['MAIL_SENDER']
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=config['MAIL_TIMEOUT']) as smtp:
+        if config['MAIL_USE_TLS']:
+            smtp.starttls()
+        if config['MAIL_USERNAME']:
+            smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        smtp.send_message(message)
@@ -0,0 +1,122 @@
+import importlib.util
+import os
+import re
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from database import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+FILENAME_RE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(128), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(f'migrations.m{self.version:04d}_{self.name}', self.path)
+            self._module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._module)
+        return self._module
+
+    @property
+    def description(self):
+        return (self.module.__doc__ or self.name).strip().splitlines()[0]
+
+    def __repr__(self):
+        return f'<Migration {self.version:04d} {self.name}>'
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Returns the migration scripts in `directory` ordered by version. Scripts
+    are named NNNN_description.py and define upgrade(conn) and downgrade(conn).
+    """
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME_RE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    versions = [m.version for m in migrations]
+    if versions != list(range(1, len(versions) + 1)):
+        raise MigrationError(f'Migration versions must be numbered 1..n without gaps, found {versions}')
+    return migrations
+
+
+def current_version(conn):
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(select(db.func.max(schema_version.c.version))).scalar() or 0
+
+
+def _adopt_unversioned(conn, log):
+    # Databases created by the old create_all() startup have the initial
+    # tables but none of the indexes added since and no version table. They
+    # stay at version 0: 0001 only creates what is missing, so it completes
+    # them like any other database.
+    schema_version.create(conn, checkfirst=True)
+    if current_version(conn) == 0 and inspect(conn).has_table('product'):
+        log('Existing unversioned schema found; 0001 adds what it lacks')
+
+
+def upgrade(target=None, log=print):
+    """
+    Applies pending migrations up to `target` (default: the latest), each in
+    its own transaction. Must be called inside an application context.
+    Returns the new schema version.
+    """
+    migrations = load_migrations()
+    target = len(migrations) if target is None else target
+    with db.engine.begin() as conn:
+        _adopt_unversioned(conn, log)
+        version = current_version(conn)
+    for migration in migrations[version:target]:
+        log(f'Upgrading to {migration.version:04d} {migration.name}: {migration.description}')
+        with db.engine.begin() as conn:
+            migration.module.upgrade(conn)
+            conn.execute(schema_version.insert().values(version=migration.version, name=migration.name,
+                                                        applied_at=datetime.utcnow()))
+        version = migration.version
+    return version
+
+
+def downgrade(target, log=print):
+    """
+    Reverts applied migrations above version `target`, newest first. Must be
+    called inside an application context. Returns the new schema version.
+    """
+    migrations = load_migrations()
+    with db.engine.begin() as conn:
+        version = current_version(conn)
+    if target < 0 or target > version:
+        raise MigrationError(f'Cannot downgrade from version {version} to {target}')
+    for migration in reversed(migrations[target:version]):
+        log(f'Downgrading {migration.version:04d} {migration.name}')
+        with db.engine.begin() as conn:
+            migration.module.downgrade(conn)
+            conn.execute(schema_version.delete().where(schema_version.c.version == migration.version))
+    return target
+
+
+def status():
+    """Returns (current version, [(migration, applied), ...])."""
+    with db.engine.connect() as conn:
+        version = current_version(conn)
+    return version, [(m, m.version <= version) for m in load_migrations()]
@@ -0,0 +1,74 @@
+"""Initial shop schema: users, products, carts and orders."""
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+                        Text, text)
+
+# A frozen copy of the schema at this version; later model changes belong in
+# new migrations, not here.
+metadata = MetaData()
+
+user = Table(
+    'user', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(64), unique=True, nullable=False),
+    Column('email', String(120), unique=True, nullable=False),
+    Column('password_hash', String(128), nullable=False),
+    Column('is_admin', Boolean),
+)
+
+product = Table(
+    'product', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(128), nullable=False),
+    Column('description', Text),
+    Column('price', Float, nullable=False),
+    Column('stock', Integer),
+    Column('image_url', String(256)),
+    Index('ix_product_price_id', 'price', 'id'),
+    Index('ix_product_name_id', 'name', 'id'),
+    Index('ix_product_in_stock_id', 'id',
+          sqlite_where=text('stock > 0'), postgresql_where=text('stock > 0')),
+    Index('ix_product_in_stock_price_id', 'price', 'id',
+          sqlite_where=text('stock > 0'), postgresql_where=text('stock > 0')),
+    Index('ix_product_in_stock_name_id', 'name', 'id',
+          sqlite_where=text('stock > 0'), postgresql_where=text('stock > 0')),
+)
+
+cart_item = Table(
+    'cart_item', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False, index=True),
+    Column('product_id', Integer, ForeignKey('product.id'), nullable=False),
+    Column('quantity', Integer),
+)
+
+order = Table(
+    'order', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('order_date', DateTime),
+    Column('total_amount', Float, nullable=False),
+    Column('status', String(64)),
+    Index('ix_order_user_id_order_date', 'user_id', 'order_date'),
+)
+
+order_item = Table(
+    'order_item', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('order_id', Integer, ForeignKey('order.id'), nullable=False, index=True),
+    Column('product_id', Integer, ForeignKey('product.id'), nullable=False),
+    Column('quantity', Integer, nullable=False),
+    Column('price', Float, nullable=False),
+)
+
+
+def upgrade(conn):
+    # Databases from before migrations already have these tables, without
+    # the indexes; both are created only where missing.
+    metadata.create_all(conn)
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    metadata.drop_all(conn)
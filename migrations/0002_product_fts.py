@@ -0,0 +1,34 @@
+"""Full-text search index over product names and descriptions (SQLite FTS5)."""
+from sqlalchemy.exc import OperationalError
+
+
+def _fts5_available(conn):
+    if conn.dialect.name != 'sqlite':
+        return False
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.exec_driver_sql("DROP TABLE temp.fts5_probe")
+        return True
+    except OperationalError:
+        return False
+
+
+def upgrade(conn):
+    # Without FTS5 the search module falls back to its in-memory index.
+    if not _fts5_available(conn):
+        return
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts "
+        "USING fts5(name, description, tokenize='unicode61', prefix='2 3')"
+    )
+    # Databases created before migrations may already have a populated index.
+    conn.exec_driver_sql("DELETE FROM product_fts")
+    conn.exec_driver_sql(
+        "INSERT INTO product_fts (rowid, name, description) "
+        "SELECT id, name, coalesce(description, '') FROM product"
+    )
+
+
+def downgrade(conn):
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql("DROP TABLE IF EXISTS product_fts")
@@ -0,0 +1,37 @@
+"""Product updated_at timestamps and a global catalog version for HTTP caching."""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table
+
+metadata = MetaData()
+
+catalog_version = Table(
+    'catalog_version', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+# Only the columns this migration touches.
+product = Table(
+    'product', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('updated_at', DateTime),
+)
+
+
+def upgrade(conn):
+    # A constant default lets existing rows satisfy NOT NULL (SQLite cannot add
+    # a column with a CURRENT_TIMESTAMP default); they are then stamped now.
+    column_type = DateTime().compile(dialect=conn.dialect)
+    conn.exec_driver_sql(
+        f"ALTER TABLE product ADD COLUMN updated_at {column_type} NOT NULL DEFAULT '1970-01-01 00:00:00'"
+    )
+    now = datetime.utcnow()
+    conn.execute(product.update().values(updated_at=now))
+    metadata.create_all(conn)
+    conn.execute(catalog_version.insert().values(id=1, version=1, updated_at=now))
+
+
+def downgrade(conn):
+    metadata.drop_all(conn)
+    conn.exec_driver_sql("ALTER TABLE product DROP COLUMN updated_at")
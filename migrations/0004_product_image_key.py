@@ -0,0 +1,9 @@
+"""Key of the locally stored, resized copy of each product image."""
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("ALTER TABLE product ADD COLUMN image_key VARCHAR(64)")
+
+
+def downgrade(conn):
+    conn.exec_driver_sql("ALTER TABLE product DROP COLUMN image_key")
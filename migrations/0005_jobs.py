@@ -0,0 +1,31 @@
+"""Durable background job queue."""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+job = Table(
+    'job', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(64), nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('status', String(16), nullable=False),
+    Column('idempotency_key', String(128), unique=True),
+    Column('attempts', Integer, nullable=False),
+    Column('max_attempts', Integer, nullable=False),
+    Column('run_at', DateTime, nullable=False),
+    Column('locked_by', String(128)),
+    Column('locked_at', DateTime),
+    Column('last_error', Text),
+    Column('created_at', DateTime, nullable=False),
+    Column('finished_at', DateTime),
+    Index('ix_job_status_run_at', 'status', 'run_at'),
+    Index('ix_job_name_status', 'name', 'status'),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn)
+
+
+def downgrade(conn):
+    metadata.drop_all(conn)
@@ -0,0 +1,34 @@
+"""One cart line per user and product, so cart changes can be single upserts."""
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, Table, func, select
+
+# Only the columns this migration touches.
+cart_item = Table(
+    'cart_item', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('product_id', Integer, ForeignKey('product.id'), nullable=False),
+    Column('quantity', Integer),
+)
+user_index = Index('ix_cart_item_user_id', cart_item.c.user_id)
+user_product_index = Index('ix_cart_item_user_id_product_id', cart_item.c.user_id, cart_item.c.product_id, unique=True)
+
+
+def upgrade(conn):
+    # Adding the same product twice used to be able to create two lines; fold
+    # them into the oldest one before the unique index is created.
+    duplicates = conn.execute(
+        select(cart_item.c.user_id, cart_item.c.product_id, func.min(cart_item.c.id), func.sum(cart_item.c.quantity))
+        .group_by(cart_item.c.user_id, cart_item.c.product_id).having(func.count() > 1)
+    ).all()
+    for user_id, product_id, keep_id, quantity in duplicates:
+        conn.execute(cart_item.update().where(cart_item.c.id == keep_id).values(quantity=quantity))
+        conn.execute(cart_item.delete().where(cart_item.c.user_id == user_id, cart_item.c.product_id == product_id,
+                                              cart_item.c.id != keep_id))
+    # The unique index leads with user_id, so it also serves the per-user lookups.
+    user_product_index.create(conn, checkfirst=True)
+    user_index.drop(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    user_index.create(conn, checkfirst=True)
+    user_product_index.drop(conn, checkfirst=True)
@@ -0,0 +1,39 @@
+"""Room for the longer scrypt password hashes in user.password_hash."""
+from sqlalchemy import Boolean, Column, Integer, MetaData, String, Table
+
+
+def _user_table(name, hash_length):
+    return Table(
+        name, MetaData(),
+        Column('id', Integer, primary_key=True),
+        Column('username', String(64), unique=True, nullable=False),
+        Column('email', String(120), unique=True, nullable=False),
+        Column('password_hash', String(hash_length), nullable=False),
+        Column('is_admin', Boolean),
+    )
+
+
+def _resize(conn, hash_length):
+    table = conn.dialect.identifier_preparer.quote('user')
+    column_type = String(hash_length).compile(dialect=conn.dialect)
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql(f"ALTER TABLE {table} ALTER COLUMN password_hash TYPE {column_type}")
+    elif conn.dialect.name in ('mysql', 'mariadb'):
+        conn.exec_driver_sql(f"ALTER TABLE {table} MODIFY password_hash {column_type} NOT NULL")
+    else:
+        # SQLite cannot change a column type: copy the rows into a new table
+        # and put it in place of the old one. Foreign keys refer to the table
+        # by name, so they point at the new one after the rename.
+        resized = _user_table('user_resized', hash_length)
+        resized.create(conn)
+        conn.execute(resized.insert().from_select([c.name for c in resized.c], _user_table('user', 128).select()))
+        conn.exec_driver_sql(f"DROP TABLE {table}")
+        conn.exec_driver_sql(f"ALTER TABLE user_resized RENAME TO {table}")
+
+
+def upgrade(conn):
+    _resize(conn, 256)
+
+
+def downgrade(conn):
+    _resize(conn, 128)
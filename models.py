@@ -1,22 +1,25 @@
 from datetime import datetime
 from database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+import passwords
 from flask_login import UserMixin
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     cart_items = db.relationship('CartItem', backref='user', lazy='dynamic')
     orders = db.relationship('Order', backref='customer', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
+
+    def needs_rehash(self):
+        return passwords.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -28,10 +31,39 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     stock = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(256), nullable=True)
+    # Content hash of the locally stored copy of image_url (see images.py);
+    # None until the image has been fetched.
+    image_key = db.Column(db.String(64), nullable=True)
+    # Bumped on every change (including bulk UPDATE statements); the basis for
+    # HTTP validators of product pages.
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Composite indexes backing the keyset-paginated catalog (see catalog.py).
+    # Every sort key ends with the primary key so the cursor is unique, and the
+    # partial variants keep the "in stock only" filter index-bounded as well.
+    __table_args__ = (
+        db.Index('ix_product_price_id', 'price', 'id'),
+        db.Index('ix_product_name_id', 'name', 'id'),
+        db.Index('ix_product_in_stock_id', 'id',
+                 sqlite_where=db.text('stock > 0'), postgresql_where=db.text('stock > 0')),
+        db.Index('ix_product_in_stock_price_id', 'price', 'id',
+                 sqlite_where=db.text('stock > 0'), postgresql_where=db.text('stock > 0')),
+        db.Index('ix_product_in_stock_name_id', 'name', 'id',
+                 sqlite_where=db.text('stock > 0'), postgresql_where=db.text('stock > 0')),
+    )
 
     def __repr__(self):
         return f'<Product {self.name}>'
 
+class CatalogVersion(db.Model):
+    """
+    Single row counting changes to catalog listings across all workers; see
+    http_cache.py.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class CartItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -40,6 +72,11 @@ class CartItem(db.Model):
     
     product = db.relationship('Product') # Add this line to access product details
 
+    # One line per product (see carts.py); it also serves the per-user lookups.
+    __table_args__ = (
+        db.Index('ix_cart_item_user_id_product_id', 'user_id', 'product_id', unique=True),
+    )
+
     def __repr__(self):
         return f'<CartItem user_id={self.user_id} product_id={self.product_id}>'
 
@@ -49,14 +86,19 @@ class Order(db.Model):
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(64), default='Pending') # e.g., Pending, Shipped, Delivered
-    items = db.relationship('OrderItem', backref='order', lazy='dynamic')
+    # Plain list relationship so it can be eager-loaded (see shop.purchase_history)
+    items = db.relationship('OrderItem', backref='order')
+
+    __table_args__ = (
+        db.Index('ix_order_user_id_order_date', 'user_id', 'order_date'),
+    )
 
     def __repr__(self):
         return f'<Order {self.id} by User {self.user_id}>'
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False) # Price at the time of purchase
@@ -64,4 +106,57 @@ class OrderItem(db.Model):
     product = db.relationship('Product') # Add this line to access product details
 
     def __repr__(self):
-        return f'<OrderItem order_id={self.order_id} product_id={self.product_id}>'
\ No newline at end of file
+        return f'<OrderItem order_id={self.order_id} product_id={self.product_id}>'
+
+
+class Job(db.Model):
+    """Durable background job; see jobs.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    # Enqueueing again under the same key is a no-op for as long as the row exists.
+    idempotency_key = db.Column(db.String(128), unique=True, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(128), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        db.Index('ix_job_name_status', 'name', 'status'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
+
+# Sales rollups maintained by analytics.py; reports read only these tables.
+# On SQLite they are clustered by day (WITHOUT ROWID), so the date range
+# scans behind every report read consecutive pages.
+class DailySales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class DailyProductSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    # No foreign key: sales history outlives deleted products.
+    product_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class SalesRollupState(db.Model):
+    """Single row: orders with ids up to last_order_id are counted in the rollups."""
+    id = db.Column(db.Integer, primary_key=True)
+    last_order_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
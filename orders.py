@@ -0,0 +1,108 @@
+import logging
+from flask import current_app, render_template
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from database import db
+from models import Order, OrderItem, Product
+from cache import notify_products_changed
+from mail import send_mail
+import analytics
+import jobs
+
+logger = logging.getLogger(__name__)
+
+# Statuses an order may move to, each with the statuses it may come from.
+TRANSITIONS = {
+    'Processing': ('Pending',),
+    'Shipped': ('Processing',),
+    'Delivered': ('Shipped',),
+    'Cancelled': ('Pending', 'Processing'),
+}
+STATUSES = ('Pending',) + tuple(TRANSITIONS)
+
+
+def order_placed(order_id, remaining_stock):
+    """
+    Queues the follow-up work for a new order in the checkout transaction:
+    confirming it, counting it in the sales rollups and, for products left
+    with REORDER_THRESHOLD or fewer items ({product_id: stock}), a reorder
+    check.
+    """
+    jobs.enqueue('process_order', {'order_id': order_id}, key=f'order:{order_id}:placed')
+    analytics.schedule_refresh()
+    threshold = current_app.config['REORDER_THRESHOLD']
+    low = sorted(pid for pid, stock in remaining_stock.items() if stock <= threshold)
+    if low:
+        jobs.enqueue('reorder_check', {'product_ids': low})
+
+
+def set_status(order_id, status):
+    """
+    Moves an order to `status` and commits. The transition is a conditional
+    UPDATE on the current status, so repeated or concurrent requests apply it
+    at most once; the customer email is queued in the same transaction and
+    cancelling returns the items to stock and takes the order out of the
+    sales rollups. Returns False if the order does not exist or cannot move
+    to `status` from its current status.
+    """
+    result = db.session.execute(
+        update(Order).where(Order.id == order_id, Order.status.in_(TRANSITIONS[status])).values(status=status),
+        execution_options={'synchronize_session': False}
+    )
+    if not result.rowcount:
+        db.session.rollback()
+        return False
+    restocked = []
+    if status == 'Cancelled':
+        quantities = {}
+        for product_id, quantity in db.session.execute(
+            select(OrderItem.product_id, OrderItem.quantity).where(OrderItem.order_id == order_id)
+        ):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if quantities:
+            db.session.execute(
+                update(Product).where(Product.id.in_(list(quantities)))
+                .values(stock=Product.stock + case(quantities, value=Product.id)),
+                execution_options={'synchronize_session': False}
+            )
+            restocked = list(quantities)
+        analytics.order_cancelled(order_id)
+    jobs.enqueue('order_email', {'order_id': order_id, 'status': status}, key=f'order:{order_id}:email:{status}')
+    db.session.commit()
+    if restocked:
+        notify_products_changed(restocked)
+    return True
+
+
+@jobs.task('process_order')
+def process_order(order_id):
+    """Confirms a newly placed order."""
+    set_status(order_id, 'Processing')
+
+
+@jobs.task('order_email', max_attempts=8, concurrency=2, backoff=30)
+def send_order_email(order_id, status):
+    order = db.session.get(Order, order_id, options=[
+        joinedload(Order.customer), selectinload(Order.items).joinedload(OrderItem.product)
+    ])
+    if order is None:
+        return
+    body = render_template('email/order_status.txt', order=order, user=order.customer, status=status)
+    send_mail(order.customer.email, f'Order #{order.id}: {status}', body)
+
+
+@jobs.task('reorder_check')
+def check_reorder(product_ids):
+    """Reports products whose stock is still at REORDER_THRESHOLD or below."""
+    config = current_app.config
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.stock)
+        .where(Product.id.in_(product_ids), Product.stock <= config['REORDER_THRESHOLD'])
+        .order_by(Product.stock, Product.id)
+    ).all()
+    if not rows:
+        return
+    lines = [f'#{r.id} {r.name}: {r.stock} left' for r in rows]
+    logger.warning('Low stock: %s', '; '.join(lines))
+    if config['REORDER_NOTIFY_EMAIL']:
+        send_mail(config['REORDER_NOTIFY_EMAIL'], f'Low stock: {len(rows)} products', '\n'.join(lines))
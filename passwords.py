@@ -0,0 +1,33 @@
+from functools import lru_cache
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug 3's default; memory-hard and cheaper in CPU per login than
+# Werkzeug 2.3's pbkdf2:sha256:600000 at a comparable strength.
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+def configured_method():
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD
+    return DEFAULT_METHOD
+
+
+@lru_cache(maxsize=8)
+def _canonical(method):
+    # Werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1');
+    # hashing a throwaway value once is the reliable way to learn them.
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=configured_method())
+
+
+def verify_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True when the hash was made with other parameters than PASSWORD_HASH_METHOD."""
+    return password_hash.split('$', 1)[0] != _canonical(configured_method())
@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+from sqlalchemy import insert, select, text, update
+from werkzeug.datastructures import MultiDict
+from database import db
+from forms import AddProductForm
+from models import Product
+from cache import notify_products_changed
+import search
+import images
+
+FIELDS = ['name', 'description', 'price', 'stock', 'image_url']
+EXPORT_FIELDS = ['id'] + FIELDS
+FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_ERRORS = 100
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_records(stream, fmt):
+    """
+    Yields (line_number, dict) pairs from a text stream one record at a time,
+    so files of any size can be processed in constant memory.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+                continue
+            yield line_number, record if isinstance(record, dict) else ValueError('expected a JSON object')
+    else:
+        raise ValueError(f'Unknown format {fmt!r}, expected one of {", ".join(FORMATS)}')
+
+
+def validate_record(record, form=None):
+    """
+    Validates one record with AddProductForm, so imports follow exactly the
+    same rules as the admin form. Returns (values, None) or (None, error).
+    Pass a form instance to reuse it across records; binding a new form per
+    row dominates import time otherwise.
+    """
+    formdata = MultiDict({k: '' if record.get(k) is None else str(record.get(k)) for k in FIELDS})
+    if form is None:
+        form = AddProductForm(formdata=formdata, meta={'csrf': False})
+    else:
+        form.process(formdata)
+    if not form.validate():
+        errors = '; '.join(f'{field}: {", ".join(messages)}'
+                           for field, messages in form.errors.items() if field != 'submit')
+        return None, errors
+    values = {k: getattr(form, k).data for k in FIELDS}
+    product_id = record.get('id')
+    if product_id not in (None, ''):
+        try:
+            values['id'] = int(product_id)
+        except (TypeError, ValueError):
+            return None, f'id: not a valid integer ({product_id!r})'
+    return values, None
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'line {line_number}: {message}')
+
+    def as_dict(self):
+        return {'processed': self.processed, 'inserted': self.inserted, 'updated': self.updated,
+                'errors': self.error_count, 'first_errors': self.errors}
+
+
+def _upsert_batch(rows, report):
+    """
+    Writes one batch: rows whose id already exists are bulk updated, all
+    others bulk inserted, then the search index and caches are refreshed and
+    new or changed images are queued for ingest.
+    """
+    # A feed may repeat an id within one batch; the last occurrence wins.
+    by_id = {r['id']: r for r in rows if 'id' in r}
+    rows = list(by_id.values()) + [r for r in rows if 'id' not in r]
+    ids = list(by_id)
+    existing = {r.id: r for r in db.session.execute(
+        select(Product.id, Product.image_url, Product.image_key).where(Product.id.in_(ids))
+    )} if ids else {}
+    updates = [r for r in rows if r.get('id') in existing]
+    inserts = [r for r in rows if r.get('id') not in existing]
+    stale_images = [r for r in updates
+                    if r['image_url'] != existing[r['id']].image_url or existing[r['id']].image_key is None]
+    for row in stale_images:
+        row['image_key'] = None
+
+    if updates:
+        db.session.execute(update(Product), updates)
+    if inserts:
+        # Rows with and without explicit ids need separate INSERT statements.
+        with_id = [r for r in inserts if 'id' in r]
+        without_id = [r for r in inserts if 'id' not in r]
+        dialect = db.engine.dialect
+        if with_id:
+            db.session.execute(insert(Product), with_id)
+            if dialect.name == 'postgresql':
+                # Explicit ids do not advance the id sequence; move it past them
+                # so later inserts do not hand out an id that is already taken.
+                db.session.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('product', 'id'), (SELECT max(id) FROM product))"
+                ))
+        if without_id and dialect.insert_executemany_returning_sort_by_parameter_order:
+            new_ids = db.session.scalars(
+                insert(Product).returning(Product.id, sort_by_parameter_order=True), without_id
+            ).all()
+            for row, new_id in zip(without_id, new_ids):
+                row['id'] = new_id
+        elif without_id:
+            # No RETURNING for multi-row inserts (MySQL): one INSERT per row.
+            for row in without_id:
+                row['id'] = db.session.execute(insert(Product).values(row)).inserted_primary_key[0]
+
+    search.index_many(rows)
+    db.session.commit()
+    notify_products_changed([r['id'] for r in rows])
+    for row in inserts + stale_images:
+        images.enqueue(row['id'], row['image_url'])
+    report.updated += len(updates)
+    report.inserted += len(inserts)
+
+
+def import_products(stream, fmt='csv', batch_size=1000, progress=None):
+    """
+    Streams product records from `stream`, validates them and upserts valid
+    ones in batches of `batch_size` (one transaction per batch). Records with
+    an `id` matching an existing product update it; others are inserted.
+    `progress(report)` is called after every batch.
+    """
+    report = ImportReport()
+    form = AddProductForm(formdata=None, meta={'csrf': False})
+    batch = []
+    for line_number, record in iter_records(stream, fmt):
+        report.processed += 1
+        if isinstance(record, Exception):
+            report.add_error(line_number, str(record))
+            continue
+        values, error = validate_record(record, form)
+        if error:
+            report.add_error(line_number, error)
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            _upsert_batch(batch, report)
+            batch = []
+            if progress:
+                progress(report)
+    if batch:
+        _upsert_batch(batch, report)
+    if progress:
+        progress(report)
+    return report
+
+
+def export_products(fmt='csv', batch_size=1000):
+    """
+    Yields the whole catalog as CSV or JSONL text chunks, reading products in
+    batches of `batch_size` so memory stays constant.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}, expected one of {", ".join(FORMATS)}')
+    columns = [getattr(Product, f) for f in EXPORT_FIELDS]
+    rows = db.session.execute(select(*columns).order_by(Product.id).execution_options(yield_per=batch_size))
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        for partition in rows.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # header only, the catalog is empty
+    else:
+        for partition in rows.partitions():
+            yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in partition)
@@ -0,0 +1,44 @@
+import logging
+from flask import g, has_request_context, current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+
+
+def init_app(app):
+    """
+    Counts the SQL statements issued by every request while the app runs in
+    debug or testing mode. Requests above QUERY_BUDGET statements are logged,
+    or fail with QueryBudgetExceeded when QUERY_BUDGET_ACTION is 'raise', so
+    N+1 regressions show up during development instead of in production.
+    """
+
+    @app.before_request
+    def start_query_count():
+        if app.debug or app.testing:
+            g.query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        count = g.pop('query_count', None)
+        budget = current_app.config.get('QUERY_BUDGET')
+        if count is None or not budget:
+            return response
+        response.headers['X-Query-Count'] = str(count)
+        if count > budget:
+            message = f'{request.method} {request.path} issued {count} SQL statements (budget {budget})'
+            if current_app.config.get('QUERY_BUDGET_ACTION') == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
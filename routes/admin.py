@@ -1,7 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
-from models import Product
+import io
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, Response, stream_with_context
+from models import Order, Product
 from database import db
-from forms import AddProductForm
+from catalog import catalog_page
+import search
+import images
+import jobs
+import analytics
+from database import use_replica
+from orders import STATUSES, TRANSITIONS, set_status
+from sqlalchemy.orm import joinedload
+from cache import get_cache, notify_products_changed
+from instrumentation import render_prometheus
+from product_io import import_products, export_products, detect_format, FORMATS
+from forms import AddProductForm, ImportProductsForm, OrderStatusForm
 from flask_login import current_user, login_required
 from functools import wraps
 
@@ -20,8 +32,9 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    products = Product.query.all()
-    return render_template('admin/dashboard.html', title='Admin Dashboard', products=products)
+    page = catalog_page(cursor=request.args.get('cursor'),
+                        per_page=current_app.config['CATALOG_MAX_PAGE_SIZE'])
+    return render_template('admin/dashboard.html', title='Admin Dashboard', products=page.items, page=page)
 
 @admin_bp.route('/add_item', methods=['GET', 'POST'])
 @login_required
@@ -37,7 +50,11 @@ def add_item():
             image_url=form.image_url.data
         )
         db.session.add(product)
+        db.session.flush()
+        search.index_product(product)
         db.session.commit()
+        notify_products_changed([product.id])
+        images.enqueue(product.id, product.image_url)
         flash('Product added successfully!', 'success')
         return redirect(url_for('admin.dashboard'))
     return render_template('admin/add_item.html', title='Add New Product', form=form)
@@ -49,8 +66,16 @@ def edit_item(product_id):
     product = Product.query.get_or_404(product_id)
     form = AddProductForm(obj=product)
     if form.validate_on_submit():
+        previous_image_url = product.image_url
         form.populate_obj(product)
+        image_changed = product.image_url != previous_image_url
+        if image_changed:
+            product.image_key = None  # show the new URL until its copy is stored
+        search.index_product(product)
         db.session.commit()
+        notify_products_changed([product.id])
+        if image_changed or product.image_key is None:
+            images.enqueue(product.id, product.image_url)
         flash('Product updated successfully!', 'success')
         return redirect(url_for('admin.dashboard'))
     return render_template('admin/add_item.html', title='Edit Product', form=form, product=product) # Reuse add_item template
@@ -61,6 +86,124 @@ def edit_item(product_id):
 def delete_item(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
+    search.remove_product(product.id)
     db.session.commit()
+    notify_products_changed([product_id])
     flash('Product deleted successfully!', 'success')
-    return redirect(url_for('admin.dashboard'))
\ No newline at end of file
+    return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/cache_stats')
+@login_required
+@admin_required
+def cache_stats():
+    return jsonify(get_cache().stats())
+
+@admin_bp.route('/jobs')
+@login_required
+@admin_required
+def job_stats():
+    return jsonify(jobs.stats())
+
+@admin_bp.route('/orders')
+@login_required
+@admin_required
+def orders():
+    status = request.args.get('status')
+    query = Order.query.options(joinedload(Order.customer)).order_by(Order.order_date.desc(), Order.id.desc())
+    if status in STATUSES:
+        query = query.filter(Order.status == status)
+    pagination = query.paginate(page=request.args.get('page', 1, type=int),
+                                per_page=current_app.config['ORDERS_ADMIN_PAGE_SIZE'], error_out=False)
+    next_statuses = {s: [t for t, sources in TRANSITIONS.items() if s in sources] for s in STATUSES}
+    return render_template('admin/orders.html', title='Orders', orders=pagination.items, pagination=pagination,
+                           status=status, statuses=STATUSES, next_statuses=next_statuses, form=OrderStatusForm())
+
+@admin_bp.route('/orders/<int:order_id>/status', methods=['POST'])
+@login_required
+@admin_required
+def order_status(order_id):
+    form = OrderStatusForm()
+    form.status.choices = list(TRANSITIONS)
+    if form.validate_on_submit():
+        # Customer emails and restocking are handled by set_status and the job queue.
+        if set_status(order_id, form.status.data):
+            flash(f'Order #{order_id} is now {form.status.data}.', 'success')
+        else:
+            flash(f'Order #{order_id} cannot be changed to {form.status.data}.', 'warning')
+    return redirect(url_for('admin.orders', status=request.args.get('status')))
+
+def _report_args():
+    days = min(max(request.args.get('days', 30, type=int), 1), current_app.config['REPORT_MAX_DAYS'])
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    order_by = request.args.get('order_by', 'revenue')
+    return days, limit, order_by if order_by in analytics.REPORT_ORDERINGS else 'revenue'
+
+@admin_bp.route('/reports')
+@login_required
+@admin_required
+@use_replica
+def reports():
+    days, limit, order_by = _report_args()
+    daily = analytics.sales_by_day(days)
+    totals = {key: sum(d[key] for d in daily) for key in ('orders', 'items', 'revenue')}
+    return render_template('admin/reports.html', title='Sales Reports', days=days, daily=daily, totals=totals,
+                           peak_revenue=max((d['revenue'] for d in daily), default=0) or 1,
+                           top=analytics.top_products(days, limit, order_by), order_by=order_by,
+                           velocity=analytics.stock_velocity(days, limit), status=analytics.rollup_status())
+
+@admin_bp.route('/reports/sales.json')
+@login_required
+@admin_required
+@use_replica
+def report_sales():
+    days, _, _ = _report_args()
+    return jsonify(analytics.sales_by_day(days))
+
+@admin_bp.route('/reports/top_products.json')
+@login_required
+@admin_required
+@use_replica
+def report_top_products():
+    return jsonify(analytics.top_products(*_report_args()))
+
+@admin_bp.route('/reports/stock_velocity.json')
+@login_required
+@admin_required
+@use_replica
+def report_stock_velocity():
+    days, limit, _ = _report_args()
+    return jsonify(analytics.stock_velocity(days, limit))
+
+@admin_bp.route('/metrics')
+@login_required
+@admin_required
+def metrics():
+    body = render_prometheus(current_app.extensions['metrics'], get_cache().stats())
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@admin_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_items():
+    form = ImportProductsForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        # Decode the upload while reading it instead of loading it into memory.
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        report = import_products(stream, detect_format(upload.filename), batch_size=form.batch_size.data)
+        flash(f'Imported {report.inserted} new and updated {report.updated} products '
+              f'({report.error_count} rows rejected).', 'success' if not report.error_count else 'warning')
+    return render_template('admin/import.html', title='Import Products', form=form, report=report)
+
+@admin_bp.route('/export')
+@login_required
+@admin_required
+def export_items():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        fmt = 'csv'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_products(fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=products.{fmt}'
+    return response
\ No newline at end of file
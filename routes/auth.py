@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import math
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
 from forms import LoginForm, RegistrationForm
 from models import User
 from database import db
+from user_auth import authenticate, check_login_rate
 from flask_login import current_user, login_user, logout_user, login_required
 
 auth_bp = Blueprint('auth', __name__, template_folder='../templates')
@@ -25,9 +27,16 @@ def login():
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     form = LoginForm()
+    if request.method == 'POST':
+        retry_after = check_login_rate(request.remote_addr, request.form.get('username'))
+        if retry_after:
+            flash('Too many login attempts. Please wait a minute and try again.')
+            response = make_response(render_template('login.html', title='Sign In', form=form), 429)
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
-        if user is None or not user.check_password(form.password.data):
+        user = authenticate(form.username.data, form.password.data)
+        if user is None:
             flash('Invalid username or password')
             return redirect(url_for('auth.login'))
         login_user(user, remember=form.remember_me.data)
@@ -0,0 +1,56 @@
+import json
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from chatbot_integration.chatbot_service import ChatbotBusy
+from routes.shop import get_products_from_db
+
+chatbot_bp = Blueprint('chatbot', __name__)
+
+MAX_HISTORY_MESSAGES = 20
+
+def _sse(data, event=None):
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data)}\n\n'
+
+def _parse_request():
+    payload = request.get_json(silent=True) or {}
+    message = (payload.get('message') or '').strip()
+    history = [
+        {'role': m['role'], 'content': str(m['content'])}
+        for m in payload.get('history') or []
+        if isinstance(m, dict) and m.get('role') in ('user', 'assistant') and 'content' in m
+    ]
+    return message, history[-MAX_HISTORY_MESSAGES:]
+
+@chatbot_bp.route('/chatbot', methods=['POST'])
+def chatbot():
+    """
+    Answers a chat message. Clients that accept `text/event-stream` receive the
+    answer token by token as Server-Sent Events (`data: {"token": ...}` events
+    followed by an `event: done`); others get a single JSON response.
+    """
+    message, history = _parse_request()
+    if not message:
+        return jsonify({'error': 'Message is required.'}), 400
+
+    service = current_app.extensions['chatbot']
+    context = get_products_from_db(message)
+
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        def generate():
+            try:
+                for token in service.stream_chatbot_response(message, history, context):
+                    yield _sse({'token': token})
+            except ChatbotBusy as e:
+                yield _sse({'error': str(e)}, event='error')
+                return
+            yield _sse({}, event='done')
+
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+        return response
+
+    try:
+        return jsonify(service.get_chatbot_response(message, history, context))
+    except ChatbotBusy as e:
+        return jsonify({'error': str(e)}), 503
@@ -1,43 +1,92 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
-from models import Product, CartItem, Order, OrderItem
-from database import db
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, abort
+from markupsafe import Markup
+from models import Order, OrderItem
+from database import use_replica
+from sqlalchemy.orm import selectinload
+from carts import get_cart
+from catalog import (SORTS, catalog_page, parse_catalog_args, catalog_cache_key, get_product_snapshot,
+                     product_updated_at)
+from cache import cached
+from http_cache import catalog_version, conditional_response, is_shareable, make_etag
+from catalog_context import build_catalog_context
+import search
+from checkout import place_order
 from flask_login import current_user, login_required
-from forms import AddToCartForm, CheckoutForm
+from forms import AddToCartForm, CartQuantityForm, CheckoutForm, RemoveFromCartForm
 
 shop_bp = Blueprint('shop', __name__, template_folder='../templates')
 
-def get_products_from_db():
+def get_products_from_db(user_message=None):
     """
-    Fetches all products from the database and formats them into a simple string for the LLM.
+    Returns the catalog context for the LLM: a short summary of the shop plus the
+    products most relevant to the user's message, within a fixed token budget.
     """
     try:
-        products = Product.query.all()
-        if not products:
-            return "There are currently no products available in the shop."
-        
-        product_list_str = "Here is a list of available products:\n"
-        for p in products:
-            product_list_str += f"- Name: {p.name}, Price: ${p.price:.2f}, Stock: {p.stock}\n"
-        
-        return product_list_str
+        return build_catalog_context(user_message)
     except Exception as e:
         print(f"Error fetching products from DB: {e}")
         return "I was unable to access the product catalog."
 
 @shop_bp.route('/shop')
+@use_replica
 def product_list():
-    products = Product.query.all()
-    return render_template('shop/product_list.html', title='Shop', products=products)
+    filters = parse_catalog_args(request.args,
+                                 current_app.config['CATALOG_PAGE_SIZE'],
+                                 current_app.config['CATALOG_MAX_PAGE_SIZE'])
+
+    version, updated_at = catalog_version()
+
+    def render_grid():
+        page = catalog_page(**filters)
+        return render_template('shop/_product_grid.html', products=page.items), page.next_cursor
+
+    def render_page():
+        # The product grid is the same for every visitor, so the rendered
+        # fragment is cached; the surrounding page still renders per user. The
+        # key includes the shared catalog version, so listing changes made in
+        # any worker are seen by all of them.
+        grid, next_cursor = cached('catalog', f'{version}:{catalog_cache_key(filters)}', render_grid)
+        return render_template('shop/product_list.html', title='Shop', grid=Markup(grid),
+                               next_cursor=next_cursor, filters=filters, sorts=SORTS)
+
+    if is_shareable():
+        etag = make_etag('catalog', version, catalog_cache_key(filters))
+        return conditional_response(etag, updated_at, render_page)
+    return render_page()
+
+@shop_bp.route('/search')
+@use_replica
+def search_results():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['SEARCH_PAGE_SIZE']
+    # Fetch one extra hit to know whether a next page exists.
+    products = search.search_products(query, limit=per_page + 1, offset=(page - 1) * per_page) if query else []
+    return render_template('shop/search_results.html', title='Search', query=query, page=page,
+                           products=products[:per_page], has_next=len(products) > per_page)
+
+@shop_bp.route('/search/autocomplete')
+@use_replica
+def search_autocomplete():
+    query = request.args.get('q', '').strip()
+    return jsonify(search.suggest(query) if query else [])
 
 @shop_bp.route('/product/<int:product_id>', methods=['GET', 'POST'])
+@use_replica
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
-    form = AddToCartForm()
+    # The page and its validators come from the snapshot cached in this
+    # worker; checking it against the row's updated_at means a change made in
+    # another worker is never served from here, nor confirmed with a 304.
+    updated_at = product_updated_at(product_id)
+    if updated_at is None:
+        abort(404)
+    product = get_product_snapshot(product_id, updated_at)
+    if product is None:
+        abort(404)
+    # Anonymous visitors only add to their own session cart, so their form goes
+    # without a CSRF token that would tie the shared, cached page to a session.
+    form = AddToCartForm() if current_user.is_authenticated else AddToCartForm(meta={'csrf': False})
     if form.validate_on_submit():
-        if not current_user.is_authenticated:
-            flash('You need to log in to add items to your cart.', 'info')
-            return redirect(url_for('auth.login', next=request.url))
-
         quantity = form.quantity.data
         if quantity <= 0:
             flash('Quantity must be at least 1.', 'danger')
@@ -47,43 +96,56 @@ def product_detail(product_id):
             flash(f'Insufficient stock. Only {product.stock} left.', 'danger')
             return redirect(url_for('shop.product_detail', product_id=product.id))
 
-        cart_item = CartItem.query.filter_by(user_id=current_user.id, product_id=product.id).first()
-        if cart_item:
-            cart_item.quantity += quantity
-        else:
-            cart_item = CartItem(user_id=current_user.id, product_id=product.id, quantity=quantity)
-        
-        db.session.add(cart_item)
-        db.session.commit()
+        if not get_cart().add(product.id, quantity):
+            flash('Your cart is full.', 'warning')
+            return redirect(url_for('shop.cart'))
         flash(f'{quantity} x {product.name} added to your cart!', 'success')
         return redirect(url_for('shop.cart'))
     
-    return render_template('shop/product_detail.html', title=product.name, product=product, form=form)
+    def render_page():
+        return render_template('shop/product_detail.html', title=product.name, product=product, form=form)
+
+    if is_shareable():
+        return conditional_response(make_etag('product', product.id, product.updated_at), product.updated_at,
+                                    render_page)
+    return render_page()
 
 @shop_bp.route('/cart')
-@login_required
 def cart():
-    cart_items = current_user.cart_items.all()
+    cart_items = get_cart().lines()
     total_price = sum(item.product.price * item.quantity for item in cart_items)
-    return render_template('cart.html', title='Your Cart', cart_items=cart_items, total_price=total_price)
+    return render_template('cart.html', title='Your Cart', cart_items=cart_items, total_price=total_price,
+                           quantity_form=CartQuantityForm(), remove_form=RemoveFromCartForm())
 
-@shop_bp.route('/cart/remove/<int:item_id>')
-@login_required
-def remove_from_cart(item_id):
-    cart_item = CartItem.query.get_or_404(item_id)
-    if cart_item.user_id != current_user.id:
-        flash('You are not authorized to remove this item.', 'danger')
+@shop_bp.route('/cart/update/<int:product_id>', methods=['POST'])
+def update_cart(product_id):
+    form = CartQuantityForm()
+    if not form.validate_on_submit():
+        flash('Please enter a valid quantity.', 'danger')
         return redirect(url_for('shop.cart'))
-    
-    db.session.delete(cart_item)
-    db.session.commit()
-    flash('Item removed from cart.', 'success')
+    quantity = form.quantity.data
+    if quantity == 0:
+        get_cart().remove(product_id)
+        flash('Item removed from cart.', 'success')
+        return redirect(url_for('shop.cart'))
+    product = get_product_snapshot(product_id)
+    if product is not None and product.stock < quantity:
+        flash(f'Insufficient stock. Only {product.stock} left.', 'danger')
+    elif product is None or not get_cart().set_quantity(product_id, quantity):
+        flash('That product is not in your cart.', 'warning')
+    return redirect(url_for('shop.cart'))
+
+@shop_bp.route('/cart/remove/<int:product_id>', methods=['POST'])
+def remove_from_cart(product_id):
+    if RemoveFromCartForm().validate_on_submit() and get_cart().remove(product_id):
+        flash('Item removed from cart.', 'success')
     return redirect(url_for('shop.cart'))
 
 @shop_bp.route('/checkout', methods=['GET', 'POST'])
 @login_required
 def checkout():
-    cart_items = current_user.cart_items.all()
+    cart = get_cart()
+    cart_items = cart.lines()
     if not cart_items:
         flash('Your cart is empty!', 'warning')
         return redirect(url_for('shop.product_list'))
@@ -92,27 +154,12 @@ def checkout():
     checkout_form = CheckoutForm()
 
     if checkout_form.validate_on_submit():
-        new_order = Order(user_id=current_user.id, total_amount=total_amount, status='Processing')
-        db.session.add(new_order)
-        db.session.flush()
-
-        for item in cart_items:
-            order_item = OrderItem(
-                order_id=new_order.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                price=item.product.price
-            )
-            product = Product.query.get(item.product_id)
-            if product.stock < item.quantity:
-                db.session.rollback()
-                flash(f'Not enough stock for {product.name}. Please adjust your cart.', 'danger')
-                return redirect(url_for('shop.cart'))
-            product.stock -= item.quantity
-            db.session.add(order_item)
-            db.session.delete(item)
-        
-        db.session.commit()
+        result = place_order(current_user.id, cart_items)
+        if not result.ok:
+            names = ', '.join(f['name'] or f'#{f["product_id"]}' for f in result.failed)
+            flash(f'Not enough stock for {names}. Please adjust your cart.', 'danger')
+            return redirect(url_for('shop.cart'))
+        cart.checked_out()
         flash('Your order has been placed successfully!', 'success')
         return redirect(url_for('shop.purchase_history'))
     
@@ -120,6 +167,13 @@ def checkout():
 
 @shop_bp.route('/purchase_history')
 @login_required
+@use_replica
 def purchase_history():
-    orders = current_user.orders.order_by(Order.order_date.desc()).all()
-    return render_template('purchase_history.html', title='Purchase History', orders=orders)
\ No newline at end of file
+    page = request.args.get('page', 1, type=int)
+    # One query for the page of orders, one for all their items and products.
+    pagination = (Order.query.filter_by(user_id=current_user.id)
+                  .options(selectinload(Order.items).joinedload(OrderItem.product))
+                  .order_by(Order.order_date.desc(), Order.id.desc())
+                  .paginate(page=page, per_page=current_app.config['ORDER_HISTORY_PAGE_SIZE'], error_out=False))
+    return render_template('purchase_history.html', title='Purchase History',
+                           orders=pagination.items, pagination=pagination)
\ No newline at end of file
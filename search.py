@@ -0,0 +1,323 @@
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice
+from flask import current_app
+from sqlalchemy import inspect, text
+from database import db
+from models import Product
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+REBUILD_BATCH_SIZE = 1000
+
+
+def tokenize(value):
+    return TOKEN_RE.findall((value or '').lower())
+
+
+class FTS5Index:
+    """
+    Product search backed by an SQLite FTS5 virtual table, created by the
+    0002_product_fts migration. The table is kept in the same database (and
+    the same transaction) as the products, with the product id as the FTS rowid.
+    """
+    name = 'fts5'
+
+    def rebuild(self):
+        db.session.execute(text("DELETE FROM product_fts"))
+        rows = db.session.execute(
+            db.select(Product.id, Product.name, Product.description).execution_options(yield_per=REBUILD_BATCH_SIZE)
+        )
+        for batch in rows.partitions():
+            db.session.execute(
+                text("INSERT INTO product_fts (rowid, name, description) VALUES (:id, :name, :description)"),
+                [{'id': r.id, 'name': r.name, 'description': r.description or ''} for r in batch]
+            )
+
+    def index_product(self, product):
+        self.remove_product(product.id)
+        db.session.execute(
+            text("INSERT INTO product_fts (rowid, name, description) VALUES (:id, :name, :description)"),
+            {'id': product.id, 'name': product.name, 'description': product.description or ''}
+        )
+
+    def remove_product(self, product_id):
+        db.session.execute(text("DELETE FROM product_fts WHERE rowid = :id"), {'id': product_id})
+
+    def index_many(self, rows):
+        db.session.execute(text("DELETE FROM product_fts WHERE rowid = :id"), [{'id': r['id']} for r in rows])
+        db.session.execute(
+            text("INSERT INTO product_fts (rowid, name, description) VALUES (:id, :name, :description)"),
+            [{'id': r['id'], 'name': r['name'], 'description': r.get('description') or ''} for r in rows]
+        )
+
+    @staticmethod
+    def _match_expression(terms, match_all=True):
+        # Every term is quoted so user input can never be parsed as FTS syntax;
+        # the last one is a prefix match to support search-as-you-type.
+        quoted = ['"%s"' % t for t in terms]
+        quoted[-1] += '*'
+        return (' ' if match_all else ' OR ').join(quoted)
+
+    def search(self, query, limit=20, offset=0, match_all=True, max_candidates=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        params = {'q': self._match_expression(terms, match_all), 'nw': NAME_WEIGHT, 'dw': DESCRIPTION_WEIGHT,
+                  'limit': limit, 'offset': offset}
+        if max_candidates is None:
+            sql = ("SELECT rowid FROM product_fts WHERE product_fts MATCH :q "
+                   "ORDER BY bm25(product_fts, :nw, :dw) LIMIT :limit OFFSET :offset")
+        else:
+            # Only rank the newest `max_candidates` matches, which bounds the
+            # cost of queries made of very common terms.
+            sql = ("SELECT rowid FROM (SELECT rowid, bm25(product_fts, :nw, :dw) AS score FROM product_fts "
+                   "WHERE product_fts MATCH :q ORDER BY rowid DESC LIMIT :candidates) "
+                   "ORDER BY score LIMIT :limit OFFSET :offset")
+            params['candidates'] = max_candidates
+        return [r[0] for r in db.session.execute(text(sql), params)]
+
+    def suggest(self, prefix, limit=8):
+        terms = tokenize(prefix)
+        if not terms:
+            return []
+        rows = db.session.execute(text(
+            "SELECT rowid, name FROM product_fts WHERE product_fts MATCH :q "
+            "ORDER BY rank LIMIT :limit"
+        ), {'q': 'name : (%s)' % self._match_expression(terms), 'limit': limit})
+        return [{'id': r[0], 'name': r[1]} for r in rows]
+
+
+class InvertedIndex:
+    """
+    Pure-Python fallback for databases without FTS5. Postings live in process
+    memory, are built lazily from the product table and are rebuilt after
+    `max_age` seconds so that workers eventually see other workers' edits.
+    Ranking is BM25 over the name and description fields.
+    """
+    name = 'memory'
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}      # term -> {product_id: weighted term frequency}
+        self._name_postings = {}  # term -> set of product ids (for autocomplete)
+        self._doc_len = {}
+        self._doc_terms = {}
+        self._names = {}
+        self._sorted_terms = []
+        self._sorted_name_terms = []
+        self._dirty = False
+
+    def _ensure_built(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            rows = db.session.execute(
+                db.select(Product.id, Product.name, Product.description).execution_options(yield_per=REBUILD_BATCH_SIZE)
+            )
+            for row in rows:
+                self._add(row.id, row.name, row.description)
+            self._built_at = time.monotonic()
+
+    def _add(self, product_id, name, description):
+        name_terms = tokenize(name)
+        weights = {}
+        for term in name_terms:
+            weights[term] = weights.get(term, 0.0) + NAME_WEIGHT
+        for term in tokenize(description):
+            weights[term] = weights.get(term, 0.0) + DESCRIPTION_WEIGHT
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[product_id] = weight
+        for term in name_terms:
+            self._name_postings.setdefault(term, set()).add(product_id)
+        self._doc_len[product_id] = sum(weights.values())
+        self._doc_terms[product_id] = (tuple(weights), tuple(set(name_terms)))
+        self._names[product_id] = name
+        self._dirty = True
+
+    def _remove(self, product_id):
+        terms, name_terms = self._doc_terms.pop(product_id, ((), ()))
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+        for term in name_terms:
+            ids = self._name_postings.get(term)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._name_postings[term]
+        self._doc_len.pop(product_id, None)
+        self._names.pop(product_id, None)
+        self._dirty = True
+
+    def index_product(self, product):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(product.id)
+            self._add(product.id, product.name, product.description)
+
+    def remove_product(self, product_id):
+        with self._lock:
+            if self._built_at is not None:
+                self._remove(product_id)
+
+    def index_many(self, rows):
+        with self._lock:
+            if self._built_at is None:
+                return
+            for row in rows:
+                self._remove(row['id'])
+                self._add(row['id'], row['name'], row.get('description'))
+
+    def _expand(self, prefix, sorted_terms):
+        i = bisect_left(sorted_terms, prefix)
+        while i < len(sorted_terms) and sorted_terms[i].startswith(prefix):
+            yield sorted_terms[i]
+            i += 1
+
+    def _refresh_term_lists(self):
+        if self._dirty:
+            self._sorted_terms = sorted(self._postings)
+            self._sorted_name_terms = sorted(self._name_postings)
+            self._dirty = False
+
+    def search(self, query, limit=20, offset=0, match_all=True, max_candidates=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure_built()
+            self._refresh_term_lists()
+            n_docs = len(self._doc_len) or 1
+            avg_len = sum(self._doc_len.values()) / n_docs
+            scores = None
+            for i, term in enumerate(terms):
+                expanded = list(self._expand(term, self._sorted_terms)) if i == len(terms) - 1 else [term]
+                term_scores = {}
+                for t in expanded:
+                    postings = self._postings.get(t, {})
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    items = postings.items()
+                    if max_candidates is not None and len(postings) > max_candidates:
+                        items = islice(reversed(items), max_candidates)  # newest products first
+                    for pid, tf in items:
+                        norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[pid] / avg_len)
+                        score = idf * tf * (self.k1 + 1) / norm
+                        if score > term_scores.get(pid, 0.0):
+                            term_scores[pid] = score
+                if scores is None:
+                    scores = term_scores
+                elif match_all:
+                    scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+                else:
+                    for pid, s in term_scores.items():
+                        scores[pid] = scores.get(pid, 0.0) + s
+                if match_all and not scores:
+                    return []
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))
+        return ranked[offset:offset + limit]
+
+    def suggest(self, prefix, limit=8):
+        terms = tokenize(prefix)
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure_built()
+            self._refresh_term_lists()
+            ids = None
+            for i, term in enumerate(terms):
+                if i == len(terms) - 1:
+                    matched = set()
+                    for t in self._expand(term, self._sorted_name_terms):
+                        matched |= self._name_postings[t]
+                else:
+                    matched = self._name_postings.get(term, set())
+                ids = matched if ids is None else ids & matched
+                if not ids:
+                    return []
+            ranked = sorted(ids, key=lambda pid: (len(self._names[pid]), pid))[:limit]
+            return [{'id': pid, 'name': self._names[pid]} for pid in ranked]
+
+
+def _has_fts_table():
+    return db.engine.dialect.name == 'sqlite' and inspect(db.engine).has_table('product_fts')
+
+
+def _create_index(app):
+    backend = app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'fts5' or (backend == 'auto' and _has_fts_table()):
+        return FTS5Index()
+    return InvertedIndex(max_age=app.config.get('SEARCH_MEMORY_MAX_AGE', 300))
+
+
+_init_lock = threading.Lock()
+
+
+def init_app(app):
+    """
+    Registers product search on the app. The backend (SEARCH_BACKEND = auto |
+    fts5 | memory) is picked on first use, since 'auto' has to look at the
+    database schema and app startup does no database work.
+    """
+    app.extensions['search'] = None
+
+
+def get_index():
+    app = current_app._get_current_object()
+    index = app.extensions['search']
+    if index is None:
+        with _init_lock:
+            index = app.extensions['search']
+            if index is None:
+                index = app.extensions['search'] = _create_index(app)
+    return index
+
+
+def index_product(product):
+    get_index().index_product(product)
+
+
+def remove_product(product_id):
+    get_index().remove_product(product_id)
+
+
+def index_many(rows):
+    """Indexes a batch of product dicts (with id, name and description)."""
+    get_index().index_many(rows)
+
+
+def search_products(query, limit=20, offset=0, match_all=True, max_candidates=None):
+    """
+    Returns the matching Product rows, best match first, using one query for
+    the ranked ids and one to load the rows. With match_all=False products
+    matching any of the terms are returned, ranked by how well they match;
+    max_candidates caps how many matches are ranked.
+    """
+    ids = get_index().search(query, limit=limit, offset=offset, match_all=match_all,
+                             max_candidates=max_candidates)
+    if not ids:
+        return []
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(ids))}
+    return [products[i] for i in ids if i in products]
+
+
+def suggest(prefix, limit=8):
+    return get_index().suggest(prefix, limit=limit)
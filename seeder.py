@@ -1,12 +1,13 @@
 from app import create_app
 from database import db
+import migrate
+import search
 from models import Product, User
-from werkzeug.security import generate_password_hash
 
 def seed_data():
     app = create_app()
     with app.app_context():
-        db.create_all()
+        migrate.upgrade()
 
         # Create an admin user
         if not User.query.filter_by(username='admin').first():
@@ -62,9 +63,11 @@ def seed_data():
                 },
             ]
 
-            for product_data in products_data:
-                product = Product(**product_data)
-                db.session.add(product)
+            products = [Product(**product_data) for product_data in products_data]
+            db.session.add_all(products)
+            db.session.flush()
+            for product in products:
+                search.index_product(product)  # as the admin views do, in the same transaction
             db.session.commit()
             print(f"Added {len(products_data)} products to the database.")
         else:
@@ -6,6 +6,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const sendChatBtn = document.querySelector(".chat-input span");
 
     // 1. SOLIS: Izveidot mainīgo sarunas vēstures glabāšanai.
+    const chatHistory = [];
 
     const createChatLi = (message, className) => {
         const chatLi = document.createElement("li");
@@ -21,15 +22,64 @@ document.addEventListener('DOMContentLoaded', () => {
         const API_URL = "/chatbot";
         const messageElement = incomingChatLi.querySelector("p");
 
-        // TODO: Sagatavot pieprasījuma opcijas (request options)
-        // Izveidojiet JSON virknes objektu, kas satur gan pēdējo lietotāja ziņu, gan visu iepriekšējo sarunas vēsturi.
+        // The last user message is the final entry of the history; the server
+        // receives it separately from the earlier turns.
         const requestOptions = {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream"
+            },
+            body: JSON.stringify({
+                message: chatHistory[chatHistory.length - 1].content,
+                history: chatHistory.slice(0, -1)
+            })
         };
 
-        // TODO: Izsaukt `fetch()` ar izveidotajām opcijām.
-        // Pēc atbildes saņemšanas:
-        // 1. Atjaunojiet `messageElement` saturu ar saņemto atbildi.
-        // 2. Pievienojiet bota atbildi mainīgajā sarunas vēstures glabāšanai.
+        // The answer arrives as Server-Sent Events and is shown as it streams in.
+        let answer = "";
+        let failed = false;
+        const handleEvent = (rawEvent) => {
+            let eventName = "message";
+            let data = "";
+            rawEvent.split("\n").forEach(line => {
+                if (line.startsWith("event:")) eventName = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            });
+            if (!data) return;
+            const payload = JSON.parse(data);
+            if (eventName === "error") {
+                failed = true;
+                messageElement.textContent = payload.error;
+            } else if (payload.token) {
+                answer += payload.token;
+                messageElement.textContent = answer;
+                chatbox.scrollTo(0, chatbox.scrollHeight);
+            }
+        };
+
+        fetch(API_URL, requestOptions)
+            .then(async response => {
+                if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = "";
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    const events = buffer.split("\n\n");
+                    buffer = events.pop();
+                    events.forEach(handleEvent);
+                }
+                if (buffer.trim()) handleEvent(buffer);
+                if (!failed && answer) {
+                    chatHistory.push({ role: "assistant", content: answer });
+                }
+            })
+            .catch(() => {
+                messageElement.textContent = "Oops! Something went wrong. Please try again.";
+            });
     }
 
     const handleChat = () => {
@@ -43,7 +93,7 @@ document.addEventListener('DOMContentLoaded', () => {
         chatbox.scrollTo(0, chatbox.scrollHeight);
         
         // 3. SOLIS: Pievienot lietotāja ziņu mainīgajā sarunas vēstures glabāšanai
-        // TODO: Pievienojiet ziņu masīvam pareizajā formātā (kā objektu ar "role" un "content").
+        chatHistory.push({ role: "user", content: userMessage });
         
         setTimeout(() => {
             const incomingChatLi = createChatLi("Thinking...", "incoming");
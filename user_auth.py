@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from database import db
+from models import User, CartItem
+from cache import cached, invalidate
+
+
+class CachedUser(UserMixin):
+    """
+    The User fields that current_user needs, cached between requests so that
+    authenticated requests do not have to load the user row every time.
+    """
+
+    def __init__(self, id, username, email, is_admin):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = bool(is_admin)
+
+    @property
+    def cart_items(self):
+        return CartItem.query.filter_by(user_id=self.id)
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+def _load_user_row(user_id):
+    row = db.session.execute(
+        select(User.id, User.username, User.email, User.is_admin).where(User.id == user_id)
+    ).first()
+    return CachedUser(*row) if row else None
+
+
+def load_user(user_id):
+    """Flask-Login user loader; cached for USER_CACHE_TTL seconds (0 disables)."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    ttl = current_app.config.get('USER_CACHE_TTL')
+    if not ttl:
+        return _load_user_row(user_id)
+    return cached('user', user_id, lambda: _load_user_row(user_id), ttl=ttl)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _remember_changed_user(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    # Invalidate only after the commit, so no request can re-cache the old row.
+    user_ids = session.info.pop('changed_user_ids', None)
+    if user_ids and has_app_context():
+        for user_id in user_ids:
+            invalidate('user', user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+
+
+def authenticate(username, password):
+    """
+    Returns the User for valid credentials, or None. A password hashed with
+    other parameters than PASSWORD_HASH_METHOD is rehashed on the spot, so
+    changing the setting upgrades hashes as users log in.
+    """
+    user = User.query.filter_by(username=username).first()
+    if user is None or not user.check_password(password):
+        return None
+    if user.needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+    return user
+
+
+class RateLimiter:
+    """
+    Allows at most `limit` hits per key within a sliding `window` (seconds).
+    State lives in process memory and only the `max_keys` most recently used
+    keys are tracked.
+    """
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Records a hit; returns 0 if allowed, else the seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque(maxlen=self.limit)
+                while len(self._hits) > self.max_keys:
+                    self._hits.popitem(last=False)
+            self._hits.move_to_end(key)
+            if len(hits) == self.limit and now - hits[0] < self.window:
+                return self.window - (now - hits[0])
+            hits.append(now)
+            return 0
+
+
+def check_login_rate(remote_addr, username):
+    """
+    Counts a login attempt against the per-address and per-username limits.
+    Returns 0 when it may proceed, otherwise the seconds to wait. Runs before
+    the password is hashed, so floods of attempts cost almost no CPU.
+    """
+    limiters = current_app.extensions['login_rate_limiters']
+    waits = [limiter.hit(key) for limiter, key in ((limiters.get('address'), remote_addr),
+                                                   (limiters.get('username'), (username or '').lower()))
+             if limiter is not None]
+    return max(waits, default=0)
+
+
+def init_app(app, login_manager):
+    """Installs the cached user loader and the login rate limiters."""
+    login_manager.user_loader(load_user)
+    window = app.config['LOGIN_RATE_LIMIT_WINDOW']
+    app.extensions['login_rate_limiters'] = {
+        name: RateLimiter(limit, window) if limit else None
+        for name, limit in (('address', app.config['LOGIN_RATE_LIMIT_PER_ADDRESS']),
+                            ('username', app.config['LOGIN_RATE_LIMIT_PER_USERNAME']))
+    }